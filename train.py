@@ -1,8 +1,551 @@
 import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import shutil
+import itertools
+import subprocess
+import multiprocessing
+import yaml
+import cv2
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from ultralytics import YOLO
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.nn.modules import C2f, SPPF, Concat, Conv
+from ultralytics.utils import colorstr
+from ultralytics.utils.torch_utils import de_parallel, get_flops
 from pathlib import Path
 import argparse
 
+# 支援的圖片格式（與 ultralytics 相同）
+IMG_FORMATS = {'.bmp', '.dng', '.jpeg', '.jpg', '.mpo', '.png', '.tif', '.tiff', '.webp', '.pfm'}
+
+# 資料集驗證快取檔名（依檔案 mtime / 大小增量驗證）
+VALIDATION_CACHE_NAME = '.dataset_validation_cache.json'
+VALIDATION_CACHE_VERSION = 1
+
+# 標註框尺寸分組上限（sqrt(寬 x 高)，相對於圖片）
+BOX_SIZE_BINS = [0.02, 0.05, 0.1, 0.2, 0.4, 1.0]
+
+# 待檢查檔案少於此數量時不啟動 process pool
+PROCESS_POOL_MIN_FILES = 64
+
+# 預先縮放的 memmap 影像快取目錄（位於資料集根目錄下）
+IMAGE_CACHE_DIR_NAME = '.image_cache'
+IMAGE_CACHE_VERSION = 1
+
+# 商品目錄（與 yolo1125/backend/config.py 相同的 MongoDB）
+CATALOG_MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+CATALOG_DB_NAME = "yolo1125"
+
+# 微調的預設起始模型
+DEFAULT_FINETUNE_WEIGHTS = 'runs/detect/supermarket_product_detector/weights/best.pt'
+
+# 剪枝後保留的通道數取此倍數（CPU 向量化較有效率）
+PRUNE_CHANNEL_MULTIPLE = 8
+
+# 感知雜湊快取檔名（近似重複檢查）
+HASH_CACHE_NAME = '.image_hash_cache.json'
+HASH_CACHE_VERSION = 1
+
+
+def scan_label_file(label_path):
+    """
+    解析並檢查單一 YOLO 標籤檔（在子行程中執行）
+
+    Args:
+        label_path: 標籤檔路徑
+
+    Returns:
+        dict: {'errors': [...], 'class_counts': {類別: 數量}, 'size_hist': [...]}
+    """
+    errors = []
+    class_counts = Counter()
+    size_hist = [0] * len(BOX_SIZE_BINS)
+    seen = set()
+
+    try:
+        with open(label_path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'errors': [f"無法讀取: {e}"], 'class_counts': {}, 'size_hist': size_hist}
+
+    for line_num, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+
+        # 偵測格式為 5 個欄位，分割格式為類別 + 至少 3 個點
+        if len(parts) != 5 and (len(parts) < 7 or len(parts) % 2 == 0):
+            errors.append(f"第 {line_num} 行欄位數錯誤: {len(parts)}")
+            continue
+
+        try:
+            class_id = int(parts[0])
+            values = [float(v) for v in parts[1:]]
+        except ValueError:
+            errors.append(f"第 {line_num} 行含有非數值")
+            continue
+
+        if class_id < 0:
+            errors.append(f"第 {line_num} 行類別為負數: {class_id}")
+            continue
+
+        if len(values) == 4:
+            cx, cy, w, h = values
+            x1, y1, x2, y2 = cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+        else:
+            xs, ys = values[0::2], values[1::2]
+            x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+            w, h = x2 - x1, y2 - y1
+
+        if w <= 0 or h <= 0:
+            errors.append(f"第 {line_num} 行標註框寬高必須大於 0")
+            continue
+        if min(values) < 0 or max(values) > 1 or x1 < -1e-6 or y1 < -1e-6 or x2 > 1 + 1e-6 or y2 > 1 + 1e-6:
+            errors.append(f"第 {line_num} 行座標超出 [0, 1] 範圍")
+            continue
+
+        key = tuple(parts)
+        if key in seen:
+            errors.append(f"第 {line_num} 行為重複標註")
+            continue
+        seen.add(key)
+
+        class_counts[class_id] += 1
+        box_size = (w * h) ** 0.5
+        for i, bound in enumerate(BOX_SIZE_BINS):
+            if box_size <= bound or i == len(BOX_SIZE_BINS) - 1:
+                size_hist[i] += 1
+                break
+
+    return {
+        'errors': errors,
+        'class_counts': {str(k): v for k, v in class_counts.items()},
+        'size_hist': size_hist
+    }
+
+def image_cache_paths(data_path, split, imgsz):
+    """
+    取得影像快取檔案路徑
+
+    Returns:
+        tuple: (memmap 陣列 .npy, 索引 .json)
+    """
+    cache_dir = Path(data_path) / IMAGE_CACHE_DIR_NAME
+    return cache_dir / f"{split}_{imgsz}.npy", cache_dir / f"{split}_{imgsz}.json"
+
+
+def cache_image(task):
+    """
+    解碼並縮放單張圖片，寫入 memmap 的指定位置（在子行程中執行）
+
+    縮放方式與 ultralytics 的 load_image 相同（長邊縮放到 imgsz、維持比例），
+    圖片放在 imgsz x imgsz 格子的左上角，實際尺寸記錄在索引中。
+
+    Args:
+        task: (memmap 路徑, 位置, 圖片路徑, imgsz)
+
+    Returns:
+        tuple: (位置, [原始高, 原始寬, 縮放後高, 縮放後寬])，無法讀取時為 (位置, None)
+    """
+    array_path, slot, image_path, imgsz = task
+    image = cv2.imread(image_path)
+    if image is None:
+        return slot, None
+
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = (min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz))
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    h, w = image.shape[:2]
+
+    array = np.load(array_path, mmap_mode='r+')
+    array[slot, :h, :w] = image
+    array.flush()
+    del array
+    return slot, [h0, w0, h, w]
+
+
+def build_image_cache(data_path, split, imgsz, workers=None):
+    """
+    建立或更新預先縮放的 memmap 影像快取
+
+    imgsz 改變或圖片新增/刪除時整份重建；只有內容變動（mtime / 大小）時
+    僅重新解碼變動的圖片。
+
+    Args:
+        data_path: 資料集根目錄路徑
+        split: 'train' / 'val' / 'test'
+        imgsz: 訓練圖片尺寸
+        workers: 平行行程數，預設為 CPU 數量
+
+    Returns:
+        Path: memmap 陣列路徑，該 split 沒有圖片時為 None
+    """
+    image_dir = Path(data_path) / 'images' / split
+    if not image_dir.exists():
+        return None
+
+    files = {}
+    for path in sorted(image_dir.rglob('*')):
+        if path.is_file() and path.suffix.lower() in IMG_FORMATS:
+            stat = path.stat()
+            files[path.relative_to(image_dir).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+    if not files:
+        return None
+
+    array_path, index_path = image_cache_paths(data_path, split, imgsz)
+    array_path.parent.mkdir(parents=True, exist_ok=True)
+
+    index = None
+    if index_path.exists() and array_path.exists():
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+    if index is not None and (index.get('version') != IMAGE_CACHE_VERSION or index.get('imgsz') != imgsz
+                              or set(index.get('files', {})) != set(files)):
+        index = None
+
+    if index is not None:
+        # 檔案清單相同：只更新內容有變動的圖片
+        stale = [name for name, signature in files.items()
+                 if index['files'][name].get('signature') != signature]
+        target_path = array_path
+    else:
+        index = {
+            'version': IMAGE_CACHE_VERSION,
+            'imgsz': imgsz,
+            'files': {name: {'slot': slot} for slot, name in enumerate(files)}
+        }
+        stale = list(files)
+        target_path = array_path.with_name(f"{array_path.stem}.{os.getpid()}.tmp.npy")
+        array = np.lib.format.open_memmap(target_path, mode='w+', dtype=np.uint8,
+                                          shape=(len(files), imgsz, imgsz, 3))
+        del array
+
+    if not stale:
+        print(f"✓ {split} 影像快取為最新 ({len(files)} 張, imgsz={imgsz})")
+        return array_path
+
+    print(f"建立 {split} 影像快取: {len(stale)}/{len(files)} 張 (imgsz={imgsz})...")
+    start = time.perf_counter()
+    tasks = [(str(target_path), index['files'][name]['slot'], str(image_dir / name), imgsz) for name in stale]
+    if len(tasks) < PROCESS_POOL_MIN_FILES or workers == 1:
+        results = [cache_image(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(cache_image, tasks, chunksize=16))
+
+    failed = 0
+    for name, (_, shape) in zip(stale, results):
+        entry = index['files'][name]
+        entry['signature'] = files[name]
+        entry['shape'] = shape
+        if shape is None:
+            failed += 1
+            print(f"⚠️ 無法讀取圖片，訓練時將直接解碼: {name}")
+
+    if target_path != array_path:
+        os.replace(target_path, array_path)
+    tmp_index_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    with open(tmp_index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_index_path, index_path)
+
+    size_gb = array_path.stat().st_size / (1 << 30)
+    print(f"✓ {split} 影像快取完成: {len(stale) - failed} 張, {size_gb:.2f} GB, "
+          f"耗時 {time.perf_counter() - start:.1f} 秒")
+    return array_path
+
+
+class MemmapYOLODataset(YOLODataset):
+    """從 build_image_cache 產生的 memmap 讀取預先縮放的圖片，省去每個 epoch 的 JPEG 解碼"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # 資料集索引 -> (位置, 原始高, 原始寬, 縮放後高, 縮放後寬)
+        self.cache_slots = {}
+        self.cache_array_path = None
+        self._cache_array = None
+
+        img_dir = Path(self.img_path) if isinstance(self.img_path, (str, Path)) else None
+        if img_dir is None or not img_dir.is_dir():
+            return
+
+        array_path, index_path = image_cache_paths(img_dir.parent.parent, img_dir.name, self.imgsz)
+        if not (array_path.exists() and index_path.exists()):
+            print(f"{self.prefix}⚠️ 找不到影像快取，改為直接解碼: {array_path}")
+            return
+
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != IMAGE_CACHE_VERSION or index.get('imgsz') != self.imgsz:
+            return
+
+        for i, image_file in enumerate(self.im_files):
+            entry = index['files'].get(Path(os.path.relpath(image_file, img_dir)).as_posix())
+            if entry is None or entry.get('shape') is None:
+                continue
+            stat = os.stat(image_file)
+            if entry['signature'] != [stat.st_mtime_ns, stat.st_size]:
+                continue
+            self.cache_slots[i] = (entry['slot'], *entry['shape'])
+
+        self.cache_array_path = str(array_path)
+        print(f"{self.prefix}使用 memmap 影像快取: {len(self.cache_slots)}/{len(self.im_files)} 張")
+
+    def __getstate__(self):
+        """DataLoader 子行程各自開啟 memmap，不複製陣列內容"""
+        state = self.__dict__.copy()
+        state['_cache_array'] = None
+        return state
+
+    def load_image(self, i, rect_mode=True):
+        """從 memmap 讀取圖片（與 BaseDataset.load_image 回傳相同格式）"""
+        slot = self.cache_slots.get(i)
+        if slot is None or self.ims[i] is not None:
+            return super().load_image(i, rect_mode)
+
+        if self._cache_array is None:
+            self._cache_array = np.load(self.cache_array_path, mmap_mode='r')
+
+        index, h0, w0, h, w = slot
+        im = np.array(self._cache_array[index, :h, :w])
+        if not rect_mode and not (h == w == self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        # 與原本相同維護 buffer（mosaic 增強從 buffer 取圖）
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+
+        return im, (h0, w0), im.shape[:2]
+
+
+class MemmapDetectionTrainer(DetectionTrainer):
+    """使用 MemmapYOLODataset 的偵測訓練器"""
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        """建立資料集（參數與 ultralytics 的 build_yolo_dataset 相同）"""
+        gs = max(int(de_parallel(self.model).stride.max() if self.model else 0), 32)
+        cfg = self.args
+        return MemmapYOLODataset(
+            img_path=img_path,
+            imgsz=cfg.imgsz,
+            batch_size=batch,
+            augment=mode == 'train',
+            hyp=cfg,
+            rect=cfg.rect or mode == 'val',
+            cache=cfg.cache or None,
+            single_cls=cfg.single_cls or False,
+            stride=int(gs),
+            pad=0.0 if mode == 'train' else 0.5,
+            prefix=colorstr(f'{mode}: '),
+            use_segments=False,
+            use_keypoints=False,
+            classes=cfg.classes,
+            data=self.data,
+            fraction=cfg.fraction if mode == 'train' else 1.0)
+
+
+def extend_detect_head(model, old_model, names):
+    """
+    將舊模型分類層中各商品的權重複製到新模型（依類別名稱對應）
+
+    新增的類別維持隨機初始化，其餘已學會的類別不必重新學習。
+
+    Args:
+        model: 新建立的 DetectionModel（類別數已依目錄擴充）
+        old_model: 原本的 DetectionModel
+        names: 新模型的類別 {id: 名稱}
+
+    Returns:
+        int: 複製權重的類別數
+    """
+    import torch
+
+    old_ids = {name: i for i, name in old_model.names.items()}
+    mapping = [(new_id, old_ids[name]) for new_id, name in names.items() if name in old_ids]
+
+    new_head, old_head = model.model[-1], old_model.model[-1]
+    with torch.no_grad():
+        for new_branch, old_branch in zip(new_head.cv3, old_head.cv3):
+            new_conv, old_conv = new_branch[-1], old_branch[-1]
+            if new_conv.in_channels != old_conv.in_channels:
+                return 0
+            for new_id, old_id in mapping:
+                new_conv.weight[new_id].copy_(old_conv.weight[old_id])
+                new_conv.bias[new_id].copy_(old_conv.bias[old_id])
+    return len(mapping)
+
+
+class CatalogFinetuneTrainer(DetectionTrainer):
+    """從既有模型微調：擴充偵測頭的類別數並保留已學會類別的分類權重"""
+
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        """建立模型並從舊模型移轉權重"""
+        model = super().get_model(cfg, weights, verbose)
+        if weights is not None and hasattr(weights, 'names'):
+            copied = extend_detect_head(model, weights, self.data['names'])
+            print(f"✓ 偵測頭: {len(self.data['names'])} 個類別，沿用 {copied} 個類別的分類權重")
+        return model
+
+
+def channel_importance(conv, criterion='l1'):
+    """
+    計算 Conv 各輸出通道的重要性
+
+    Args:
+        conv: ultralytics Conv（Conv2d + BatchNorm2d）
+        criterion: 'l1'（卷積核 L1 範數）或 'bn'（BatchNorm 縮放係數絕對值）
+
+    Returns:
+        Tensor: 每個輸出通道的分數
+    """
+    if criterion == 'bn' and hasattr(conv, 'bn'):
+        return conv.bn.weight.detach().abs()
+    return conv.conv.weight.detach().abs().sum(dim=(1, 2, 3))
+
+
+def slice_conv(conv, out_keep=None, in_keep=None):
+    """依保留的通道索引，以較小的 Conv2d / BatchNorm2d 取代 Conv 內的層"""
+    from torch import nn
+
+    old = conv.conv
+    weight = old.weight.detach()
+    if out_keep is not None:
+        weight = weight[out_keep]
+    if in_keep is not None:
+        weight = weight[:, in_keep]
+
+    new = nn.Conv2d(weight.shape[1], weight.shape[0], old.kernel_size, old.stride, old.padding,
+                    old.dilation, old.groups, bias=old.bias is not None).to(weight.device, weight.dtype)
+    new.weight.data = weight.clone()
+    if old.bias is not None:
+        bias = old.bias.detach()
+        new.bias.data = (bias[out_keep] if out_keep is not None else bias).clone()
+    conv.conv = new
+
+    if out_keep is not None and hasattr(conv, 'bn'):
+        old_bn = conv.bn
+        bn = nn.BatchNorm2d(len(out_keep), eps=old_bn.eps, momentum=old_bn.momentum).to(weight.device)
+        for name in ('weight', 'bias', 'running_mean', 'running_var'):
+            getattr(bn, name).data = getattr(old_bn, name).detach()[out_keep].clone()
+        bn.num_batches_tracked = old_bn.num_batches_tracked.clone()
+        conv.bn = bn
+
+
+def next_input_conv(layers, save, i):
+    """
+    找出唯一接收第 i 層輸出的 Conv（剪掉第 i 層的輸出通道時需同步縮小其輸入）
+
+    只處理可確定通道位置的情況：輸出只給下一層使用，下一層為 Conv / C2f / SPPF，
+    或是第一個輸入為 -1 的 Concat 再接上述模組。
+
+    Returns:
+        Conv 或 None
+    """
+    if i in save or i + 1 >= len(layers):
+        return None
+
+    following = layers[i + 1]
+    if isinstance(following, Concat):
+        # 第 i 層需為 Concat 的第一個輸入，通道位移才為 0
+        if i + 1 in save or following.f[0] != -1 or i + 2 >= len(layers):
+            return None
+        following = layers[i + 2]
+    if following.f != -1:
+        return None
+
+    if type(following) is Conv:
+        return following
+    if isinstance(following, (C2f, SPPF)):
+        return following.cv1
+    return None
+
+
+def prune_detector(model, ratio, criterion='l1', multiple=PRUNE_CHANNEL_MULTIPLE):
+    """
+    結構化剪除 YOLOv8 backbone 與 neck 的通道（Detect 頭不變）
+
+    可剪除的通道組:
+        - 輸出只流向下一個模組的 Conv 層（下一個模組的輸入同步縮小）
+        - C2f 內每個 Bottleneck 的隱藏通道
+        - SPPF 的隱藏通道（cv2 輸入為其 4 份串接）
+
+    每組依重要性排序後剪除 ratio 比例，保留數取 multiple 的倍數。模組類別不變，
+    剪枝後的模型可直接以 YOLO() 載入。
+
+    Args:
+        model: DetectionModel
+        ratio: 剪除比例 (0-1)
+        criterion: 通道重要性指標，'l1' 或 'bn'
+        multiple: 保留通道數的倍數
+
+    Returns:
+        list: 每組的 {'layer', 'channels', 'kept'}
+    """
+    import torch
+
+    layers = model.model
+    groups = []  # (名稱, 產生通道的 Conv, 接收的 Conv, 串接份數)
+    for i, layer in enumerate(layers[:-1]):
+        if type(layer) is Conv:
+            consumer = next_input_conv(layers, model.save, i)
+            if consumer is not None:
+                groups.append((f'model.{i}', layer, consumer, 1))
+        elif isinstance(layer, C2f):
+            for j, bottleneck in enumerate(layer.m):
+                groups.append((f'model.{i}.m.{j}', bottleneck.cv1, bottleneck.cv2, 1))
+        elif isinstance(layer, SPPF):
+            groups.append((f'model.{i}', layer.cv1, layer.cv2, 4))
+
+    summary = []
+    with torch.no_grad():
+        for name, producer, consumer, repeats in groups:
+            channels = producer.conv.out_channels
+            kept = max(multiple, int(round(channels * (1 - ratio) / multiple)) * multiple)
+            if producer.conv.groups != 1 or consumer.conv.groups != 1 or kept >= channels:
+                summary.append({'layer': name, 'channels': channels, 'kept': channels})
+                continue
+
+            scores = channel_importance(producer, criterion)
+            out_keep = torch.argsort(scores, descending=True)[:kept].sort().values
+            # 接收端的輸入：剪枝的通道在前（SPPF 為 4 份），其後為 Concat 的其他輸入
+            in_keep = torch.cat([out_keep + r * channels for r in range(repeats)] +
+                                [torch.arange(repeats * channels, consumer.conv.in_channels)])
+
+            slice_conv(producer, out_keep=out_keep)
+            slice_conv(consumer, in_keep=in_keep)
+            summary.append({'layer': name, 'channels': channels, 'kept': kept})
+
+    return summary
+
+
+class PrunedDetectionTrainer(DetectionTrainer):
+    """直接訓練傳入的（已剪枝）模型，不依 yaml 重建原尺寸的網路"""
+
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        """回傳剪枝後的模型本身"""
+        if weights is None:
+            return super().get_model(cfg, weights, verbose)
+        return weights
+
+
 class SupermarketModelTrainer:
     def __init__(self):
         """
@@ -49,8 +592,11 @@ nc: {len(self.product_classes)}
 names: {list(self.product_classes.values())}
 """
 
-        with open(output_path, 'w', encoding='utf-8') as f:
+        # 先寫入暫存檔再替換，平行的搜尋試驗不會讀到寫到一半的檔案
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             f.write(yaml_content)
+        os.replace(tmp_path, output_path)
 
         print(f"資料集配置檔案已建立: {output_path}")
         return output_path
@@ -93,6 +639,228 @@ names: {list(self.product_classes.values())}
         print("✓ 資料集結構檢查通過")
         return True
 
+    def validate_dataset(self, data_path, workers=None, use_cache=True):
+        """
+        檢查資料集內容並統計（圖片/標籤配對、標籤格式、類別範圍、座標範圍）
+
+        以 process pool 平行解析標籤，結果依檔案 mtime / 大小快取在資料集目錄，
+        再次驗證時只重新解析有變動的標籤。
+
+        Args:
+            data_path: 資料集根目錄路徑
+            workers: 平行行程數，預設為 CPU 數量
+            use_cache: 是否使用驗證快取
+
+        Returns:
+            dict: {'ok', 'errors', 'warnings', 'splits', 'class_counts', 'size_hist'}
+        """
+        data_path = Path(data_path)
+        images_root = data_path / 'images'
+        labels_root = data_path / 'labels'
+        cache_path = data_path / VALIDATION_CACHE_NAME
+
+        print("檢查資料集內容...")
+
+        cache = {}
+        if use_cache and cache_path.exists():
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('version') == VALIDATION_CACHE_VERSION:
+                    cache = cached.get('files', {})
+            except (OSError, ValueError):
+                cache = {}
+
+        errors = []
+        warnings = []
+        splits = {}
+        files = {}
+        stale = []
+
+        split_names = sorted({p.name for root in (images_root, labels_root) if root.exists()
+                              for p in root.iterdir() if p.is_dir()})
+        for split in split_names:
+            image_stems = set()
+            if (images_root / split).exists():
+                for entry in os.scandir(images_root / split):
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMG_FORMATS:
+                        image_stems.add(os.path.splitext(entry.name)[0])
+
+            label_stems = set()
+            if (labels_root / split).exists():
+                for entry in os.scandir(labels_root / split):
+                    if not (entry.is_file() and entry.name.endswith('.txt')):
+                        continue
+                    stem = entry.name[:-4]
+                    label_stems.add(stem)
+
+                    key = f"{split}/{entry.name}"
+                    stat = entry.stat()
+                    signature = [stat.st_mtime_ns, stat.st_size]
+                    cached = cache.get(key)
+                    if cached is not None and cached.get('signature') == signature:
+                        files[key] = cached
+                    else:
+                        files[key] = {'signature': signature}
+                        stale.append((key, entry.path))
+
+            for stem in sorted(label_stems - image_stems):
+                errors.append(f"{split}/{stem}.txt: 找不到對應的圖片")
+            background = len(image_stems - label_stems)
+            if background:
+                warnings.append(f"{split}: {background} 張圖片沒有標籤（視為背景圖片）")
+
+            splits[split] = {'images': len(image_stems), 'labels': len(label_stems), 'background': background}
+
+        # 平行解析有變動的標籤檔
+        if stale:
+            paths = [path for _, path in stale]
+            if len(stale) < PROCESS_POOL_MIN_FILES or workers == 1:
+                results = [scan_label_file(path) for path in paths]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(scan_label_file, paths, chunksize=64))
+            for (key, _), result in zip(stale, results):
+                files[key].update(result)
+
+        # 彙總統計
+        nc = len(self.product_classes)
+        class_counts = Counter()
+        size_hist = [0] * len(BOX_SIZE_BINS)
+        for key, result in sorted(files.items()):
+            for message in result['errors']:
+                errors.append(f"{key}: {message}")
+            for class_id, count in result['class_counts'].items():
+                if int(class_id) >= nc:
+                    errors.append(f"{key}: 類別 {class_id} 超出範圍 (nc={nc})")
+                class_counts[int(class_id)] += count
+            size_hist = [a + b for a, b in zip(size_hist, result['size_hist'])]
+
+        if use_cache:
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': VALIDATION_CACHE_VERSION, 'files': files}, f)
+            except OSError as e:
+                print(f"⚠️ 無法寫入驗證快取: {e}")
+
+        # 輸出報告
+        for split, counts in splits.items():
+            print(f"✓ {split}: {counts['images']} 張圖片, {counts['labels']} 個標籤")
+        print(f"✓ 標籤檔 {len(files)} 個（重新解析 {len(stale)} 個）")
+
+        print("類別實例數:")
+        for class_id in range(nc):
+            print(f"   {class_id} {self.product_classes[class_id]}: {class_counts.get(class_id, 0)}")
+            if class_counts.get(class_id, 0) == 0:
+                warnings.append(f"類別 {class_id} ({self.product_classes[class_id]}) 沒有任何標註")
+
+        print("標註框尺寸分布 (sqrt(寬x高)):")
+        lower = 0.0
+        for bound, count in zip(BOX_SIZE_BINS, size_hist):
+            print(f"   {lower:.2f} - {bound:.2f}: {count}")
+            lower = bound
+
+        for message in warnings:
+            print(f"⚠️ {message}")
+        if errors:
+            print(f"❌ 發現 {len(errors)} 個錯誤:")
+            for message in errors[:50]:
+                print(f"   - {message}")
+            if len(errors) > 50:
+                print(f"   ... 其餘 {len(errors) - 50} 個錯誤省略")
+        else:
+            print("✓ 資料集內容檢查通過")
+
+        return {
+            'ok': not errors,
+            'errors': errors,
+            'warnings': warnings,
+            'splits': splits,
+            'class_counts': dict(class_counts),
+            'size_hist': size_hist
+        }
+
+    def load_catalog_classes(self, mongodb_url=CATALOG_MONGODB_URL, db_name=CATALOG_DB_NAME):
+        """
+        從 MongoDB products collection 讀取商品類別（yolo_class_id / yolo_class_name）
+
+        Args:
+            mongodb_url: MongoDB 連線字串
+            db_name: 資料庫名稱
+
+        Returns:
+            dict: {類別 ID: 類別名稱}
+        """
+        from pymongo import MongoClient
+
+        client = MongoClient(mongodb_url, serverSelectionTimeoutMS=5000)
+        try:
+            docs = list(client[db_name].products.find(
+                {}, {'yolo_class_id': 1, 'yolo_class_name': 1}
+            ).sort('yolo_class_id', 1))
+        finally:
+            client.close()
+
+        classes = {int(doc['yolo_class_id']): doc['yolo_class_name'] for doc in docs}
+        if not classes:
+            raise ValueError("products collection 中沒有商品")
+        if sorted(classes) != list(range(len(classes))):
+            raise ValueError(f"商品的 yolo_class_id 必須從 0 開始連續: {sorted(classes)}")
+
+        self.product_classes = classes
+        print(f"✓ 從商品目錄載入 {len(classes)} 個類別")
+        return classes
+
+    def load_model_classes(self, weights_path):
+        """
+        以既有模型的類別取代預設類別（量化、剪枝沿用模型原本的類別）
+
+        Args:
+            weights_path: 模型路徑 (best.pt)
+
+        Returns:
+            dict: {類別 ID: 類別名稱}
+        """
+        classes = dict(YOLO(str(weights_path)).names)
+        self.product_classes = classes
+        print(f"✓ 從 {weights_path} 載入 {len(classes)} 個類別")
+        return classes
+
+    def finetune(self, data_path, weights_path, freeze=10, **training_params):
+        """
+        以目前的模型為起點，凍結 backbone 微調新增的商品類別
+
+        Args:
+            data_path: 資料集根目錄路徑
+            weights_path: 起始模型 (best.pt)
+            freeze: 凍結的前幾層（YOLOv8 的 backbone 為前 10 層）
+            **training_params: 訓練參數
+
+        Returns:
+            訓練結果
+        """
+        self.model = YOLO(str(weights_path))
+        old_names = self.model.names
+        print(f"從 {weights_path} 微調（原本 {len(old_names)} 個類別）")
+
+        for class_id, name in self.product_classes.items():
+            if name not in old_names.values():
+                print(f"   + 新類別 {class_id}: {name}")
+            elif old_names.get(class_id) != name:
+                print(f"   ~ 類別 {name} 的 ID 變更為 {class_id}")
+
+        yaml_path = self.create_dataset_yaml(data_path)
+
+        params = {
+            'epochs': 30,
+            'lr0': 0.002,
+            'patience': 10,
+            'freeze': freeze,
+            'trainer': CatalogFinetuneTrainer
+        }
+        params.update(training_params)
+        return self.train_model(yaml_path, **params)
+
     def train_model(self, data_yaml_path, **training_params):
         """
         訓練YOLO模型
@@ -120,6 +888,19 @@ names: {list(self.product_classes.values())}
 
         # 更新參數
         default_params.update(training_params)
+        image_cache = default_params.pop('image_cache', False)
+        trainer = default_params.pop('trainer', None)
+
+        # 使用預先縮放的 memmap 影像快取（必要時先建立或更新）
+        if image_cache:
+            with open(data_yaml_path, 'r', encoding='utf-8') as f:
+                data_path = yaml.safe_load(f)['path']
+            for split in ('train', 'val'):
+                build_image_cache(data_path, split, default_params['imgsz'])
+            if trainer is None:
+                trainer = MemmapDetectionTrainer
+            else:
+                trainer = type(trainer.__name__, (trainer, MemmapDetectionTrainer), {})
 
         print("開始訓練模型...")
         print(f"訓練參數: {default_params}")
@@ -128,6 +909,7 @@ names: {list(self.product_classes.values())}
             # 訓練模型
             results = self.model.train(
                 data=data_yaml_path,
+                trainer=trainer,
                 **default_params
             )
 
@@ -140,6 +922,131 @@ names: {list(self.product_classes.values())}
             print(f"❌ 訓練過程發生錯誤: {e}")
             raise
 
+    def quantize_model(self, weights_path, data_yaml_path, imgsz=640, tolerance=0.01,
+                       thread_counts=(1, 2, 4), images=50):
+        """
+        INT8 訓練後量化並與 FP32 模型比較
+
+        以 OpenVINO 匯出並用驗證集校正（NNCF 靜態量化），比較 FP32 best.pt 與
+        INT8 模型的 mAP 及各執行緒數下的 p50/p99 延遲；mAP50-95 下降小於
+        tolerance 時才標記為可部署。
+
+        Args:
+            weights_path: FP32 模型路徑 (best.pt)
+            data_yaml_path: 資料集 YAML（校正與評估使用 val）
+            imgsz: 輸入圖片尺寸
+            tolerance: 可接受的 mAP50-95 下降（絕對值）
+            thread_counts: 量測延遲的 CPU 執行緒數
+            images: 量測延遲使用的驗證圖片數
+
+        Returns:
+            dict: 比較報告（同時寫入 INT8 模型目錄的 quantization_report.json）
+        """
+        print(f"INT8 量化: {weights_path}")
+        int8_path = YOLO(str(weights_path)).export(format='openvino', int8=True,
+                                                   data=data_yaml_path, imgsz=imgsz)
+        print(f"✓ INT8 模型已匯出: {int8_path}")
+
+        with open(data_yaml_path, 'r', encoding='utf-8') as f:
+            data_path = yaml.safe_load(f)['path']
+        val_images = list_val_images(data_path, images)
+
+        results = {
+            label: evaluate_model(path, data_yaml_path, imgsz, thread_counts, val_images)
+            for label, path in (('fp32', weights_path), ('int8', int8_path))
+        }
+
+        drop = results['fp32']['map50_95'] - results['int8']['map50_95']
+        report = {
+            **results,
+            'map50_95_drop': round(drop, 4),
+            'tolerance': tolerance,
+            'deployable': drop < tolerance
+        }
+        with open(Path(int8_path) / 'quantization_report.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print("\n=== FP32 vs INT8 ===")
+        print_model_comparison(results, thread_counts)
+        print(f"mAP50-95 下降: {drop:.4f} (容許 {tolerance})")
+
+        if report['deployable']:
+            print(f"✅ INT8 模型可部署: 設定 YOLO_MODEL_PATH={int8_path}")
+        else:
+            print("❌ INT8 模型精度下降超過容許值，不建議部署")
+        return report
+
+    def prune_model(self, weights_path, data_path, ratio=0.3, criterion='l1',
+                    thread_counts=(1, 2, 4), images=50, **training_params):
+        """
+        結構化通道剪枝後微調，並與原模型比較速度與精度
+
+        Args:
+            weights_path: 原模型路徑 (best.pt)
+            data_path: 資料集根目錄路徑
+            ratio: backbone / neck 各通道組剪除的比例
+            criterion: 通道重要性指標，'l1' 或 'bn'
+            thread_counts: 量測延遲的 CPU 執行緒數
+            images: 量測延遲使用的驗證圖片數
+            **training_params: 微調訓練參數
+
+        Returns:
+            dict: 比較報告（同時寫入訓練目錄的 prune_report.json）
+        """
+        self.model = YOLO(str(weights_path))
+        print(f"通道剪枝: {weights_path}（剪除 {ratio:.0%}，指標 {criterion}）")
+
+        summary = prune_detector(self.model.model, ratio, criterion)
+        channels = sum(row['channels'] for row in summary)
+        kept = sum(row['kept'] for row in summary)
+        for row in summary:
+            if row['kept'] < row['channels']:
+                print(f"   {row['layer']:<14} {row['channels']:>4} -> {row['kept']}")
+        print(f"✓ 剪除 {channels - kept}/{channels} 個通道 ({(channels - kept) / channels:.1%})")
+
+        # 類別與資料集配置沿用原模型（CLI 已在驗證前載入，直接呼叫時在此補上）
+        self.product_classes = dict(self.model.names)
+        yaml_path = self.create_dataset_yaml(data_path)
+
+        params = {
+            'epochs': 10,
+            'lr0': 0.002,
+            'warmup_epochs': 1,
+            'patience': 10,
+            'trainer': PrunedDetectionTrainer
+        }
+        params.update(training_params)
+        self.train_model(yaml_path, **params)
+        pruned_path = Path(self.model.trainer.save_dir) / 'weights' / 'best.pt'
+
+        imgsz = params.get('imgsz', 640)
+        val_images = list_val_images(data_path, images)
+        results = {}
+        for label, path in (('original', weights_path), ('pruned', pruned_path)):
+            results[label] = evaluate_model(path, yaml_path, imgsz, thread_counts, val_images)
+            model = YOLO(str(path)).model
+            results[label]['params'] = sum(p.numel() for p in model.parameters())
+            results[label]['gflops'] = round(get_flops(model, imgsz), 2)
+
+        report = {
+            **results,
+            'ratio': ratio,
+            'criterion': criterion,
+            'channels': {'before': channels, 'after': kept},
+            'layers': summary,
+            'map50_95_drop': round(results['original']['map50_95'] - results['pruned']['map50_95'], 4)
+        }
+        with open(pruned_path.parent.parent / 'prune_report.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print("\n=== 原模型 vs 剪枝模型 ===")
+        print_model_comparison(results, thread_counts)
+        for label, row in results.items():
+            print(f"{label.upper():<9}參數 {row['params']:,}  GFLOPs {row['gflops']}")
+        print(f"mAP50-95 下降: {report['map50_95_drop']:.4f}")
+        print(f"✅ 剪枝模型: {pruned_path}（可直接設定 YOLO_MODEL_PATH 使用）")
+        return report
+
     def resume_training(self, model_path, **training_params):
         """
         從檢查點恢復訓練
@@ -169,6 +1076,808 @@ names: {list(self.product_classes.values())}
         print("恢復訓練完成!")
         return results
 
+def read_results_csv(csv_path):
+    """
+    讀取 ultralytics 的 results.csv
+
+    Args:
+        csv_path: results.csv 路徑
+
+    Returns:
+        list: 每個 epoch 一筆 {欄位: 數值}（欄位名稱已去除空白）
+    """
+    rows = []
+    if not os.path.exists(csv_path):
+        return rows
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = None
+        for values in reader:
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row = {}
+            for name, value in zip(header, values):
+                try:
+                    row[name] = float(value)
+                except ValueError:
+                    row[name] = value.strip()
+            # 訓練中的最後一行可能尚未寫完
+            if len(row) == len(header):
+                rows.append(row)
+    return rows
+
+
+def benchmark_latency(weights_path, image_paths, imgsz=640, warmup=3):
+    """
+    量測模型在 CPU 上的單張推論延遲
+
+    Args:
+        weights_path: 模型權重路徑
+        image_paths: 測試圖片路徑列表
+        imgsz: 推論尺寸
+        warmup: 暖機次數（不計入統計）
+
+    Returns:
+        dict: {'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'images'}
+    """
+    model = YOLO(str(weights_path))
+    image_paths = [str(p) for p in image_paths]
+    if not image_paths:
+        return None
+
+    for path in image_paths[:warmup]:
+        model.predict(path, imgsz=imgsz, device='cpu', verbose=False)
+
+    timings = []
+    for path in image_paths:
+        start = time.perf_counter()
+        model.predict(path, imgsz=imgsz, device='cpu', verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return {
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        'images': len(timings)
+    }
+
+
+def limit_cpu_threads(threads):
+    """限制目前行程使用的 CPU 執行緒數（延遲量測子行程的 initializer）"""
+    if hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cpus[:threads])
+    import torch
+    torch.set_num_threads(threads)
+
+
+def benchmark_latency_threads(weights_path, image_paths, imgsz, threads):
+    """
+    在獨立子行程中以指定執行緒數量測推論延遲
+
+    Args:
+        weights_path: 模型路徑（.pt 或匯出的模型目錄）
+        image_paths: 測試圖片路徑列表
+        imgsz: 推論尺寸
+        threads: CPU 執行緒數
+
+    Returns:
+        dict: benchmark_latency 的結果
+    """
+    thread_vars = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+    saved = {var: os.environ.get(var) for var in thread_vars}
+    for var in thread_vars:
+        os.environ[var] = str(threads)
+    try:
+        # spawn 的子行程在匯入 torch 前就取得執行緒設定
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=limit_cpu_threads, initargs=(threads,)) as executor:
+            return executor.submit(benchmark_latency, str(weights_path),
+                                   [str(p) for p in image_paths], imgsz).result()
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def evaluate_model(model_path, data_yaml_path, imgsz, thread_counts, val_images):
+    """
+    評估模型的精度與各執行緒數下的 CPU 延遲（量化 / 剪枝比較用）
+
+    Returns:
+        dict: {'path', 'map50', 'map50_95', 'latency': {執行緒數: {'p50_ms', 'p99_ms'}}}
+    """
+    print(f"評估模型: {model_path}")
+    metrics = YOLO(str(model_path)).val(data=data_yaml_path, imgsz=imgsz, batch=1, device='cpu',
+                                        plots=False, verbose=False)
+    latency = {}
+    for threads in thread_counts:
+        result = benchmark_latency_threads(model_path, val_images, imgsz, threads)
+        if result:
+            latency[str(threads)] = {'p50_ms': result['p50_ms'], 'p99_ms': result['p99_ms']}
+    return {
+        'path': str(model_path),
+        'map50': round(float(metrics.box.map50), 4),
+        'map50_95': round(float(metrics.box.map), 4),
+        'latency': latency
+    }
+
+
+def print_model_comparison(results, thread_counts):
+    """列印 evaluate_model 結果的比較表"""
+    print(f"{'':<9}{'mAP50':>8}{'mAP50-95':>10}" + ''.join(f"{f'{t}T p50/p99(ms)':>20}" for t in thread_counts))
+    for label, row in results.items():
+        cells = ''.join(
+            f"{row['latency'][str(t)]['p50_ms']:>11.1f}/{row['latency'][str(t)]['p99_ms']:<8.1f}"
+            if str(t) in row['latency'] else f"{'-':>20}"
+            for t in thread_counts
+        )
+        print(f"{label.upper():<9}{row['map50']:>8.4f}{row['map50_95']:>10.4f}{cells}")
+
+
+def list_val_images(data_path, limit=50):
+    """取得驗證集圖片（依檔名排序，最多 limit 張）"""
+    val_dir = Path(data_path) / 'images' / 'val'
+    if not val_dir.exists():
+        return []
+    images = sorted(p for p in val_dir.iterdir() if p.suffix.lower() in IMG_FORMATS)
+    return images[:limit]
+
+
+def generate_trials(config):
+    """
+    依搜尋空間產生試驗參數
+
+    space 中的值可為列表（grid 的候選值 / random 隨機選擇），
+    或 {min, max, log, type} 範圍（僅 random）。
+
+    Args:
+        config: sweep 設定
+
+    Returns:
+        list: 每個試驗的訓練參數
+    """
+    base = dict(config.get('base', {}))
+    space = config.get('space', {})
+    method = config.get('method', 'grid')
+
+    if method == 'grid':
+        for name, values in space.items():
+            if not isinstance(values, list):
+                raise ValueError(f"grid 搜尋的 {name} 必須是列表")
+        names = list(space)
+        return [{**base, **dict(zip(names, combo))}
+                for combo in itertools.product(*(space[name] for name in names))]
+
+    if method == 'random':
+        rng = random.Random(config.get('seed', 0))
+        trials = []
+        for _ in range(config.get('trials', 10)):
+            params = dict(base)
+            for name, spec in space.items():
+                if isinstance(spec, list):
+                    params[name] = rng.choice(spec)
+                elif spec.get('log'):
+                    params[name] = math.exp(rng.uniform(math.log(spec['min']), math.log(spec['max'])))
+                else:
+                    params[name] = rng.uniform(spec['min'], spec['max'])
+                if isinstance(spec, dict) and spec.get('type') == 'int':
+                    params[name] = int(round(params[name]))
+            trials.append(params)
+        return trials
+
+    raise ValueError(f"不支援的搜尋方法: {method}")
+
+
+def best_until(rows, metric, epoch):
+    """取得到指定 epoch（含）為止的最佳指標"""
+    values = [row[metric] for row in rows[:epoch] if isinstance(row.get(metric), float)]
+    return max(values) if values else None
+
+
+def run_sweep(data_path, sweep_path, name, overwrite=False):
+    """
+    平行執行超參數搜尋
+
+    每個試驗為獨立的 train.py 子行程並限制 CPU 執行緒數；定期讀取各試驗的
+    results.csv，以中位數停止法提前終止落後的試驗，最後輸出 mAP50-95 與
+    CPU 推論延遲的排行榜。
+
+    Args:
+        data_path: 資料集根目錄路徑
+        sweep_path: sweep 設定 YAML
+        name: 實驗名稱前綴
+        overwrite: 是否刪除同名的既有試驗目錄（預設拒絕執行，避免覆蓋先前的結果）
+
+    Returns:
+        list: 排行榜（依 mAP50-95 由高到低）
+    """
+    with open(sweep_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+
+    trials = generate_trials(config)
+    parallel = config.get('parallel', max(1, (os.cpu_count() or 1) // 4))
+    threads = config.get('threads_per_trial', max(1, (os.cpu_count() or 1) // parallel))
+    early_stop = config.get('early_stop', {})
+    metric = early_stop.get('metric', 'metrics/mAP50-95(B)')
+    grace_epochs = early_stop.get('grace_epochs', 10)
+    check_interval = early_stop.get('check_interval', 30)
+    project_dir = Path('runs/detect').resolve()
+
+    existing = [project_dir / f"{name}_sweep_{index:02d}" for index in range(len(trials))]
+    existing = [path for path in existing if path.exists()]
+    if existing and not overwrite:
+        raise FileExistsError(
+            f"已有 {len(existing)} 個同名試驗目錄（如 {existing[0]}），請改用其他 --name 或加上 --overwrite"
+        )
+
+    print(f"=== 超參數搜尋: {len(trials)} 個試驗，同時執行 {parallel} 個，每個 {threads} 個執行緒 ===")
+
+    env = dict(os.environ)
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+        env[var] = str(threads)
+
+    pending = list(enumerate(trials))
+    running = {}
+    finished = []
+
+    def launch(index, params):
+        trial_name = f"{name}_sweep_{index:02d}"
+        trial_dir = project_dir / trial_name
+        if trial_dir.exists():
+            # 已確認 --overwrite；results.csv 以附加模式寫入，需先清除舊的試驗結果
+            shutil.rmtree(trial_dir)
+        trial_params = {**params, 'project': str(project_dir), 'exist_ok': True}
+        command = [sys.executable, os.path.abspath(__file__), '--data', data_path,
+                   '--name', trial_name, '--skip-validation', '--params', json.dumps(trial_params)]
+        log = open(project_dir / f"{trial_name}.log", 'w', encoding='utf-8')
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+        print(f"▶ 試驗 {index:02d} 開始: {params}")
+        return {'index': index, 'name': trial_name, 'params': params, 'process': process,
+                'log': log, 'dir': trial_dir, 'status': 'running'}
+
+    # 平行試驗共用影像快取，先在主行程建立好
+    for imgsz in sorted({params.get('imgsz', 640) for params in trials if params.get('image_cache')}):
+        for split in ('train', 'val'):
+            build_image_cache(data_path, split, imgsz)
+
+    project_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        while pending or running:
+            while pending and len(running) < parallel:
+                index, params = pending.pop(0)
+                running[index] = launch(index, params)
+
+            time.sleep(check_interval)
+
+            curves = {t['index']: read_results_csv(t['dir'] / 'results.csv')
+                      for t in list(running.values()) + finished}
+
+            for index, trial in list(running.items()):
+                code = trial['process'].poll()
+                if code is not None:
+                    trial['status'] = 'completed' if code == 0 else f'failed ({code})'
+                    trial['log'].close()
+                    finished.append(running.pop(index))
+                    print(f"■ 試驗 {index:02d} 結束: {trial['status']}")
+                    continue
+
+                # 中位數停止法：落後於其他試驗同 epoch 最佳值的中位數即終止
+                epoch = len(curves[index])
+                if epoch < grace_epochs:
+                    continue
+                current = best_until(curves[index], metric, epoch)
+                others = [best_until(rows, metric, epoch) for other, rows in curves.items()
+                          if other != index and len(rows) >= epoch]
+                others = sorted(v for v in others if v is not None)
+                if current is None or len(others) < 2:
+                    continue
+                median = others[len(others) // 2] if len(others) % 2 else \
+                    (others[len(others) // 2 - 1] + others[len(others) // 2]) / 2
+                if current < median:
+                    trial['process'].terminate()
+                    trial['process'].wait()
+                    trial['log'].close()
+                    trial['status'] = f'stopped@{epoch}'
+                    finished.append(running.pop(index))
+                    print(f"✂ 試驗 {index:02d} 提前終止 (epoch {epoch}: {current:.4f} < 中位數 {median:.4f})")
+    except KeyboardInterrupt:
+        print("\n⚠️ 搜尋被中斷，終止執行中的試驗")
+        for trial in running.values():
+            trial['process'].terminate()
+            trial['log'].close()
+            trial['status'] = 'interrupted'
+            finished.append(trial)
+
+    # 所有試驗結束後依序量測延遲，避免互相搶 CPU
+    val_images = list_val_images(data_path)
+    imgsz = config.get('base', {}).get('imgsz', 640)
+    leaderboard = []
+    for trial in sorted(finished, key=lambda t: t['index']):
+        rows = read_results_csv(trial['dir'] / 'results.csv')
+        best_weights = trial['dir'] / 'weights' / 'best.pt'
+        latency = None
+        if best_weights.exists() and val_images:
+            latency = benchmark_latency(best_weights, val_images, imgsz=trial['params'].get('imgsz', imgsz))
+        leaderboard.append({
+            'trial': trial['index'],
+            'name': trial['name'],
+            'status': trial['status'],
+            'epochs': len(rows),
+            'map50_95': best_until(rows, metric, len(rows)),
+            'latency_ms': latency['mean_ms'] if latency else None,
+            'params': trial['params']
+        })
+
+    leaderboard.sort(key=lambda r: r['map50_95'] if r['map50_95'] is not None else -1, reverse=True)
+
+    mark_pareto(leaderboard)
+
+    leaderboard_path = project_dir / f"{name}_sweep_leaderboard.csv"
+    with open(leaderboard_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['trial', 'name', 'status', 'epochs', 'mAP50-95', 'latency_ms', 'pareto', 'params'])
+        for row in leaderboard:
+            writer.writerow([row['trial'], row['name'], row['status'], row['epochs'], row['map50_95'],
+                             row['latency_ms'], row['pareto'], json.dumps(row['params'], ensure_ascii=False)])
+
+    print("\n=== 搜尋排行榜 ===")
+    print(f"{'試驗':<6}{'狀態':<14}{'epochs':>7}{'mAP50-95':>10}{'延遲(ms)':>10}  參數")
+    for row in leaderboard:
+        map_text = f"{row['map50_95']:.4f}" if row['map50_95'] is not None else '-'
+        latency_text = f"{row['latency_ms']:.1f}" if row['latency_ms'] is not None else '-'
+        mark = '★' if row['pareto'] else ' '
+        print(f"{mark}{row['trial']:<5}{row['status']:<14}{row['epochs']:>7}{map_text:>10}{latency_text:>10}  {row['params']}")
+    print(f"★ = 準確度/延遲 Pareto 最佳")
+    print(f"排行榜已儲存至: {leaderboard_path}")
+
+    return leaderboard
+
+def mark_pareto(rows, accuracy_key='map50_95', latency_key='latency_ms'):
+    """標記準確度/延遲 Pareto 最佳（沒有其他項目同時更準又更快）"""
+    for row in rows:
+        row['pareto'] = row[accuracy_key] is not None and row[latency_key] is not None and not any(
+            other is not row and other[accuracy_key] is not None and other[latency_key] is not None
+            and other[accuracy_key] >= row[accuracy_key] and other[latency_key] <= row[latency_key]
+            and (other[accuracy_key] > row[accuracy_key] or other[latency_key] < row[latency_key])
+            for other in rows
+        )
+
+
+# 比較訓練參數時忽略的欄位（每次執行必然不同）
+REPORT_IGNORED_ARGS = {'name', 'save_dir', 'project', 'exist_ok', 'resume', 'model'}
+
+
+def summarize_run(run_dir, convergence=0.9):
+    """
+    整理單次訓練的結果
+
+    Args:
+        run_dir: runs/detect/<name> 目錄
+        convergence: 收斂門檻（達到最佳 mAP50-95 的比例）
+
+    Returns:
+        dict: 最佳 epoch 指標、每 epoch 耗時、收斂速度與訓練參數，沒有 results.csv 時為 None
+    """
+    run_dir = Path(run_dir)
+    rows = read_results_csv(run_dir / 'results.csv')
+    if not rows:
+        return None
+
+    args = {}
+    args_path = run_dir / 'args.yaml'
+    if args_path.exists():
+        with open(args_path, 'r', encoding='utf-8') as f:
+            args = yaml.safe_load(f) or {}
+
+    # 與 ultralytics 相同的 fitness 選出最佳 epoch
+    def fitness(row):
+        return 0.1 * row.get('metrics/mAP50(B)', 0) + 0.9 * row.get('metrics/mAP50-95(B)', 0)
+    best = max(rows, key=fitness)
+
+    # 每 epoch 耗時：新版 ultralytics 有 time 欄位，否則以檔案時間估計
+    if isinstance(rows[-1].get('time'), float):
+        epoch_seconds = rows[-1]['time'] / len(rows)
+    elif args_path.exists():
+        elapsed = (run_dir / 'results.csv').stat().st_mtime - args_path.stat().st_mtime
+        epoch_seconds = elapsed / len(rows) if elapsed > 0 else None
+    else:
+        epoch_seconds = None
+
+    best_map = best.get('metrics/mAP50-95(B)', 0)
+    converged_epoch = next((i + 1 for i, row in enumerate(rows)
+                            if row.get('metrics/mAP50-95(B)', 0) >= convergence * best_map), None)
+
+    return {
+        'name': run_dir.name,
+        'dir': run_dir,
+        'args': args,
+        'curve': [row.get('metrics/mAP50-95(B)') for row in rows],
+        'epochs': len(rows),
+        'best_epoch': int(best.get('epoch', rows.index(best) + 1)),
+        'precision': best.get('metrics/precision(B)'),
+        'recall': best.get('metrics/recall(B)'),
+        'map50': best.get('metrics/mAP50(B)'),
+        'map50_95': best_map,
+        'epoch_seconds': epoch_seconds,
+        'converged_epoch': converged_epoch,
+        'latency_ms': None
+    }
+
+
+def report_main(argv):
+    """
+    比較 runs/detect 下所有訓練結果
+
+    對齊各次訓練的 mAP50-95 曲線，列出最佳 epoch 指標、每 epoch 耗時、
+    收斂速度、參數差異與 best.pt 的 CPU 推論延遲，並與基準比較速度退步。
+    """
+    parser = argparse.ArgumentParser(prog='train.py report', description='訓練結果比較報告')
+    parser.add_argument('--runs', type=str, default='runs/detect',
+                       help='訓練結果目錄 (預設: runs/detect)')
+    parser.add_argument('--data', type=str, default=None,
+                       help='量測延遲用的資料集根目錄（預設取自各次訓練的 args.yaml）')
+    parser.add_argument('--baseline', type=str, default=None,
+                       help='速度比較的基準訓練名稱（預設: 最早的訓練）')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                       help='速度退步警告門檻百分比 (預設: 10)')
+    parser.add_argument('--convergence', type=float, default=0.9,
+                       help='收斂門檻：達到最佳 mAP50-95 的比例 (預設: 0.9)')
+    parser.add_argument('--images', type=int, default=50,
+                       help='量測延遲使用的驗證圖片數 (預設: 50)')
+    parser.add_argument('--no-latency', action='store_true',
+                       help='不量測推論延遲')
+    args = parser.parse_args(argv)
+
+    runs_dir = Path(args.runs)
+    run_dirs = sorted((p for p in runs_dir.iterdir() if (p / 'results.csv').exists()),
+                      key=lambda p: (p / 'results.csv').stat().st_mtime) if runs_dir.exists() else []
+    runs = [run for run in (summarize_run(p, args.convergence) for p in run_dirs) if run is not None]
+    if not runs:
+        print(f"❌ {runs_dir} 下沒有訓練結果")
+        return
+
+    print(f"=== 訓練結果比較: {len(runs)} 次訓練 ===")
+
+    # 推論延遲（依序量測，避免互相干擾）
+    if not args.no_latency:
+        for run in runs:
+            weights = run['dir'] / 'weights' / 'best.pt'
+            data_path = args.data
+            if data_path is None and run['args'].get('data') and os.path.exists(run['args']['data']):
+                with open(run['args']['data'], 'r', encoding='utf-8') as f:
+                    data_path = (yaml.safe_load(f) or {}).get('path')
+            images = list_val_images(data_path, args.images) if data_path else []
+            if weights.exists() and images:
+                print(f"量測 {run['name']} 推論延遲...")
+                latency = benchmark_latency(weights, images, imgsz=run['args'].get('imgsz', 640))
+                run['latency_ms'] = latency['mean_ms']
+
+    mark_pareto(runs)
+
+    baseline = next((run for run in runs if run['name'] == args.baseline), runs[0])
+
+    def delta(value, base):
+        if value is None or not base:
+            return '', False
+        percent = (value - base) / base * 100
+        return f"({percent:+.0f}%)", percent > args.threshold
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+
+    print(f"\n基準: {baseline['name']}")
+    print(f"{'訓練':<32}{'best':>6}{'P':>7}{'R':>7}{'mAP50':>8}{'mAP50-95':>10}"
+          f"{'秒/epoch':>16}{'收斂epoch':>10}{'延遲(ms)':>18}")
+    regressions = []
+    for run in runs:
+        epoch_delta, epoch_slow = delta(run['epoch_seconds'], baseline['epoch_seconds'])
+        latency_delta, latency_slow = delta(run['latency_ms'], baseline['latency_ms'])
+        if epoch_slow:
+            regressions.append(f"{run['name']}: 每 epoch 耗時 {epoch_delta}")
+        if latency_slow:
+            regressions.append(f"{run['name']}: 推論延遲 {latency_delta}")
+        mark = '★' if run['pareto'] else ' '
+        print(f"{mark}{run['name']:<31}{run['best_epoch']:>6}{fmt(run['precision'], '.3f'):>7}"
+              f"{fmt(run['recall'], '.3f'):>7}{fmt(run['map50'], '.3f'):>8}{fmt(run['map50_95'], '.4f'):>10}"
+              f"{fmt(run['epoch_seconds'], '.1f'):>9}{epoch_delta:>7}{fmt(run['converged_epoch'], 'd'):>10}"
+              f"{fmt(run['latency_ms'], '.1f'):>10}{latency_delta:>8}")
+    print(f"★ = 準確度/延遲 Pareto 最佳；收斂 epoch = 首次達到最佳 mAP50-95 的 {args.convergence:.0%}")
+
+    # 參數差異
+    keys = sorted({key for run in runs for key in run['args']} - REPORT_IGNORED_ARGS)
+    differing = [key for key in keys if len({str(run['args'].get(key)) for run in runs}) > 1]
+    if differing:
+        print("\n參數差異:")
+        for run in runs:
+            values = ', '.join(f"{key}={run['args'].get(key)}" for key in differing)
+            print(f"  {run['name']}: {values}")
+
+    # 對齊的 mAP50-95 曲線
+    max_epochs = max(run['epochs'] for run in runs)
+    step = max(1, max_epochs // 10)
+    checkpoints = sorted(set(range(step, max_epochs + 1, step)) | {max_epochs})
+    print("\nmAP50-95 曲線（依 epoch 對齊）:")
+    print(f"{'epoch':<32}" + ''.join(f"{e:>8}" for e in checkpoints))
+    for run in runs:
+        values = [run['curve'][e - 1] if e <= run['epochs'] else None for e in checkpoints]
+        print(f"{run['name']:<32}" + ''.join(f"{fmt(v, '.3f'):>8}" for v in values))
+
+    curves_path = runs_dir / 'report_curves.csv'
+    with open(curves_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['epoch'] + [run['name'] for run in runs])
+        for epoch in range(1, max_epochs + 1):
+            writer.writerow([epoch] + [run['curve'][epoch - 1] if epoch <= run['epochs'] else '' for run in runs])
+    print(f"完整曲線已儲存至: {curves_path}")
+
+    if regressions:
+        print(f"\n⚠️ 速度退步（相對 {baseline['name']} 超過 {args.threshold:.0f}%）:")
+        for message in regressions:
+            print(f"   - {message}")
+
+def image_phash(image_path):
+    """
+    計算圖片與其水平翻轉的感知雜湊（pHash，64 位元，在子行程中執行）
+
+    Args:
+        image_path: 圖片路徑
+
+    Returns:
+        tuple: (雜湊, 翻轉雜湊)，無法讀取時為 None
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+
+    small = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    hashes = []
+    for im in (small, small[:, ::-1]):
+        low = cv2.dct(np.ascontiguousarray(im))[:8, :8].flatten()
+        bits = low > np.median(low[1:])
+        hashes.append(int(''.join('1' if b else '0' for b in bits), 2))
+    return hashes[0], hashes[1]
+
+
+def source_key(filename):
+    """Roboflow 匯出檔名（<來源>_jpg.rf.<雜湊>.jpg）中的來源照片名稱"""
+    stem = Path(filename).stem
+    if '.rf.' in stem:
+        stem = stem.split('.rf.')[0]
+        for ext in IMG_FORMATS:
+            suffix = '_' + ext[1:]
+            if stem.lower().endswith(suffix):
+                return stem[:-len(suffix)]
+    return None
+
+
+def find_duplicates(data_path, threshold=6, workers=None, use_cache=True):
+    """
+    以感知雜湊與 Roboflow 來源檔名將近似重複的圖片分群
+
+    雜湊依檔案 mtime / 大小快取在資料集目錄，重跑時只計算變動的圖片。
+    分群以 8 段 8 位元的雜湊分段找出候選配對（漢明距離 < 8 時至少一段相同），
+    原圖與水平翻轉的雜湊都放入分段桶，再以完整漢明距離（含水平翻轉）確認。
+
+    Args:
+        data_path: 資料集根目錄路徑
+        threshold: 視為重複的最大漢明距離（需小於 8）
+        workers: 平行行程數，預設為 CPU 數量
+        use_cache: 是否使用雜湊快取
+
+    Returns:
+        list: 群組列表，每個群組為 [(split, 相對路徑), ...]
+    """
+    if threshold >= 8:
+        raise ValueError("threshold 必須小於 8")
+
+    images_root = Path(data_path) / 'images'
+    cache_path = Path(data_path) / HASH_CACHE_NAME
+
+    cache = {}
+    if use_cache and cache_path.exists():
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == HASH_CACHE_VERSION:
+                cache = cached.get('files', {})
+        except (OSError, ValueError):
+            cache = {}
+
+    entries = {}
+    stale = []
+    for split_dir in sorted(p for p in images_root.iterdir() if p.is_dir()):
+        for path in sorted(split_dir.rglob('*')):
+            if not (path.is_file() and path.suffix.lower() in IMG_FORMATS):
+                continue
+            key = path.relative_to(images_root).as_posix()
+            stat = path.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            cached = cache.get(key)
+            if cached is not None and cached.get('signature') == signature:
+                entries[key] = cached
+            else:
+                entries[key] = {'signature': signature}
+                stale.append((key, str(path)))
+
+    if stale:
+        print(f"計算感知雜湊: {len(stale)}/{len(entries)} 張...")
+        paths = [path for _, path in stale]
+        if len(stale) < PROCESS_POOL_MIN_FILES or workers == 1:
+            results = [image_phash(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(image_phash, paths, chunksize=32))
+        for (key, _), hashes in zip(stale, results):
+            entries[key]['hash'] = list(hashes) if hashes else None
+
+    if use_cache:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': HASH_CACHE_VERSION, 'files': entries}, f)
+
+    keys = sorted(entries)
+    position = {key: i for i, key in enumerate(keys)}
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    # 同一張來源照片的 Roboflow 變體
+    by_source = {}
+    for key in keys:
+        source = source_key(key)
+        if source is not None:
+            by_source.setdefault(source, []).append(position[key])
+    for members in by_source.values():
+        for member in members[1:]:
+            union(members[0], member)
+
+    # 感知雜湊近似重複：分段建桶找候選，再確認漢明距離
+    # 翻轉雜湊也要入桶，否則翻轉副本只有碰巧與原圖共用某段時才會被比對
+    buckets = {}
+    for key in keys:
+        hashes = entries[key].get('hash')
+        if not hashes:
+            continue
+        for value in hashes:
+            for band in range(8):
+                buckets.setdefault((band, (value >> (band * 8)) & 0xFF), set()).add(position[key])
+    for members in buckets.values():
+        members = sorted(members)
+        for i, a in enumerate(members):
+            hash_a, flip_a = entries[keys[a]]['hash']
+            for b in members[i + 1:]:
+                if find(a) == find(b):
+                    continue
+                hash_b, flip_b = entries[keys[b]]['hash']
+                distance = min(bin(hash_a ^ hash_b).count('1'), bin(flip_a ^ hash_b).count('1'),
+                               bin(hash_a ^ flip_b).count('1'))
+                if distance <= threshold:
+                    union(a, b)
+
+    groups = {}
+    for key in keys:
+        groups.setdefault(find(position[key]), []).append(tuple(key.split('/', 1)))
+    return list(groups.values())
+
+
+def dedup_main(argv):
+    """
+    找出近似重複圖片與 train/val 資料洩漏，並可依來源群組重新切分資料集
+    """
+    parser = argparse.ArgumentParser(prog='train.py dedup', description='近似重複與資料洩漏檢查')
+    parser.add_argument('--data', type=str, required=True,
+                       help='資料集根目錄路徑')
+    parser.add_argument('--threshold', type=int, default=6,
+                       help='視為重複的最大漢明距離 (預設: 6，需小於 8)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='平行行程數 (預設: CPU 數量)')
+    parser.add_argument('--resplit', action='store_true',
+                       help='依群組重新切分 train/val（同一群組只會在一個 split；含 test 圖片的群組整組移到 test）')
+    parser.add_argument('--val-ratio', type=float, default=0.2,
+                       help='重新切分時的驗證集比例 (預設: 0.2)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='重新切分的隨機種子 (預設: 0)')
+    parser.add_argument('--apply', action='store_true',
+                       help='實際搬移檔案（未指定時只顯示計畫）')
+    args = parser.parse_args(argv)
+
+    data_path = Path(args.data)
+    groups = find_duplicates(data_path, args.threshold, args.workers)
+
+    total = sum(len(group) for group in groups)
+    duplicated = [group for group in groups if len(group) > 1]
+    leaking = [group for group in duplicated if len({split for split, _ in group}) > 1]
+
+    print(f"=== 近似重複檢查: {total} 張圖片, {len(groups)} 個群組 ===")
+    print(f"✓ 含重複的群組: {len(duplicated)} 個 ({sum(len(g) for g in duplicated)} 張)")
+    if leaking:
+        leaked_val = sum(1 for group in leaking for split, _ in group if split == 'val')
+        leaked_test = sum(1 for group in leaking for split, _ in group if split == 'test')
+        print(f"⚠️ 跨 split 的群組: {len(leaking)} 個，val 中有 {leaked_val} 張、test 中有 {leaked_test} 張"
+              f"圖片與其他 split 重複")
+        for group in leaking[:20]:
+            print(f"   - {', '.join(f'{split}/{name}' for split, name in sorted(group))}")
+        if len(leaking) > 20:
+            print(f"   ... 其餘 {len(leaking) - 20} 個群組省略")
+    else:
+        print("✓ 沒有跨 split 的重複圖片")
+
+    report_path = data_path / 'dedup_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'images': total,
+            'groups': len(groups),
+            'duplicate_groups': [[f'{s}/{n}' for s, n in group] for group in duplicated],
+            'leaking_groups': [[f'{s}/{n}' for s, n in group] for group in leaking]
+        }, f, ensure_ascii=False, indent=2)
+    print(f"報告已儲存至: {report_path}")
+
+    if not args.resplit:
+        return
+
+    # 含 test 圖片的群組整組移到 test，保持 test 與訓練資料不重疊
+    held_out = [group for group in groups if any(split == 'test' for split, _ in group)]
+    remaining = [group for group in groups if not any(split == 'test' for split, _ in group)]
+    moves = [
+        (current, 'test', name)
+        for group in held_out for current, name in group
+        if current in ('train', 'val')
+    ]
+    if moves:
+        print(f"\n⚠️ {len(moves)} 張 train/val 圖片與 test 重複，將移到 test")
+
+    # 其餘群組以群組為單位隨機分配，直到驗證集達到目標比例
+    rng = random.Random(args.seed)
+    order = sorted(remaining, key=lambda g: sorted(g))
+    rng.shuffle(order)
+    trainval = sum(len(group) for group in remaining)
+    target = args.val_ratio * trainval
+    val_count = 0
+    for group in order:
+        split = 'val' if val_count + len(group) / 2 <= target else 'train'
+        if split == 'val':
+            val_count += len(group)
+        for current, name in group:
+            if current != split and current in ('train', 'val'):
+                moves.append((current, split, name))
+
+    print(f"\n重新切分: val {val_count} 張 ({val_count / max(trainval, 1):.0%}), 需搬移 {len(moves)} 張")
+    for current, split, name in moves[:20]:
+        print(f"   {current} → {split}: {name}")
+    if len(moves) > 20:
+        print(f"   ... 其餘 {len(moves) - 20} 張省略")
+
+    if not args.apply:
+        print("（未搬移檔案，加上 --apply 執行）")
+        return
+
+    for current, split, name in moves:
+        for root, suffix in (('images', None), ('labels', '.txt')):
+            source = data_path / root / current / name
+            if suffix:
+                source = source.with_suffix(suffix)
+            if not source.exists():
+                continue
+            destination = data_path / root / split / source.relative_to(data_path / root / current)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, destination)
+    print(f"✅ 已搬移 {len(moves)} 張圖片與標籤")
+
 def main():
     """
     主要執行函數
@@ -191,6 +1900,38 @@ def main():
                        help='實驗名稱')
     parser.add_argument('--patience', type=int, default=50,
                        help='早停耐心值 (預設: 50)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='資料集驗證的平行行程數 (預設: CPU 數量)')
+    parser.add_argument('--validate-only', action='store_true',
+                       help='只驗證資料集，不進行訓練')
+    parser.add_argument('--skip-validation', action='store_true',
+                       help='略過資料集內容驗證')
+    parser.add_argument('--image-cache', action='store_true',
+                       help='使用預先縮放的 memmap 影像快取訓練（CPU 訓練可省去 JPEG 解碼）')
+    parser.add_argument('--build-image-cache', action='store_true',
+                       help='只建立 memmap 影像快取，不進行訓練')
+    parser.add_argument('--quantize', type=str, default=None,
+                       help='將指定的 FP32 模型 (best.pt) 做 INT8 量化並比較精度與延遲')
+    parser.add_argument('--int8-tolerance', type=float, default=0.01,
+                       help='INT8 可部署的 mAP50-95 下降上限 (預設: 0.01)')
+    parser.add_argument('--bench-threads', type=str, default='1,2,4',
+                       help='量測延遲的 CPU 執行緒數，以逗號分隔 (預設: 1,2,4)')
+    parser.add_argument('--prune', type=str, default=None,
+                       help='對指定模型 (best.pt) 做結構化通道剪枝並微調')
+    parser.add_argument('--prune-ratio', type=float, default=0.3,
+                       help='每組通道剪除的比例 (預設: 0.3)')
+    parser.add_argument('--prune-criterion', type=str, choices=['l1', 'bn'], default='l1',
+                       help='通道重要性指標：卷積核 L1 範數或 BatchNorm 係數 (預設: l1)')
+    parser.add_argument('--finetune', type=str, nargs='?', const=DEFAULT_FINETUNE_WEIGHTS, default=None,
+                       help='從既有模型微調，類別取自 MongoDB 商品目錄 (預設起點: 目前的 best.pt)')
+    parser.add_argument('--freeze', type=int, default=10,
+                       help='微調時凍結的前幾層 (預設: 10，即 backbone)')
+    parser.add_argument('--sweep', type=str, default=None,
+                       help='超參數搜尋設定 YAML（平行執行多個試驗）')
+    parser.add_argument('--overwrite', action='store_true',
+                       help='超參數搜尋時刪除同名的既有試驗目錄')
+    parser.add_argument('--params', type=str, default=None,
+                       help='額外訓練參數 JSON（覆蓋其他參數，搜尋試驗使用）')
 
     args = parser.parse_args()
 
@@ -213,6 +1954,13 @@ def main():
                 name=args.name
             )
         else:
+            # 微調：類別以商品目錄為準（驗證標籤與 dataset.yaml 都使用同一份類別）
+            if args.finetune:
+                trainer.load_catalog_classes()
+            elif args.quantize or args.prune:
+                # 驗證標籤與產生 YAML 前先換成模型的類別（如目錄微調過的模型）
+                trainer.load_model_classes(args.quantize or args.prune)
+
             # 新訓練
             # 驗證資料集結構
             if not trainer.validate_dataset_structure(args.data):
@@ -231,19 +1979,95 @@ dataset/
                 """)
                 return
 
-            # 建立資料集配置檔案
-            yaml_path = trainer.create_dataset_yaml(args.data)
+            # 驗證標籤內容，在訓練前找出錯誤資料
+            if not args.skip_validation:
+                report = trainer.validate_dataset(args.data, workers=args.workers)
+                if not report['ok']:
+                    print("❌ 資料集內容有誤，請修正後再訓練（或使用 --skip-validation 略過）")
+                    return
+            if args.validate_only:
+                return
 
-            # 開始訓練
-            results = trainer.train_model(
-                yaml_path,
-                epochs=args.epochs,
-                batch=args.batch,
-                imgsz=args.imgsz,
-                lr0=args.lr0,
-                patience=args.patience,
-                name=args.name
-            )
+            if args.build_image_cache:
+                for split in ('train', 'val'):
+                    build_image_cache(args.data, split, args.imgsz, workers=args.workers)
+                return
+
+            # INT8 量化（以驗證集校正並比較精度/延遲）
+            if args.quantize:
+                trainer.quantize_model(
+                    args.quantize,
+                    trainer.create_dataset_yaml(args.data),
+                    imgsz=args.imgsz,
+                    tolerance=args.int8_tolerance,
+                    thread_counts=[int(t) for t in args.bench_threads.split(',')]
+                )
+                return
+
+            # 結構化剪枝後微調（未指定的參數使用剪枝微調的預設值）
+            if args.prune:
+                if not 0 < args.prune_ratio < 1:
+                    raise ValueError(f"--prune-ratio 必須介於 0 與 1 之間: {args.prune_ratio}")
+                if args.name == parser.get_default('name'):
+                    args.name = f"{args.name}_pruned"
+                prune_params = {
+                    key: getattr(args, key)
+                    for key in ('epochs', 'batch', 'imgsz', 'lr0', 'patience')
+                    if getattr(args, key) != parser.get_default(key)
+                }
+                prune_params['name'] = args.name
+                if args.image_cache:
+                    prune_params['image_cache'] = True
+                if args.params:
+                    prune_params.update(json.loads(args.params))
+                trainer.prune_model(
+                    args.prune, args.data,
+                    ratio=args.prune_ratio,
+                    criterion=args.prune_criterion,
+                    thread_counts=[int(t) for t in args.bench_threads.split(',')],
+                    **prune_params
+                )
+                return
+
+            # 超參數搜尋：每個試驗以子行程執行本程式
+            if args.sweep:
+                run_sweep(args.data, args.sweep, args.name, overwrite=args.overwrite)
+                return
+
+            # 從目前模型微調新增的商品類別
+            if args.finetune:
+                if args.name == parser.get_default('name'):
+                    args.name = f"{args.name}_finetune"
+                finetune_params = {
+                    key: getattr(args, key)
+                    for key in ('epochs', 'batch', 'imgsz', 'lr0', 'patience')
+                    if getattr(args, key) != parser.get_default(key)
+                }
+                finetune_params['name'] = args.name
+                if args.image_cache:
+                    finetune_params['image_cache'] = True
+                if args.params:
+                    finetune_params.update(json.loads(args.params))
+                results = trainer.finetune(args.data, args.finetune, freeze=args.freeze, **finetune_params)
+
+            else:
+                # 建立資料集配置檔案
+                yaml_path = trainer.create_dataset_yaml(args.data)
+
+                # 開始訓練
+                training_params = {
+                    'epochs': args.epochs,
+                    'batch': args.batch,
+                    'imgsz': args.imgsz,
+                    'lr0': args.lr0,
+                    'patience': args.patience,
+                    'name': args.name
+                }
+                if args.image_cache:
+                    training_params['image_cache'] = True
+                if args.params:
+                    training_params.update(json.loads(args.params))
+                results = trainer.train_model(yaml_path, **training_params)
 
         print(f"\n✅ 訓練成功完成!")
         print(f"最佳模型路徑: runs/detect/{args.name}/weights/best.pt")
@@ -253,10 +2077,10 @@ dataset/
         print("\n⚠️ 訓練被使用者中斷")
     except Exception as e:
         print(f"\n❌ 訓練失敗: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     # 如果沒有提供命令列參數，則進入互動模式
-    import sys
     if len(sys.argv) == 1:
         print("=== 超市商品辨識模型訓練 (互動模式) ===")
 
@@ -285,6 +2109,9 @@ if __name__ == "__main__":
             if not trainer.validate_dataset_structure(data_path):
                 print("❌ 請修正資料集結構後再執行")
                 exit(1)
+            if not trainer.validate_dataset(data_path)['ok']:
+                print("❌ 請修正資料集內容後再執行")
+                exit(1)
 
             # 取得訓練參數
             epochs = int(input("請輸入訓練輪數 (預設100): ") or 100)
@@ -303,5 +2130,11 @@ if __name__ == "__main__":
                 print("✅ 訓練完成!")
             except Exception as e:
                 print(f"❌ 訓練失敗: {e}")
+    elif sys.argv[1] == 'report':
+        # 訓練結果比較報告
+        report_main(sys.argv[2:])
+    elif sys.argv[1] == 'dedup':
+        # 近似重複與資料洩漏檢查
+        dedup_main(sys.argv[2:])
     else:
         main()
\ No newline at end of file
@@ -7,19 +7,82 @@ BASE_DIR = Path(__file__).parent.parent
 # MongoDB 設定
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DB_NAME = "yolo1125"
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))  # 資料庫執行緒池大小（應小於連線池上限）
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))  # 超過此毫秒數記錄為慢查詢
+
+# MongoDB 連線池設定
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))  # 等待可用連線的上限
+
+# 寫入確認：w 可為數字或 "majority"，j 表示是否等待 journal
+_write_concern_w = os.getenv("MONGO_WRITE_CONCERN_W", "1")
+MONGO_WRITE_CONCERN_W = int(_write_concern_w) if _write_concern_w.isdigit() else _write_concern_w
+MONGO_WRITE_CONCERN_J = os.getenv("MONGO_WRITE_CONCERN_J", "false").lower() == "true"
+
+# 健康檢查的 ping 結果快取秒數
+HEALTH_PING_TTL = 5.0
 
 # YOLO 模型設定
-YOLO_MODEL_PATH = BASE_DIR.parent / "runs" / "detect" / "supermarket_product_detector" / "weights" / "best.pt"
+YOLO_MODEL_PATH = Path(os.getenv(
+    "YOLO_MODEL_PATH",
+    str(BASE_DIR.parent / "runs" / "detect" / "supermarket_product_detector" / "weights" / "best.pt")
+))  # 可指向 train.py --quantize 產生的 INT8 OpenVINO 模型目錄
 CONFIDENCE_THRESHOLD = 0.85
 
+# 主動學習影格擷取（信心度接近門檻的影格存成待標註資料集，供 train.py 使用）
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "false").lower() == "true"
+CAPTURE_DIR = Path(os.getenv("CAPTURE_DIR", str(BASE_DIR / "data" / "active_learning")))
+CAPTURE_CONF_MARGIN = 0.1  # 信心度落在 CONFIDENCE_THRESHOLD ± 此值的偵測才擷取
+CAPTURE_MIN_INTERVAL = 2.0  # 兩次擷取的最短間隔（秒），避免存下大量相似影格
+CAPTURE_QUEUE_SIZE = 8  # 等待寫入的影格上限，滿了直接丟棄
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(2 * 1024 ** 3)))  # 擷取目錄的磁碟配額
+CAPTURE_VAL_RATIO = 0.1  # 分到 val 的比例
+CAPTURE_JPEG_QUALITY = 90
+CAPTURE_RESCAN_INTERVAL = 300.0  # 重新計算擷取目錄用量的間隔（秒），人工移走樣本後可恢復擷取
+
+# 商品目錄快取秒數（管理端修改商品時會立即失效）
+CATALOG_CACHE_TTL = 60.0
+
+# 靜態資源設定
+STATIC_DEV_RELOAD = os.getenv("STATIC_DEV_RELOAD", "false").lower() == "true"  # 開發模式：監看檔案變動並重新載入
+STATIC_WATCH_INTERVAL = 1.0  # 檔案監看間隔（秒）
+STATIC_IMMUTABLE_MAX_AGE = 31536000  # 帶內容雜湊（?v=）的資源快取秒數
+
 # 人臉圖片儲存
 FACE_IMAGES_DIR = BASE_DIR / "data" / "faces"
 
+# 頭像縮圖設定
+AVATAR_THUMBNAIL_SIZE = 128  # 縮圖最長邊（像素）
+AVATAR_CACHE_SIZE = 256  # 記憶體中快取的頭像數量
+
+# 購物車事件日誌（重啟後還原購物車）
+CART_EVENT_LOG_PATH = BASE_DIR / "data" / "cart_events.log"
+CART_LOG_FLUSH_INTERVAL = 0.05  # group commit 等待時間（秒）
+CART_LOG_MAX_BATCH = 256  # 每次最多合併寫入的事件數
+CART_IDLE_TTL = 2 * 60 * 60  # 購物車閒置超過此秒數視為放棄，從記憶體與日誌移除
+
+# 銷售彙總（每小時 / 每日、每商品）設定
+ROLLUP_INTERVAL = 30.0  # 背景彙總間隔（秒）
+ROLLUP_LAG = 5.0  # 只彙總早於此秒數的交易，避免漏掉仍在寫入中的交易
+ROLLUP_BATCH_SIZE = 1000  # 每批讀取的交易筆數
+ROLLUP_UTC_OFFSET_HOURS = int(os.getenv("ROLLUP_UTC_OFFSET_HOURS", "8"))  # 日彙總切日使用的時區
+ROLLUP_LEASE_TTL = 300.0  # 彙總 lease 的有效秒數（持有者當機時，過期後其他程序可接手）
+
+# 交易匯出設定
+EXPORT_BATCH_SIZE = 500  # 每次從資料庫游標取出的交易筆數
+
 # 人臉識別設定
 FACE_MATCH_TOLERANCE = 0.6  # 越小越嚴格 (0.0-1.0)
 
 # WebSocket 設定
 WS_FRAME_RATE = 5  # 每秒處理 5 影格
+WS_SEND_QUEUE_SIZE = 64  # 每個連線出站佇列上限（必達訊息）
+WS_SEND_TIMEOUT = 5.0  # 佇列持續滿載或單次發送超過此秒數即視為慢速連線並斷線
 
 # 管理者帳號設定
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
@@ -1,20 +1,187 @@
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import ConnectionFailure
-from backend.config import MONGODB_URL, DB_NAME
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Tuple
+
+from pymongo import MongoClient, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo.write_concern import WriteConcern
+from backend.config import (
+    MONGODB_URL, DB_NAME, DB_EXECUTOR_WORKERS, DB_SLOW_QUERY_MS,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_WRITE_CONCERN_W, MONGO_WRITE_CONCERN_J,
+    HEALTH_PING_TTL
+)
+from backend.metrics import Histogram
+
+# 執行 pymongo 同步呼叫的有界執行緒池，避免阻塞事件迴圈
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+# 回傳 cursor 的 Collection 方法，需在執行緒中讀完
+CURSOR_METHODS = {"find", "aggregate", "list_indexes"}
+
+# 每種操作的耗時統計: "collection.method" -> {count, total_ms, max_ms}
+query_stats: Dict[str, Dict[str, float]] = {}
+
+
+async def run_db(fn: Callable, *args, op: str = None, **kwargs) -> Any:
+    """
+    在資料庫執行緒池中執行同步函式，並記錄耗時
+
+    Args:
+        fn: 同步函式（pymongo 呼叫或包含資料庫存取的服務方法）
+        op: 統計用的操作名稱，預設為函式名稱
+    """
+    op = op or getattr(fn, '__qualname__', 'db')
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    try:
+        return await loop.run_in_executor(_db_executor, partial(fn, *args, **kwargs))
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stat = query_stats.setdefault(op, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stat['count'] += 1
+        stat['total_ms'] += elapsed_ms
+        stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+
+        if elapsed_ms > DB_SLOW_QUERY_MS:
+            print(f"🐢 慢查詢: {op} {elapsed_ms:.1f}ms")
+
+
+def submit_db(fn: Callable, *args, **kwargs):
+    """在資料庫執行緒池中執行，不等待結果（fire-and-forget 寫入用）"""
+    future = _db_executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_background_error)
+    return future
+
+
+def _log_background_error(future):
+    """記錄背景資料庫操作的錯誤"""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ 背景資料庫操作失敗: {future.exception()}")
+
+
+class AsyncCollection:
+    """
+    pymongo Collection 的非同步包裝
+
+    每個方法都在資料庫執行緒池中執行；回傳 cursor 的方法（find、aggregate）
+    會在執行緒中直接轉成 list，請以 sort / skip / limit 參數控制筆數。
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name: str):
+        method = getattr(self._collection, name)
+        op = f"{self._collection.name}.{name}"
+
+        def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            if name in CURSOR_METHODS:
+                return list(result)
+            return result
+
+        async def wrapper(*args, **kwargs):
+            return await run_db(call, *args, op=op, **kwargs)
+
+        return wrapper
+
+
+class AsyncDatabase:
+    """pymongo Database 的非同步包裝：adb.users.find_one(...) 需以 await 呼叫"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self._db[name])
+
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """
+    MongoDB 指令監聽器
+
+    以驅動程式層級的 command monitoring 記錄每個 collection、每種指令的
+    伺服器往返延遲直方圖（毫秒）。
+    """
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection 名稱
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+        # "collection.command" -> Histogram
+        self.histograms: Dict[str, Histogram] = {}
+        self.failures: Dict[str, int] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.database_name
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _key(self, event) -> str:
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), event.database_name)
+        return f"{collection}.{event.command_name}"
+
+    def succeeded(self, event):
+        key = self._key(event)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(key, Histogram())
+        histogram.observe(event.duration_micros / 1000)
+
+    def failed(self, event):
+        key = self._key(event)
+        with self._lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+    def snapshot(self) -> Dict:
+        """取得所有指令的延遲統計"""
+        return {
+            key: dict(histogram.snapshot(), failures=self.failures.get(key, 0))
+            for key, histogram in sorted(self.histograms.items())
+        }
+
+
+# 全域指令監聽器
+command_listener = CommandLatencyListener()
+
 
 class Database:
     """MongoDB 資料庫管理類別"""
     client = None
     db = None
+    async_db = None
+    _last_ping = {'time': 0.0, 'ok': False, 'latency_ms': None, 'error': None}
 
     @classmethod
     def connect(cls):
         """連接 MongoDB"""
         try:
-            cls.client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+            cls.client = MongoClient(
+                MONGODB_URL,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=[command_listener]
+            )
             # 測試連線
             cls.client.admin.command('ping')
-            cls.db = cls.client[DB_NAME]
+            cls.db = cls.client.get_database(
+                DB_NAME,
+                write_concern=WriteConcern(w=MONGO_WRITE_CONCERN_W, j=MONGO_WRITE_CONCERN_J)
+            )
             print(f"✅ MongoDB 連線成功: {DB_NAME}")
             return cls.db
         except ConnectionFailure as e:
@@ -29,6 +196,36 @@ class Database:
             cls.connect()
         return cls.db
 
+    @classmethod
+    def get_async_db(cls) -> AsyncDatabase:
+        """取得非同步資料庫包裝（供 async 路由使用）"""
+        if cls.async_db is None or cls.async_db._db is not cls.get_db():
+            cls.async_db = AsyncDatabase(cls.get_db())
+        return cls.async_db
+
+    @classmethod
+    def ping(cls) -> Dict:
+        """
+        取得資料庫連線狀態（快取 HEALTH_PING_TTL 秒，避免健康檢查每次都打資料庫）
+
+        Returns:
+            {'ok': bool, 'latency_ms': float, 'error': str, 'time': float}
+        """
+        now = time.monotonic()
+        if now - cls._last_ping['time'] < HEALTH_PING_TTL:
+            return cls._last_ping
+
+        start = time.perf_counter()
+        try:
+            cls.get_db().client.admin.command('ping')
+            result = {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 2), 'error': None}
+        except Exception as e:
+            result = {'ok': False, 'latency_ms': None, 'error': str(e)}
+
+        result['time'] = now
+        cls._last_ping = result
+        return result
+
     @classmethod
     def close(cls):
         """關閉連線"""
@@ -42,6 +239,13 @@ def init_collections():
 
     # Users Collection - 索引
     db.users.create_index([("phone", ASCENDING)], unique=True)
+    # 管理後台使用者列表以 (排序欄位, _id) 排序，每個可排序欄位一個複合索引（可反向掃描，涵蓋 asc/desc）
+    for field in ("created_at", "last_visit", "name", "total_spent"):
+        db.users.create_index([(field, DESCENDING), ("_id", DESCENDING)])
+    try:
+        db.users.drop_index("total_spent_-1")
+    except OperationFailure:
+        pass
     print("✅ Users Collection 索引建立完成")
 
     # Products Collection - 索引
@@ -49,6 +253,23 @@ def init_collections():
     print("✅ Products Collection 索引建立完成")
 
     # Transactions Collection - 索引
-    db.transactions.create_index([("user_id", ASCENDING)])
+    # 交易歷史分頁使用 (user_id, created_at desc) 複合索引，已涵蓋單獨的 user_id 索引
+    db.transactions.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    try:
+        db.transactions.drop_index("user_id_1")
+    except OperationFailure:
+        pass
     db.transactions.create_index([("created_at", ASCENDING)])
     print("✅ Transactions Collection 索引建立完成")
+
+    # 銷售彙總 Collections - 每個時間桶每個商品一份文件
+    for name in ("sales_hourly", "sales_daily"):
+        db[name].create_index([("bucket", ASCENDING), ("product_id", ASCENDING)], unique=True)
+        db[name].create_index([("product_id", ASCENDING), ("bucket", ASCENDING)])
+    print("✅ Sales Rollup Collections 索引建立完成")
+
+    # 舊版建立的使用者沒有計數器欄位，管理介面排序時會被當成 0，啟動時自動回填
+    if db.users.find_one({"transaction_count": {"$exists": False}}, {"_id": 1}):
+        from backend.services.stats_service import get_stats_service
+        print("⚠️ 發現缺少銷售計數器的使用者，從交易記錄回填...")
+        get_stats_service().rebuild()
@@ -1,23 +1,42 @@
 """
 YOLO1125 智慧無人商店系統 - FastAPI 主程式
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Response, UploadFile, File
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import base64
+import codecs
+import csv
+import io
+import json
+import zlib
+import time
 import cv2
 import numpy as np
-from datetime import datetime
-from pathlib import Path
-from typing import Dict
-
-from backend.database import Database
-from backend.config import BASE_DIR
+from bson import ObjectId
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from backend.database import Database, init_collections, run_db, query_stats, command_listener
+from backend.metrics import (
+    stage_timer, frame_stage_latency, frame_counters, prometheus_metric, prometheus_histogram
+)
+from backend.config import FACE_IMAGES_DIR, WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, ROLLUP_INTERVAL, EXPORT_BATCH_SIZE
+from backend.config import STATIC_DEV_RELOAD, STATIC_WATCH_INTERVAL, STATIC_IMMUTABLE_MAX_AGE, CAPTURE_ENABLED
 from backend.services.yolo_service import get_yolo_service
 from backend.services.face_service import get_face_service
 from backend.services.cart_service import get_cart_service
+from backend.services.stats_service import get_stats_service
+from backend.services.avatar_service import get_avatar_service
+from backend.services.catalog_service import get_catalog_service
+from backend.services.product_import import import_products, validate_product
+from backend.services.rollup_service import get_rollup_service, ROLLUP_COLLECTIONS
+from backend.services.static_service import get_static_service, choose_encoding, StaticAsset
+from backend.services.capture_service import get_capture_service
+from pymongo.errors import DuplicateKeyError
 
 # 初始化 FastAPI
 app = FastAPI(
@@ -37,40 +56,210 @@ app.add_middleware(
 
 # ==================== 連線管理 ====================
 
+# 可丟棄的訊息類型：佇列中只保留最新一筆，舊的直接被取代
+DROPPABLE_MESSAGE_TYPES = {"detections", "face_status"}
+
+
+class OutboundQueue:
+    """
+    單一連線的出站訊息佇列
+
+    必達訊息（購物車、登入等）依序排隊；可丟棄訊息（偵測框等）
+    每種類型只保留最新一筆。由各連線自己的 writer task 負責送出。
+
+    必達訊息不會被丟棄，put() 一律附加；maxsize 只是判斷「滿載」的門檻，
+    滿載持續超過 WS_SEND_TIMEOUT 才斷線。因此 reliable 的長度是以時間為上限
+    （約為入列速率 × WS_SEND_TIMEOUT），而不是 maxsize。
+    """
+
+    def __init__(self, maxsize: int = WS_SEND_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.reliable: deque = deque()
+        self.latest: "OrderedDict[str, dict]" = OrderedDict()
+        self.event = asyncio.Event()
+        self.full_since: Optional[float] = None
+        self.sent = 0
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def depth(self) -> int:
+        """目前佇列中的訊息數"""
+        return len(self.reliable) + len(self.latest)
+
+    def put(self, message: dict) -> bool:
+        """
+        放入訊息（不會阻塞）
+
+        Returns:
+            False 表示佇列已持續滿載超過 WS_SEND_TIMEOUT，應斷開此慢速連線
+        """
+        message_type = message.get("type")
+        full = len(self.reliable) >= self.maxsize
+
+        if message_type in DROPPABLE_MESSAGE_TYPES:
+            if message_type in self.latest:
+                # 以新的取代尚未送出的舊訊息
+                self.dropped += 1
+                self.latest[message_type] = message
+            elif full:
+                self.dropped += 1
+            else:
+                self.latest[message_type] = message
+        else:
+            self.reliable.append(message)
+
+        now = time.monotonic()
+        if full:
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since > WS_SEND_TIMEOUT:
+                return False
+        else:
+            self.full_since = None
+
+        self.event.set()
+        return True
+
+    def get_nowait(self) -> Optional[dict]:
+        """取出下一筆訊息，必達訊息優先"""
+        if self.reliable:
+            return self.reliable.popleft()
+        if self.latest:
+            _, message = self.latest.popitem(last=False)
+            return message
+        return None
+
+
 class ConnectionManager:
     """WebSocket 連線管理器"""
 
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.sessions: Dict[str, dict] = {}  # session_id: {user_id, cart, ...}
+        self.send_queues: Dict[str, OutboundQueue] = {}
+        self.slow_consumer_disconnects = 0
 
     async def connect(self, websocket: WebSocket, session_id: str):
         """接受新的 WebSocket 連線"""
         await websocket.accept()
+
+        # 相同 session_id 重新連線：先停掉舊連線的 writer 並關閉舊 socket，避免 task 洩漏
+        old_websocket = self.active_connections.get(session_id)
+        old_queue = self.send_queues.pop(session_id, None)
+        if old_queue and old_queue.task:
+            old_queue.task.cancel()
         self.active_connections[session_id] = websocket
         self.sessions[session_id] = {
             "user_id": None,
             "cart": [],
             "connected_at": datetime.utcnow()
         }
+
+        queue = OutboundQueue()
+        queue.task = asyncio.create_task(self._writer(session_id, websocket, queue))
+        self.send_queues[session_id] = queue
         print(f"✅ WebSocket 連線: {session_id}")
 
-    def disconnect(self, session_id: str):
-        """斷開連線"""
+        if old_websocket is not None and old_websocket is not websocket:
+            print(f"🔁 相同 session 重新連線，關閉舊連線: {session_id}")
+            try:
+                await asyncio.wait_for(old_websocket.close(code=1000), timeout=1.0)
+            except Exception:
+                pass
+
+    def disconnect(self, session_id: str, websocket: Optional[WebSocket] = None):
+        """
+        斷開連線
+
+        Args:
+            session_id: Session ID
+            websocket: 要斷開的連線；若該 session 已被新連線取代則不做任何事
+        """
+        if websocket is not None and self.active_connections.get(session_id) is not websocket:
+            return
+
         if session_id in self.active_connections:
             del self.active_connections[session_id]
         if session_id in self.sessions:
             del self.sessions[session_id]
+        queue = self.send_queues.pop(session_id, None)
+        if queue and queue.task and queue.task is not asyncio.current_task():
+            queue.task.cancel()
         print(f"❌ WebSocket 斷線: {session_id}")
 
+        # 購物車保留給重新連線使用，只清掉閒置過久的
+        get_cart_service().expire_idle()
+
     async def send_message(self, session_id: str, message: dict):
-        """發送訊息給特定 session"""
-        if session_id in self.active_connections:
-            websocket = self.active_connections[session_id]
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                print(f"❌ 發送訊息失敗: {e}")
+        """將訊息放入特定 session 的出站佇列（不等待實際送出）"""
+        queue = self.send_queues.get(session_id)
+        if queue is None:
+            return
+
+        if not queue.put(message):
+            await self._close_slow_consumer(session_id, "出站佇列持續滿載")
+
+    async def _writer(self, session_id: str, websocket: WebSocket, queue: OutboundQueue):
+        """連線專屬的 writer task，依序送出佇列中的訊息"""
+        try:
+            while True:
+                await queue.event.wait()
+                queue.event.clear()
+
+                while True:
+                    message = queue.get_nowait()
+                    if message is None:
+                        break
+                    with stage_timer('send'):
+                        await asyncio.wait_for(websocket.send_json(message), timeout=WS_SEND_TIMEOUT)
+                    queue.sent += 1
+
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            await self._close_slow_consumer(session_id, "發送逾時")
+        except Exception as e:
+            # 連線已關閉或訊息無法序列化：writer 結束後沒有人會再清空佇列，直接斷線
+            print(f"❌ 發送訊息失敗，斷開連線: {session_id} ({type(e).__name__}: {e})")
+            if self.send_queues.get(session_id) is queue:
+                self.disconnect(session_id, websocket)
+                try:
+                    await asyncio.wait_for(websocket.close(code=1011), timeout=1.0)
+                except Exception:
+                    pass
+
+    async def _close_slow_consumer(self, session_id: str, reason: str):
+        """斷開跟不上的慢速連線"""
+        websocket = self.active_connections.get(session_id)
+        if websocket is None:
+            return
+
+        self.slow_consumer_disconnects += 1
+        print(f"⚠️ 慢速連線，強制斷線: {session_id} ({reason})")
+        self.disconnect(session_id, websocket)
+
+        try:
+            await asyncio.wait_for(websocket.close(code=1008), timeout=1.0)
+        except Exception:
+            pass
+
+    def get_queue_stats(self) -> dict:
+        """取得出站佇列統計"""
+        per_session = {
+            session_id: {
+                "depth": queue.depth(),
+                "sent": queue.sent,
+                "dropped": queue.dropped
+            }
+            for session_id, queue in self.send_queues.items()
+        }
+
+        return {
+            "total_depth": sum(s["depth"] for s in per_session.values()),
+            "total_dropped": sum(s["dropped"] for s in per_session.values()),
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+            "sessions": per_session
+        }
 
     def get_session(self, session_id: str):
         """取得 session 資料"""
@@ -83,8 +272,35 @@ manager = ConnectionManager()
 last_frame_time: Dict[str, float] = {}
 last_face_detection_time: Dict[str, float] = {}
 
+# 背景銷售彙總工作
+rollup_task: Optional[asyncio.Task] = None
+
+# 開發模式靜態資源監看工作
+static_watch_task: Optional[asyncio.Task] = None
+
 # ==================== 應用程式生命週期 ====================
 
+async def rollup_loop():
+    """定期將新交易彙總到每小時 / 每日銷售 collection"""
+    while True:
+        try:
+            await run_db(get_rollup_service().catch_up, op="rollup.catch_up")
+        except Exception as e:
+            print(f"⚠️ 銷售彙總失敗，將於下次重試: {e}")
+        await asyncio.sleep(ROLLUP_INTERVAL)
+
+
+async def static_watch_loop():
+    """開發模式：定期檢查前端檔案變動並重新載入"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(STATIC_WATCH_INTERVAL)
+        try:
+            await loop.run_in_executor(None, get_static_service().reload_changed)
+        except Exception as e:
+            print(f"⚠️ 靜態資源重新載入失敗: {e}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """應用程式啟動時初始化"""
@@ -93,13 +309,39 @@ async def startup_event():
     print("=" * 60)
 
     try:
-        # 連接資料庫
+        # 載入並預先壓縮 HTML 與靜態資源
+        await asyncio.get_running_loop().run_in_executor(None, get_static_service)
+        if STATIC_DEV_RELOAD:
+            global static_watch_task
+            static_watch_task = asyncio.create_task(static_watch_loop())
+            print("🔄 開發模式：監看前端檔案變動")
+
+        # 連接資料庫並確保索引存在（create_index 可重複執行）
         Database.connect()
+        init_collections()
 
         # 預先載入人臉服務（確保已知人臉被載入）
         face_service = get_face_service()
         print(f"✅ 人臉服務已載入: {len(face_service.known_faces)} 個已知人臉")
 
+        # 載入商品目錄快取
+        await run_db(get_catalog_service)
+
+        # 預先載入 YOLO 服務，避免第一個影格時才阻塞載入
+        # （模型載入很久，放到預設執行緒池，不佔用資料庫執行緒池）
+        try:
+            await asyncio.to_thread(get_yolo_service)
+        except Exception as e:
+            print(f"⚠️ YOLO 服務預載失敗，將於第一個影格時重試: {e}")
+
+        # 重播購物車事件日誌，還原重啟前的購物車
+        cart_service = get_cart_service()
+        print(f"✅ 購物車服務已載入: {len(cart_service.carts)} 個購物車")
+
+        # 啟動背景銷售彙總（從上次處理的交易續跑）
+        global rollup_task
+        rollup_task = asyncio.create_task(rollup_loop())
+
         print("✅ 系統啟動完成")
         print(f"✅ 訪問網址: http://localhost:8000")
         print("=" * 60)
@@ -112,6 +354,13 @@ async def shutdown_event():
     """應用程式關閉時清理資源"""
     print("\n" + "=" * 60)
     print("🛑 關閉系統...")
+    if rollup_task is not None:
+        rollup_task.cancel()
+    if static_watch_task is not None:
+        static_watch_task.cancel()
+    get_cart_service().close()
+    if CAPTURE_ENABLED:
+        get_capture_service().close()
     Database.close()
     print("✅ 系統已關閉")
     print("=" * 60)
@@ -124,13 +373,40 @@ async def root():
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url="/login.html")
 
+def asset_response(request: Request, asset: StaticAsset, immutable: bool = False) -> Response:
+    """
+    依 Accept-Encoding 回傳預先壓縮的資源（支援 ETag 條件請求）
+
+    Args:
+        request: 請求
+        asset: 靜態資源
+        immutable: 網址帶有內容雜湊，可長期快取
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), asset)
+    etag = asset.etag(encoding)
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable" if immutable else "no-cache"
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+    return Response(content=asset.variants[encoding], media_type=asset.content_type, headers=headers)
+
+
 @app.get("/login.html", response_class=HTMLResponse)
-async def login_page():
+async def login_page(request: Request):
     """提供登入頁面"""
-    html_path = BASE_DIR / "frontend" / "login.html"
+    page = get_static_service().get_page("login.html")
 
-    if html_path.exists():
-        return HTMLResponse(content=html_path.read_text(encoding="utf-8"))
+    if page is not None:
+        return asset_response(request, page)
     else:
         return HTMLResponse(
             content="<h1>登入頁面不存在</h1>",
@@ -138,12 +414,12 @@ async def login_page():
         )
 
 @app.get("/index.html", response_class=HTMLResponse)
-async def shop_page():
+async def shop_page(request: Request):
     """提供購物頁面"""
-    html_path = BASE_DIR / "frontend" / "index.html"
+    page = get_static_service().get_page("index.html")
 
-    if html_path.exists():
-        return HTMLResponse(content=html_path.read_text(encoding="utf-8"))
+    if page is not None:
+        return asset_response(request, page)
     else:
         return HTMLResponse(
             content="<h1>購物頁面不存在</h1>",
@@ -151,12 +427,12 @@ async def shop_page():
         )
 
 @app.get("/admin.html", response_class=HTMLResponse)
-async def admin_page():
+async def admin_page(request: Request):
     """提供管理者頁面"""
-    html_path = BASE_DIR / "frontend" / "admin.html"
+    page = get_static_service().get_page("admin.html")
 
-    if html_path.exists():
-        return HTMLResponse(content=html_path.read_text(encoding="utf-8"))
+    if page is not None:
+        return asset_response(request, page)
     else:
         return HTMLResponse(
             content="<h1>管理者頁面不存在</h1>",
@@ -164,50 +440,121 @@ async def admin_page():
         )
 
 @app.get("/api/products")
-async def get_products():
-    """取得商品列表"""
+async def get_products(request: Request):
+    """取得商品列表（讀取共用的商品目錄快取，支援 ETag 條件請求）"""
     try:
-        db = Database.get_db()
-        products_cursor = db.products.find({}, {"_id": 0})
+        catalog = get_catalog_service().snapshot()
+        if catalog['etag'] is None:
+            # 啟動時資料庫無法連線，目錄尚未成功載入過（背景會依 TTL 重試）
+            raise HTTPException(status_code=503, detail="商品目錄尚未載入，請稍後再試")
+        headers = {"ETag": catalog['etag'], "Cache-Control": "no-cache"}
 
-        # 轉換 datetime 為字串
-        products = []
-        for p in products_cursor:
-            if 'created_at' in p:
-                p['created_at'] = p['created_at'].isoformat()
-            products.append(p)
+        if request.headers.get("if-none-match") == catalog['etag']:
+            return Response(status_code=304, headers=headers)
 
         return JSONResponse(content={
             "success": True,
-            "products": products,
-            "count": len(products)
-        })
+            "products": catalog['products'],
+            "count": len(catalog['products']),
+            "version": catalog['version']
+        }, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"取得商品失敗: {str(e)}")
 
 @app.get("/api/health")
 async def health_check():
-    """健康檢查端點"""
-    try:
-        db = Database.get_db()
-        # 測試資料庫連線
-        products_count = db.products.count_documents({})
+    """健康檢查端點（資料庫 ping 結果會快取，探測成本固定）"""
+    ping = await run_db(Database.ping, op="health.ping")
+    queue_stats = manager.get_queue_stats()
 
-        return JSONResponse(content={
-            "status": "healthy",
-            "database": "connected",
-            "products": products_count,
-            "active_connections": len(manager.active_connections)
-        })
-    except Exception as e:
+    if not ping['ok']:
         return JSONResponse(
             status_code=503,
             content={
                 "status": "unhealthy",
-                "error": str(e)
+                "error": ping['error']
             }
         )
 
+    return JSONResponse(content={
+        "status": "healthy",
+        "database": "connected",
+        "db_ping_ms": ping['latency_ms'],
+        "active_connections": len(manager.active_connections),
+        "send_queue_depth": queue_stats["total_depth"],
+        "dropped_messages": queue_stats["total_dropped"]
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus 文字格式的監控指標
+
+    影格處理各階段延遲直方圖、影格計數、連線與佇列深度，
+    以及資料庫操作與 MongoDB 指令延遲。
+    """
+    queue_stats = manager.get_queue_stats()
+    lines = []
+
+    lines += prometheus_histogram(
+        "yolo1125_frame_stage_seconds", "Latency of each frame pipeline stage",
+        (({"stage": stage}, histogram) for stage, histogram in frame_stage_latency.items())
+    )
+    for name, counter in frame_counters.items():
+        lines += prometheus_metric(
+            f"yolo1125_frames_{name}_total", "counter", f"Frames {name}", [({}, counter.value)]
+        )
+
+    lines += prometheus_metric(
+        "yolo1125_active_sessions", "gauge", "Open WebSocket sessions",
+        [({}, len(manager.active_connections))]
+    )
+    lines += prometheus_metric(
+        "yolo1125_logged_in_sessions", "gauge", "WebSocket sessions with a logged-in user",
+        [({}, sum(1 for session in manager.sessions.values() if session.get('user_id')))]
+    )
+    lines += prometheus_metric(
+        "yolo1125_send_queue_depth", "gauge", "Outbound WebSocket messages waiting to be sent",
+        [({}, queue_stats["total_depth"])]
+    )
+    lines += prometheus_metric(
+        "yolo1125_send_queue_max_depth", "gauge", "Deepest outbound queue of a single session",
+        [({}, max((s["depth"] for s in queue_stats["sessions"].values()), default=0))]
+    )
+    lines += prometheus_metric(
+        "yolo1125_slow_consumer_disconnects_total", "counter", "Sessions closed for not keeping up",
+        [({}, queue_stats["slow_consumer_disconnects"])]
+    )
+    if CAPTURE_ENABLED:
+        lines += prometheus_metric(
+            "yolo1125_capture_queue_depth", "gauge", "Captured frames waiting to be written",
+            [({}, get_capture_service().get_stats()["queue_depth"])]
+        )
+
+    lines += prometheus_metric(
+        "yolo1125_db_operations_total", "counter", "Database operations run in the executor",
+        [({"op": op}, stat['count']) for op, stat in query_stats.items()]
+    )
+    lines += prometheus_metric(
+        "yolo1125_db_operation_seconds_total", "counter", "Time spent in database operations",
+        [({"op": op}, stat['total_ms'] / 1000) for op, stat in query_stats.items()]
+    )
+    lines += prometheus_histogram(
+        "yolo1125_mongo_command_seconds", "MongoDB command round-trip latency",
+        (({"command": key}, histogram) for key, histogram in sorted(command_listener.histograms.items()))
+    )
+    lines += prometheus_metric(
+        "yolo1125_mongo_command_failures_total", "counter", "Failed MongoDB commands",
+        [({"command": key}, count) for key, count in sorted(command_listener.failures.items())]
+    )
+
+    return Response(
+        content="\n".join(lines) + "\n",
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.post("/api/register")
 async def register_user(data: dict):
     """註冊新使用者"""
@@ -229,7 +576,8 @@ async def register_user(data: dict):
 
         # 註冊使用者
         face_service = get_face_service()
-        user = face_service.register_user(
+        user = await run_db(
+            face_service.register_user,
             name=name,
             phone=phone,
             face_encoding=pending_face['encoding'],
@@ -288,28 +636,33 @@ async def checkout(data: dict):
 
         # 取得使用者資訊
         face_service = get_face_service()
-        user = face_service.get_user_by_id(user_id)
+        user = await run_db(face_service.get_user_by_id, user_id)
         if not user:
             raise HTTPException(status_code=400, detail="使用者不存在")
 
         # 建立交易記錄
-        from bson import ObjectId
         transaction = {
             "user_id": ObjectId(user_id),
             "user_name": user['name'],
-            "items": cart_summary['items'],
+            "items": [dict(item) for item in cart_summary['items']],
             "total_quantity": cart_summary['total_quantity'],
             "total_amount": cart_summary['total_amount'],
             "created_at": datetime.utcnow()
         }
 
-        db = Database.get_db()
-        result = db.transactions.insert_one(transaction)
+        adb = Database.get_async_db()
+        result = await adb.transactions.insert_one(transaction)
         transaction_id = str(result.inserted_id)
 
-        # 清空購物車
+        # 交易寫入後立即清空購物車，之後任何失敗都不會讓重試產生重複交易
         cart_service.clear_cart(session_id)
 
+        # 累加物化統計計數器（盡力而為；失敗時計數偏差可用 scripts/rebuild_stats.py 修正）
+        try:
+            await run_db(get_stats_service().record_checkout, user_id, cart_summary['total_amount'])
+        except Exception as e:
+            print(f"⚠️ 統計計數器更新失敗，請執行 scripts/rebuild_stats.py 修正: {transaction_id} ({type(e).__name__}: {e})")
+
         # 發送購物車更新（清空）
         await manager.send_message(session_id, {
             "type": "cart_updated",
@@ -343,6 +696,14 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket 端點處理即時通訊"""
     await manager.connect(websocket, session_id)
 
+    # 以相同 session_id 重新連線時送回還原的購物車（仍需重新登入才能結帳）
+    cart_service = get_cart_service()
+    if cart_service.validate_cart(session_id):
+        await manager.send_message(session_id, {
+            "type": "cart_updated",
+            "cart": cart_service.get_cart_summary(session_id)
+        })
+
     try:
         while True:
             # 接收訊息
@@ -351,7 +712,15 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
 
             if message_type == "frame":
                 # 處理影像影格
-                await handle_frame(session_id, data)
+                status = await handle_frame(session_id, data)
+
+                # 帶有 seq 的影格（壓力測試工具）回報處理結果，供客戶端對應延遲
+                if "seq" in data:
+                    await manager.send_message(session_id, {
+                        "type": "frame_ack",
+                        "seq": data["seq"],
+                        "status": status
+                    })
 
             elif message_type == "ping":
                 # 心跳檢測
@@ -368,43 +737,57 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 print(f"⚠️ 未知訊息類型: {message_type}")
 
     except WebSocketDisconnect:
-        manager.disconnect(session_id)
+        manager.disconnect(session_id, websocket)
         print(f"🔌 WebSocket 正常斷線: {session_id}")
     except Exception as e:
         print(f"❌ WebSocket 錯誤: {e}")
-        manager.disconnect(session_id)
+        manager.disconnect(session_id, websocket)
 
 # ==================== 訊息處理函式 ====================
 
-async def handle_frame(session_id: str, data: dict):
-    """處理影像影格"""
+async def handle_frame(session_id: str, data: dict) -> str:
+    """
+    處理影像影格
+
+    影格帶有 seq 時，回傳給前端的 detections / cart_updated 也會附上同一個 seq。
+
+    Returns:
+        處理結果: 'throttled'、'dropped'、'skipped'（未執行偵測）、'face' 或 'yolo'
+    """
+    frame_counters['received'].inc()
+    seq = data.get("seq")
     try:
         # 檢查處理頻率（避免過度處理）
         current_time = datetime.utcnow().timestamp()
         last_time = last_frame_time.get(session_id, 0)
 
         if current_time - last_time < 0.2:  # 最快 0.2 秒處理一次
-            return
+            frame_counters['throttled'].inc()
+            return "throttled"
 
         last_frame_time[session_id] = current_time
 
         # 解碼 Base64 影像
         frame_data = data.get("frame")
         if not frame_data:
-            return
+            frame_counters['dropped'].inc()
+            return "dropped"
 
         # 移除 data:image/jpeg;base64, 前綴
         if "," in frame_data:
             frame_data = frame_data.split(",")[1]
 
         # Base64 解碼
-        image_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with stage_timer('base64_decode'):
+            image_bytes = base64.b64decode(frame_data)
+        with stage_timer('jpeg_decode'):
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
         if frame is None:
+            frame_counters['dropped'].inc()
             print("⚠️ 影像解碼失敗")
-            return
+            return "dropped"
 
         session = manager.get_session(session_id)
 
@@ -416,6 +799,8 @@ async def handle_frame(session_id: str, data: dict):
             if current_time - last_time > 1.0:  # 1 秒間隔
                 last_face_detection_time[session_id] = current_time
                 await handle_face_detection(session_id, frame)
+                return "face"
+            return "skipped"
 
         # Task 004: YOLO 商品偵測（僅在已登入時執行）
         elif session.get('user_id'):
@@ -424,20 +809,27 @@ async def handle_frame(session_id: str, data: dict):
 
             if detections:
                 # 發送偵測結果至前端
-                await manager.send_message(session_id, {
+                message = {
                     "type": "detections",
                     "detections": detections,
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }
+                if seq is not None:
+                    message["seq"] = seq
+                await manager.send_message(session_id, message)
 
                 # 如果偵測到商品，發送商品偵測事件
                 for detection in detections:
                     product = detection.get('product')
                     if product:
-                        await handle_product_detected(session_id, product, detection)
+                        await handle_product_detected(session_id, product, detection, seq)
+
+        return "yolo"
 
     except Exception as e:
+        frame_counters['dropped'].inc()
         print(f"❌ 處理影格錯誤: {e}")
+        return "dropped"
 
 async def handle_face_detection(session_id: str, frame: np.ndarray):
     """處理人臉偵測"""
@@ -458,7 +850,8 @@ async def handle_face_detection(session_id: str, frame: np.ndarray):
         top, right, bottom, left = face_location
 
         # 嘗試比對
-        matched_user = face_service.match_face(face_encoding)
+        with stage_timer('face_match'):
+            matched_user = face_service.match_face(face_encoding)
 
         if matched_user:
             # 找到已知使用者，自動登入
@@ -500,8 +893,8 @@ async def handle_face_detection(session_id: str, frame: np.ndarray):
         import traceback
         traceback.print_exc()
 
-async def handle_product_detected(session_id: str, product: dict, detection: dict):
-    """處理偵測到的商品"""
+async def handle_product_detected(session_id: str, product: dict, detection: dict, seq=None):
+    """處理偵測到的商品（seq 為觸發此事件的影格序號，會附在 cart_updated 上）"""
     try:
         session = manager.get_session(session_id)
 
@@ -514,10 +907,13 @@ async def handle_product_detected(session_id: str, product: dict, detection: dic
         cart_summary = cart_service.add_item(session_id, product)
 
         # 發送購物車更新
-        await manager.send_message(session_id, {
+        message = {
             "type": "cart_updated",
             "cart": cart_summary
-        })
+        }
+        if seq is not None:
+            message["seq"] = seq
+        await manager.send_message(session_id, message)
 
         # 發送商品加入事件（用於視覺回饋）
         await manager.send_message(session_id, {
@@ -620,16 +1016,6 @@ async def face_login(data: dict):
             # 更新最後訪問時間
             face_service.update_last_visit(user_id)
 
-            # 獲取用戶頭像
-            face_image_base64 = None
-            try:
-                face_image_path = Path(__file__).parent / "data" / "faces" / f"{user_id}.jpg"
-                if face_image_path.exists():
-                    with open(face_image_path, 'rb') as f:
-                        face_image_base64 = base64.b64encode(f.read()).decode('utf-8')
-            except Exception as e:
-                print(f"❌ 讀取頭像失敗: {e}")
-
             return JSONResponse(
                 content={
                     "success": True,
@@ -638,7 +1024,7 @@ async def face_login(data: dict):
                         "id": user_id,
                         "name": user['name'],
                         "phone": user.get('phone', ''),
-                        "avatar": f"data:image/jpeg;base64,{face_image_base64}" if face_image_base64 else None
+                        "avatar": avatar_url(user_id)
                     }
                 }
             )
@@ -702,7 +1088,7 @@ async def face_register(data: dict):
         face_image = frame[top:bottom, left:right]
 
         # 註冊使用者
-        user_data = face_service.register_user(name, phone, face_encoding, face_image, birthday)
+        user_data = await run_db(face_service.register_user, name, phone, face_encoding, face_image, birthday)
 
         if not user_data:
             return JSONResponse(
@@ -722,16 +1108,6 @@ async def face_register(data: dict):
         manager.sessions[session_id]['user_id'] = user_id
         manager.sessions[session_id]['user_name'] = name
 
-        # 獲取用戶頭像
-        face_image_base64 = None
-        try:
-            face_image_path = Path(__file__).parent / "data" / "faces" / f"{user_id}.jpg"
-            if face_image_path.exists():
-                with open(face_image_path, 'rb') as f:
-                    face_image_base64 = base64.b64encode(f.read()).decode('utf-8')
-        except Exception as e:
-            print(f"❌ 讀取頭像失敗: {e}")
-
         return JSONResponse(
             content={
                 "success": True,
@@ -741,7 +1117,7 @@ async def face_register(data: dict):
                     "name": name,
                     "phone": phone,
                     "birthday": birthday,
-                    "avatar": f"data:image/jpeg;base64,{face_image_base64}" if face_image_base64 else None
+                    "avatar": avatar_url(user_id)
                 }
             }
         )
@@ -754,22 +1130,42 @@ async def face_register(data: dict):
 
 
 @app.get("/api/user/{user_id}/transactions")
-async def get_user_transactions(user_id: str):
+async def get_user_transactions(user_id: str, before: Optional[str] = None, limit: int = 20):
     """
-    獲取使用者交易歷史
+    獲取使用者交易歷史（keyset 分頁）
+
+    Args:
+        before: 分頁游標 "<created_at>,<transaction_id>"，取此筆之前（更舊）的交易
+        limit: 每頁筆數
     """
     try:
-        from bson import ObjectId
-        db = Database.get_db()
+        adb = Database.get_async_db()
+        limit = max(1, min(limit, 100))
+        query = {"user_id": ObjectId(user_id)}
 
-        # 查詢該使用者的所有交易記錄
-        transactions = list(db.transactions.find(
-            {"user_id": ObjectId(user_id)}
-        ).sort("created_at", -1))
+        if before:
+            try:
+                before_time, before_id = before.split(",", 1)
+                before_time = datetime.fromisoformat(before_time)
+                before_id = ObjectId(before_id)
+            except Exception:
+                raise HTTPException(status_code=400, detail=f"無效的分頁游標: {before}")
+
+            query["$or"] = [
+                {"created_at": {"$lt": before_time}},
+                {"created_at": before_time, "_id": {"$lt": before_id}}
+            ]
+
+        # 使用 (user_id, created_at, _id) 複合索引，每頁成本固定
+        transactions = await adb.transactions.find(
+            query, sort=[("created_at", -1), ("_id", -1)], limit=limit
+        )
 
-        # 計算統計資料
-        total_transactions = len(transactions)
-        total_spent = sum(t.get('total_amount', 0) for t in transactions)
+        # 統計資料讀取使用者的累計計數器
+        user = await adb.users.find_one(
+            {"_id": ObjectId(user_id)},
+            {"total_spent": 1, "transaction_count": 1}
+        ) or {}
 
         # 格式化交易記錄
         formatted_transactions = []
@@ -782,15 +1178,23 @@ async def get_user_transactions(user_id: str):
                 "total_amount": t.get('total_amount', 0)
             })
 
+        next_before = None
+        if len(transactions) == limit and transactions[-1].get('created_at'):
+            last = transactions[-1]
+            next_before = f"{last['created_at'].isoformat()},{last['_id']}"
+
         return JSONResponse(
             content={
                 "success": True,
-                "total_transactions": total_transactions,
-                "total_spent": total_spent,
-                "transactions": formatted_transactions
+                "total_transactions": user.get('transaction_count', 0),
+                "total_spent": user.get('total_spent', 0),
+                "transactions": formatted_transactions,
+                "next_before": next_before
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as exc:
         print(f"❌ 獲取交易歷史錯誤: {exc}")
         raise HTTPException(status_code=500, detail=str(exc))
@@ -802,24 +1206,13 @@ async def get_user_info(user_id: str):
     獲取使用者詳細資訊
     """
     try:
-        from bson import ObjectId
-        db = Database.get_db()
+        adb = Database.get_async_db()
 
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await adb.users.find_one({"_id": ObjectId(user_id)}, {"face_encoding": 0})
 
         if not user:
             raise HTTPException(status_code=404, detail="使用者不存在")
 
-        # 獲取用戶頭像
-        face_image_base64 = None
-        try:
-            face_image_path = Path(__file__).parent / "data" / "faces" / f"{user_id}.jpg"
-            if face_image_path.exists():
-                with open(face_image_path, 'rb') as f:
-                    face_image_base64 = base64.b64encode(f.read()).decode('utf-8')
-        except Exception as e:
-            print(f"❌ 讀取頭像失敗: {e}")
-
         return JSONResponse(
             content={
                 "success": True,
@@ -830,7 +1223,7 @@ async def get_user_info(user_id: str):
                     "birthday": user.get('birthday', '').isoformat() if user.get('birthday') else "",
                     "created_at": user.get('created_at', '').isoformat() if user.get('created_at') else "",
                     "last_visit": user.get('last_visit', '').isoformat() if user.get('last_visit') else "",
-                    "avatar": f"data:image/jpeg;base64,{face_image_base64}" if face_image_base64 else None
+                    "avatar": avatar_url(user_id)
                 }
             }
         )
@@ -842,6 +1235,43 @@ async def get_user_info(user_id: str):
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+# ==================== 頭像 ====================
+
+def avatar_url(user_id: str) -> Optional[str]:
+    """取得使用者頭像 URL（沒有人臉照片時回傳 None，避免前端請求必定 404 的網址）"""
+    if (FACE_IMAGES_DIR / f"{user_id}.jpg").exists():
+        return f"/api/avatar/{user_id}"
+    return None
+
+
+@app.get("/api/avatar/{user_id}")
+async def get_avatar(user_id: str, request: Request):
+    """
+    取得使用者頭像縮圖（支援 ETag / Last-Modified 條件請求）
+    """
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=404, detail="頭像不存在")
+
+    avatar = await get_avatar_service().get(user_id)
+    if avatar is None:
+        raise HTTPException(status_code=404, detail="頭像不存在")
+
+    headers = {
+        "ETag": avatar['etag'],
+        "Last-Modified": avatar['last_modified'],
+        "Cache-Control": "private, max-age=60"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if avatar['etag'] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since") == avatar['last_modified']:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=avatar['body'], media_type="image/jpeg", headers=headers)
+
+
 # ==================== 管理者 API ====================
 
 @app.post("/api/admin-login")
@@ -875,36 +1305,56 @@ async def admin_login(data: dict):
         print(f"❌ 管理者登入錯誤: {exc}")
         raise HTTPException(status_code=500, detail=str(exc))
 
+def parse_query_time(value: str) -> datetime:
+    """解析 ISO 時間查詢參數，有時區時轉為 UTC（資料庫以 naive UTC 儲存）"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"無效的時間: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# 使用者列表可排序欄位（新增欄位時須同步在 init_collections 建立 (欄位, _id) 索引）
+USER_SORT_FIELDS = {"created_at", "last_visit", "name", "total_spent"}
+
+
 @app.get("/api/admin/users")
-async def get_all_users():
+async def get_all_users(
+    limit: int = 50,
+    skip: int = 0,
+    sort: str = "created_at",
+    order: str = "desc"
+):
     """
-    獲取所有使用者列表
+    獲取使用者列表（分頁）
+
+    累積消費讀取使用者文件上的計數器，頭像以 URL 回傳，不再內嵌 base64。
     """
     try:
-        from bson import ObjectId
-        db = Database.get_db()
+        if sort not in USER_SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"不支援的排序欄位: {sort}")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail=f"不支援的排序方向: {order}")
 
-        users = list(db.users.find({}))
+        limit = max(1, min(limit, 200))
+        skip = max(0, skip)
+        direction = 1 if order == "asc" else -1
+
+        adb = Database.get_async_db()
+
+        # total_spent 由結帳時累加的計數器提供，不需再查詢 transactions
+        users = await adb.users.find(
+            {}, {"face_encoding": 0},
+            sort=[(sort, direction), ("_id", direction)], skip=skip, limit=limit
+        )
+        total = await adb.users.estimated_document_count()
 
-        # 為每個使用者獲取交易統計
         user_list = []
         for user in users:
             user_id = str(user['_id'])
 
-            # 計算累積消費
-            transactions = list(db.transactions.find({"user_id": ObjectId(user_id)}))
-            total_spent = sum(t.get('total_amount', 0) for t in transactions)
-
-            # 獲取頭像
-            face_image_base64 = None
-            try:
-                face_image_path = Path(__file__).parent / "data" / "faces" / f"{user_id}.jpg"
-                if face_image_path.exists():
-                    with open(face_image_path, 'rb') as f:
-                        face_image_base64 = base64.b64encode(f.read()).decode('utf-8')
-            except:
-                pass
-
             user_list.append({
                 "id": user_id,
                 "name": user.get('name', ''),
@@ -912,18 +1362,25 @@ async def get_all_users():
                 "birthday": user.get('birthday', '').isoformat() if user.get('birthday') else "",
                 "created_at": user.get('created_at', '').isoformat() if user.get('created_at') else "",
                 "last_visit": user.get('last_visit', '').isoformat() if user.get('last_visit') else "",
-                "total_spent": total_spent,
-                "avatar": f"data:image/jpeg;base64,{face_image_base64}" if face_image_base64 else None
+                "total_spent": user.get('total_spent', 0),
+                # 只依文件欄位產生 URL，不在事件迴圈上逐筆檢查檔案；檔案遺失時由 /api/avatar 回 404
+                "avatar": f"/api/avatar/{user_id}" if user.get('face_image_path') else None
             })
 
         return JSONResponse(
             content={
                 "success": True,
                 "users": user_list,
-                "count": len(user_list)
+                "count": len(user_list),
+                "total": total,
+                "skip": skip,
+                "limit": limit,
+                "has_more": skip + len(user_list) < total
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as exc:
         print(f"❌ 獲取使用者列表錯誤: {exc}")
         raise HTTPException(status_code=500, detail=str(exc))
@@ -935,30 +1392,413 @@ async def get_admin_stats():
     獲取管理統計資料
     """
     try:
-        from bson import ObjectId
-        db = Database.get_db()
+        # 讀取物化計數器（由結帳累加，scripts/rebuild_stats.py 可重建）
+        stats = await run_db(get_stats_service().get_sales_stats)
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "stats": stats
+            }
+        )
 
-        # 總使用者數
-        total_users = db.users.count_documents({})
+    except Exception as exc:
+        print(f"❌ 獲取統計資料錯誤: {exc}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.get("/api/admin/sales/rollups")
+async def get_sales_rollups(
+    granularity: str = "hour",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    product_id: Optional[str] = None
+):
+    """
+    獲取時間區間內的每小時 / 每日商品銷售彙總（圖表用）
 
-        # 總交易數和總營業額
-        transactions = list(db.transactions.find({}))
-        total_transactions = len(transactions)
-        total_revenue = sum(t.get('total_amount', 0) for t in transactions)
+    start / end 為 ISO 時間（預設: hour 為最近 24 小時，day 為最近 30 天）
+    """
+    try:
+        if granularity not in ROLLUP_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"無效的時間粒度: {granularity}")
+
+        end_time = parse_query_time(end) if end else datetime.utcnow()
+        if start:
+            start_time = parse_query_time(start)
+        else:
+            start_time = end_time - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+        if start_time >= end_time:
+            raise HTTPException(status_code=400, detail="start 必須早於 end")
+
+        series = await run_db(
+            get_rollup_service().get_series,
+            granularity, start_time, end_time, product_id,
+            op="rollup.series"
+        )
+        for row in series:
+            row['bucket'] = row['bucket'].isoformat()
 
         return JSONResponse(
             content={
                 "success": True,
-                "stats": {
-                    "total_users": total_users,
-                    "total_transactions": total_transactions,
-                    "total_revenue": total_revenue
+                "granularity": granularity,
+                "start": start_time.isoformat(),
+                "end": end_time.isoformat(),
+                "series": series
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as exc:
+        print(f"❌ 獲取銷售彙總錯誤: {exc}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+# CSV 匯出欄位（每個購物車項目一列）
+EXPORT_CSV_FIELDS = [
+    "transaction_id", "created_at", "user_id", "user_name",
+    "product_id", "product_name", "unit_price", "quantity", "subtotal", "total_amount"
+]
+
+
+def export_lines(transactions, fmt: str, header: bool):
+    """將一批交易轉為 NDJSON 或 CSV 文字"""
+    buffer = io.StringIO()
+
+    if fmt == "ndjson":
+        for transaction in transactions:
+            transaction['transaction_id'] = str(transaction.pop('_id'))
+            transaction['user_id'] = str(transaction['user_id'])
+            transaction['created_at'] = transaction['created_at'].isoformat()
+            buffer.write(json.dumps(transaction, ensure_ascii=False, default=str))
+            buffer.write("\n")
+    else:
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_CSV_FIELDS)
+        for transaction in transactions:
+            for item in transaction.get('items', []):
+                writer.writerow([
+                    str(transaction['_id']),
+                    transaction['created_at'].isoformat(),
+                    str(transaction['user_id']),
+                    transaction.get('user_name', ''),
+                    item.get('product_id', ''),
+                    item.get('name', ''),
+                    item.get('unit_price', ''),
+                    item.get('quantity', ''),
+                    item.get('subtotal', ''),
+                    transaction.get('total_amount', '')
+                ])
+
+    return buffer.getvalue()
+
+
+@app.get("/api/admin/transactions/export")
+async def export_transactions(
+    format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    user_id: Optional[str] = None,
+    gzip: bool = False
+):
+    """
+    串流匯出交易記錄（NDJSON 每筆交易一行；CSV 每個商品項目一列）
+
+    依 created_at 排序，從資料庫游標分批讀取並逐批輸出，記憶體用量與匯出筆數無關。
+    start / end 為 ISO 時間，gzip=true 時輸出 .gz 檔。
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail=f"不支援的格式: {format}")
+
+    query = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = parse_query_time(start)
+        if end:
+            query["created_at"]["$lt"] = parse_query_time(end)
+    if user_id:
+        try:
+            query["user_id"] = ObjectId(user_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="無效的使用者 ID")
+
+    db = Database.get_db()
+    cursor = db.transactions.find(query).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    def next_batch():
+        """從游標取出下一批（在資料庫執行緒池中執行）"""
+        batch = []
+        for transaction in cursor:
+            batch.append(transaction)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                break
+        return batch
+
+    async def stream():
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        header = True
+        count = 0
+        try:
+            while True:
+                batch = await run_db(next_batch, op="transactions.export")
+                if not batch and not header:
+                    break
+
+                chunk = export_lines(batch, format, header).encode("utf-8")
+                header = False
+                count += len(batch)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+
+                if not batch:
+                    break
+
+            if compressor is not None:
+                yield compressor.flush()
+            print(f"✅ 交易匯出完成: {count} 筆")
+        finally:
+            cursor.close()
+
+    filename = f"transactions.{format}" + (".gz" if gzip else "")
+    if gzip:
+        media_type = "application/gzip"
+    elif format == "csv":
+        media_type = "text/csv; charset=utf-8"
+    else:
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/admin/connections")
+async def get_connection_stats():
+    """
+    獲取 WebSocket 連線與出站佇列統計
+    """
+    return JSONResponse(
+        content={
+            "success": True,
+            "active_connections": len(manager.active_connections),
+            "send_queues": manager.get_queue_stats()
+        }
+    )
+
+
+@app.get("/api/admin/capture-stats")
+async def get_capture_stats():
+    """
+    獲取主動學習影格擷取統計（寫入數、各原因丟棄數、磁碟用量）
+    """
+    if not CAPTURE_ENABLED:
+        return JSONResponse(content={"success": True, "enabled": False})
+
+    return JSONResponse(
+        content={
+            "success": True,
+            "enabled": True,
+            **get_capture_service().get_stats()
+        }
+    )
+
+
+@app.get("/api/admin/db-stats")
+async def get_db_stats():
+    """
+    獲取資料庫操作耗時統計
+
+    queries 為應用層（含執行緒池排隊）耗時，commands 為驅動程式量測的
+    各 collection / 指令伺服器往返延遲直方圖（毫秒）。
+    """
+    return JSONResponse(
+        content={
+            "success": True,
+            "queries": {
+                op: {
+                    "count": stat['count'],
+                    "avg_ms": round(stat['total_ms'] / stat['count'], 2) if stat['count'] else 0,
+                    "max_ms": round(stat['max_ms'], 2)
                 }
+                for op, stat in query_stats.items()
+            },
+            "commands": command_listener.snapshot()
+        }
+    )
+
+
+@app.post("/api/admin/products/refresh")
+async def refresh_products():
+    """
+    立即重新載入商品目錄快取（偵測與商品 API 共用）
+    """
+    version = await run_db(get_catalog_service().refresh)
+
+    return JSONResponse(
+        content={
+            "success": True,
+            "version": version
+        }
+    )
+
+
+@app.post("/api/admin/products")
+async def create_product(data: dict):
+    """
+    新增商品
+    """
+    try:
+        product, error = validate_product(data)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+
+        product['created_at'] = datetime.utcnow()
+
+        adb = Database.get_async_db()
+        try:
+            result = await adb.products.insert_one(product)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail=f"yolo_class_id {product['yolo_class_id']} 已存在")
+
+        version = await run_db(get_catalog_service().refresh)
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "商品已新增",
+                "id": str(result.inserted_id),
+                "version": version
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as exc:
-        print(f"❌ 獲取統計資料錯誤: {exc}")
+        print(f"❌ 新增商品錯誤: {exc}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.post("/api/admin/products/import")
+async def import_product_catalog(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    batch_size: int = 500
+):
+    """
+    匯入商品目錄（CSV 或 NDJSON，欄位: name, price, yolo_class_id, yolo_class_name）
+
+    以 yolo_class_id upsert，回傳逐列錯誤報告；匯入在資料庫執行緒池中串流處理。
+    """
+    try:
+        fmt = format
+        if fmt is None:
+            fmt = "ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+        if fmt not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail=f"不支援的格式: {fmt}")
+
+        batch_size = max(1, min(batch_size, 5000))
+        lines = codecs.iterdecode(file.file, "utf-8-sig")
+        report = await run_db(import_products, lines, fmt, batch_size, op="products.import")
+
+        version = await run_db(get_catalog_service().refresh)
+        print(f"✅ 商品匯入完成: {report['valid']} 筆有效, {report['error_count']} 筆錯誤")
+
+        # 中途無法解碼時，先前的批次已寫入；success=False 讓前端提示檢查報告
+        return JSONResponse(
+            content={
+                "success": not report['aborted'],
+                "report": report,
+                "version": version
+            }
+        )
+
+    except HTTPException:
+        raise
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="檔案必須為 UTF-8 編碼")
+    except Exception as exc:
+        print(f"❌ 匯入商品錯誤: {exc}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.put("/api/admin/product/{yolo_class_id}")
+async def update_product(yolo_class_id: int, data: dict):
+    """
+    更新商品名稱或價格，並立即套用到商品目錄快取
+    """
+    try:
+        update_data = {}
+        if 'name' in data:
+            update_data['name'] = str(data['name'])
+        if 'price' in data:
+            try:
+                update_data['price'] = float(data['price'])
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="價格格式錯誤")
+            if update_data['price'] < 0:
+                raise HTTPException(status_code=400, detail="價格不可為負數")
+
+        if not update_data:
+            raise HTTPException(status_code=400, detail="沒有可更新的欄位")
+
+        adb = Database.get_async_db()
+        result = await adb.products.update_one(
+            {"yolo_class_id": yolo_class_id},
+            {"$set": update_data}
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="商品不存在")
+
+        version = await run_db(get_catalog_service().refresh)
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "商品資訊已更新",
+                "version": version
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as exc:
+        print(f"❌ 更新商品錯誤: {exc}")
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.delete("/api/admin/product/{yolo_class_id}")
+async def delete_product(yolo_class_id: int):
+    """
+    刪除商品
+    """
+    try:
+        adb = Database.get_async_db()
+        result = await adb.products.delete_one({"yolo_class_id": yolo_class_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="商品不存在")
+
+        version = await run_db(get_catalog_service().refresh)
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "商品已刪除",
+                "version": version
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as exc:
+        print(f"❌ 刪除商品錯誤: {exc}")
         raise HTTPException(status_code=500, detail=str(exc))
 
 
@@ -968,10 +1808,9 @@ async def update_user(user_id: str, data: dict):
     更新使用者資訊
     """
     try:
-        from bson import ObjectId
-        db = Database.get_db()
+        adb = Database.get_async_db()
 
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await adb.users.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
         if not user:
             raise HTTPException(status_code=404, detail="使用者不存在")
 
@@ -992,16 +1831,14 @@ async def update_user(user_id: str, data: dict):
 
         # 更新資料庫
         if update_data:
-            db.users.update_one(
+            await adb.users.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
 
         # 如果姓名或電話變更，需要更新記憶體中的資料
         if 'name' in update_data:
-            face_service = get_face_service()
-            if user_id in face_service.known_users:
-                face_service.known_users[user_id]['name'] = update_data['name']
+            get_face_service().rename_user(user_id, update_data['name'])
 
         return JSONResponse(
             content={
@@ -1023,31 +1860,27 @@ async def delete_user(user_id: str):
     刪除使用者
     """
     try:
-        from bson import ObjectId
         import os
-        db = Database.get_db()
+        adb = Database.get_async_db()
 
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = await adb.users.find_one({"_id": ObjectId(user_id)}, {"name": 1})
         if not user:
             raise HTTPException(status_code=404, detail="使用者不存在")
 
         # 刪除使用者資料
-        db.users.delete_one({"_id": ObjectId(user_id)})
+        await adb.users.delete_one({"_id": ObjectId(user_id)})
 
         # 刪除人臉圖片
         try:
-            face_image_path = Path(__file__).parent / "data" / "faces" / f"{user_id}.jpg"
+            face_image_path = FACE_IMAGES_DIR / f"{user_id}.jpg"
             if face_image_path.exists():
                 os.remove(face_image_path)
+            get_avatar_service().delete(user_id)
         except Exception as e:
             print(f"⚠️ 刪除人臉圖片失敗: {e}")
 
         # 從記憶體中移除
-        face_service = get_face_service()
-        if user_id in face_service.known_faces:
-            del face_service.known_faces[user_id]
-        if user_id in face_service.known_users:
-            del face_service.known_users[user_id]
+        get_face_service().forget_user(user_id)
 
         print(f"✅ 使用者已刪除: {user.get('name')} ({user_id})")
 
@@ -1066,10 +1899,18 @@ async def delete_user(user_id: str):
 
 # ==================== 靜態檔案 ====================
 
-# 掛載靜態檔案（如果存在）
-static_dir = BASE_DIR / "frontend" / "static"
-if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+@app.get("/static/{path:path}")
+async def static_file(path: str, request: Request, v: Optional[str] = None):
+    """
+    提供記憶體中的靜態資源
+
+    網址帶有符合目前內容的 ?v= 雜湊時長期快取，否則每次以 ETag 重新驗證。
+    """
+    asset = get_static_service().get_asset(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="檔案不存在")
+
+    return asset_response(request, asset, immutable=(v == asset.digest))
 
 # ==================== 主程式入口 ====================
 
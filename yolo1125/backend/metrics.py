@@ -0,0 +1,140 @@
+"""
+輕量的延遲統計工具
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 預設延遲分桶上限（毫秒）
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """累積分桶直方圖（執行緒安全）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets: List[float] = sorted(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # 最後一格為 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """記錄一筆觀測值"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> Dict:
+        """
+        取得目前統計
+
+        Returns:
+            {'count', 'sum', 'avg', 'max', 'buckets': {上限: 累積數量}}
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count, total, maximum = self.count, self.sum, self.max
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [float('inf')], counts):
+            running += bucket_count
+            cumulative['+Inf' if bound == float('inf') else bound] = running
+
+        return {
+            'count': count,
+            'sum': round(total, 3),
+            'avg': round(total / count, 3) if count else 0,
+            'max': round(maximum, 3),
+            'buckets': cumulative
+        }
+
+
+class Counter:
+    """單調遞增計數器（執行緒安全）"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        """累加"""
+        with self._lock:
+            self.value += amount
+
+
+# 影格處理（handle_frame）的各階段
+FRAME_STAGES = (
+    'base64_decode', 'jpeg_decode', 'face_detect', 'face_encode', 'face_match',
+    'yolo_inference', 'yolo_postprocess', 'send'
+)
+
+# 各階段耗時直方圖（毫秒）
+frame_stage_latency: Dict[str, Histogram] = {stage: Histogram() for stage in FRAME_STAGES}
+
+# 影格計數：收到、因頻率限制略過、因無法處理而丟棄
+frame_counters: Dict[str, Counter] = {name: Counter() for name in ('received', 'throttled', 'dropped')}
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """記錄區塊耗時到指定階段的直方圖"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        frame_stage_latency[stage].observe((time.perf_counter() - start) * 1000)
+
+
+def _escape_label(value) -> str:
+    """跳脫 Prometheus 標籤值中的反斜線、引號與換行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Prometheus 標籤字串"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def prometheus_metric(name: str, metric_type: str, help_text: str,
+                      samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """
+    產生 counter / gauge 的 Prometheus 文字格式
+
+    Args:
+        samples: [(標籤, 數值)]
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    return lines
+
+
+def prometheus_histogram(name: str, help_text: str,
+                         series: Iterable[Tuple[Dict[str, str], Histogram]]) -> List[str]:
+    """
+    產生直方圖的 Prometheus 文字格式（毫秒分桶轉為秒）
+
+    Args:
+        series: [(標籤, Histogram)]
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series:
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot['buckets'].items():
+            le = bound if bound == '+Inf' else f"{bound / 1000:g}"
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum'] / 1000:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    return lines
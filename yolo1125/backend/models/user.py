@@ -11,6 +11,8 @@ class User(BaseModel):
     face_image_path: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_visit: datetime = Field(default_factory=datetime.utcnow)
+    total_spent: float = 0  # 累積消費（結帳時 $inc 累加）
+    transaction_count: int = 0
 
     class Config:
         populate_by_name = True
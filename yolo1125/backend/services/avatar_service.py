@@ -0,0 +1,125 @@
+"""
+頭像服務
+產生使用者頭像縮圖，並以 LRU 快取編碼後的圖片供 /api/avatar 端點使用
+"""
+
+import asyncio
+import threading
+import cv2
+import numpy as np
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional
+
+from backend.config import FACE_IMAGES_DIR, AVATAR_THUMBNAIL_SIZE, AVATAR_CACHE_SIZE
+
+# 縮圖目錄
+THUMBNAIL_DIR = FACE_IMAGES_DIR / "thumbs"
+
+
+class AvatarService:
+    """頭像服務"""
+
+    def __init__(self):
+        # user_id -> {'body', 'etag', 'last_modified'}
+        self.cache: "OrderedDict[str, Dict]" = OrderedDict()
+        # _load 在執行緒中執行且會經由 save_thumbnail 呼叫 invalidate，快取操作需加鎖
+        self._lock = threading.Lock()
+        THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+
+    def save_thumbnail(self, user_id: str, face_image: np.ndarray) -> Path:
+        """
+        產生並儲存頭像縮圖
+
+        Args:
+            user_id: 使用者 ID
+            face_image: 人臉圖片 (BGR format)
+
+        Returns:
+            縮圖路徑
+        """
+        height, width = face_image.shape[:2]
+        scale = min(1.0, AVATAR_THUMBNAIL_SIZE / max(height, width))
+        if scale < 1.0:
+            face_image = cv2.resize(
+                face_image,
+                (max(1, int(width * scale)), max(1, int(height * scale))),
+                interpolation=cv2.INTER_AREA
+            )
+
+        thumb_path = THUMBNAIL_DIR / f"{user_id}.jpg"
+        cv2.imwrite(str(thumb_path), face_image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        self.invalidate(user_id)
+        return thumb_path
+
+    def _load(self, user_id: str) -> Optional[Dict]:
+        """讀取縮圖（不存在時由原圖產生），在執行緒中執行"""
+        thumb_path = THUMBNAIL_DIR / f"{user_id}.jpg"
+
+        if not thumb_path.exists():
+            source_path = FACE_IMAGES_DIR / f"{user_id}.jpg"
+            if not source_path.exists():
+                return None
+            image = cv2.imread(str(source_path))
+            if image is None:
+                return None
+            self.save_thumbnail(user_id, image)
+
+        stat = thumb_path.stat()
+        return {
+            'body': thumb_path.read_bytes(),
+            'etag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            'last_modified': formatdate(stat.st_mtime, usegmt=True)
+        }
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        """
+        取得頭像縮圖
+
+        Returns:
+            {'body': bytes, 'etag': str, 'last_modified': str} 或 None
+        """
+        with self._lock:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                self.cache.move_to_end(user_id)
+                return cached
+
+        # 磁碟 I/O 與縮圖產生放到執行緒，避免阻塞事件迴圈
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._load, user_id)
+        if entry is None:
+            return None
+
+        with self._lock:
+            self.cache[user_id] = entry
+            self.cache.move_to_end(user_id)
+            while len(self.cache) > AVATAR_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+        return entry
+
+    def invalidate(self, user_id: str):
+        """移除快取"""
+        with self._lock:
+            self.cache.pop(user_id, None)
+
+    def delete(self, user_id: str):
+        """刪除縮圖與快取"""
+        self.invalidate(user_id)
+        thumb_path = THUMBNAIL_DIR / f"{user_id}.jpg"
+        if thumb_path.exists():
+            thumb_path.unlink()
+
+
+# 全域單例
+_avatar_service = None
+
+
+def get_avatar_service() -> AvatarService:
+    """獲取頭像服務單例"""
+    global _avatar_service
+    if _avatar_service is None:
+        _avatar_service = AvatarService()
+    return _avatar_service
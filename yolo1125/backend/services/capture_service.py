@@ -0,0 +1,213 @@
+"""
+主動學習影格擷取服務
+將偵測信心度接近門檻的影格與預測框（YOLO 標籤格式）寫入待標註資料集，
+目錄結構與 train.py 相同（images/{train,val}、labels/{train,val}）
+
+標籤只保留信心度不低於 CONFIDENCE_THRESHOLD - CAPTURE_CONF_MARGIN 的預測框；
+更低的框多半是誤判，留給審核者補標。超過磁碟配額時暫停擷取，背景每
+CAPTURE_RESCAN_INTERVAL 秒重新計算用量，審核者移走樣本後會自動恢復。
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backend.config import (
+    CAPTURE_DIR, CAPTURE_CONF_MARGIN, CAPTURE_MIN_INTERVAL, CAPTURE_QUEUE_SIZE,
+    CAPTURE_MAX_BYTES, CAPTURE_VAL_RATIO, CAPTURE_JPEG_QUALITY, CAPTURE_RESCAN_INTERVAL,
+    CONFIDENCE_THRESHOLD
+)
+
+# 一個預測框: (class_id, confidence, (cx, cy, w, h) 正規化座標)
+Box = Tuple[int, float, Sequence[float]]
+
+# 寫入標籤的最低信心度
+LABEL_MIN_CONF = CONFIDENCE_THRESHOLD - CAPTURE_CONF_MARGIN
+
+
+class CaptureService:
+    """
+    影格擷取服務
+
+    offer() 只做判斷並 put_nowait 進有界佇列，JPEG 編碼與寫檔都在背景執行緒，
+    不會增加影格處理的延遲；佇列已滿、間隔太短或超過磁碟配額時直接丟棄。
+    統計會同時被事件迴圈與寫入執行緒更新，以 lock 保護。
+    """
+
+    def __init__(self, root: Path = CAPTURE_DIR):
+        self.root = Path(root)
+        for kind in ('images', 'labels'):
+            for split in ('train', 'val'):
+                (self.root / kind / split).mkdir(parents=True, exist_ok=True)
+
+        self.stats = {
+            'offered': 0, 'written': 0, 'bytes': 0,
+            'dropped_interval': 0, 'dropped_full': 0, 'dropped_quota': 0, 'errors': 0
+        }
+        self.over_quota = False
+        self._stats_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=CAPTURE_QUEUE_SIZE)
+        self._last_capture = 0.0
+        self._sequence = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-capture", daemon=True)
+        self._thread.start()
+
+    def offer(self, frame: np.ndarray, boxes: List[Box]) -> bool:
+        """
+        提供一個已偵測的影格，信心度接近門檻時排入擷取佇列
+
+        Args:
+            frame: OpenCV 影像 (BGR format)，呼叫後不可再修改
+            boxes: 過濾前的所有預測框
+
+        Returns:
+            是否已排入佇列
+        """
+        if not any(abs(conf - CONFIDENCE_THRESHOLD) <= CAPTURE_CONF_MARGIN for _, conf, _ in boxes):
+            return False
+
+        self._count('offered')
+        if self.over_quota:
+            self._count('dropped_quota')
+            return False
+
+        now = time.monotonic()
+        if now - self._last_capture < CAPTURE_MIN_INTERVAL:
+            self._count('dropped_interval')
+            return False
+
+        try:
+            self._queue.put_nowait((frame, boxes, datetime.now()))
+        except queue.Full:
+            self._count('dropped_full')
+            return False
+
+        self._last_capture = now
+        return True
+
+    def _count(self, key: str, amount: int = 1):
+        """累加統計"""
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def get_stats(self) -> Dict:
+        """取得擷取統計"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'queue_depth': self._queue.qsize(),
+            'quota_bytes': CAPTURE_MAX_BYTES,
+            'over_quota': self.over_quota,
+            'path': str(self.root)
+        }
+
+    def close(self):
+        """寫完佇列中的影格後停止"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _scan_usage(self):
+        """重新計算擷取目錄用量（審核者移走樣本後解除配額限制）"""
+        used = 0
+        for path in self.root.rglob('*'):
+            try:
+                if path.is_file():
+                    used += path.stat().st_size
+            except OSError:
+                # 掃描期間被移走的檔案
+                continue
+
+        with self._stats_lock:
+            self.stats['bytes'] = used
+        was_over = self.over_quota
+        self.over_quota = used >= CAPTURE_MAX_BYTES
+        if was_over and not self.over_quota:
+            print(f"✅ 擷取目錄用量已低於配額，恢復擷取: {used / 1024 ** 2:.0f} MB")
+
+    def _run(self):
+        """背景寫入執行緒"""
+        # 目錄既有的用量在背景計算，不拖慢啟動
+        self._scan_usage()
+        last_scan = time.monotonic()
+
+        while not (self._stop.is_set() and self._queue.empty()):
+            if time.monotonic() - last_scan >= CAPTURE_RESCAN_INTERVAL:
+                self._scan_usage()
+                last_scan = time.monotonic()
+
+            try:
+                frame, boxes, captured_at = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                self._write(frame, boxes, captured_at)
+            except Exception as e:
+                self._count('errors')
+                print(f"❌ 影格擷取寫入失敗: {e}")
+
+    def _write(self, frame: np.ndarray, boxes: List[Box], captured_at: datetime):
+        """寫入一個樣本（標籤先寫，確保存在的圖片都有對應標籤）"""
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, CAPTURE_JPEG_QUALITY])
+        if not ok:
+            raise ValueError("JPEG 編碼失敗")
+
+        boxes = [box for box in boxes if box[1] >= LABEL_MIN_CONF]
+
+        label = ''.join(
+            f"{class_id} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n"
+            for class_id, _, (cx, cy, w, h) in boxes
+        )
+
+        size = len(encoded) + len(label)
+        if self.stats['bytes'] + size > CAPTURE_MAX_BYTES:
+            self.over_quota = True
+            self._count('dropped_quota')
+            return
+
+        self._sequence += 1
+        name = f"{captured_at.strftime('%Y%m%d_%H%M%S_%f')}_{self._sequence:06d}"
+        split = 'val' if random.random() < CAPTURE_VAL_RATIO else 'train'
+
+        (self.root / 'labels' / split / f"{name}.txt").write_text(label, encoding='utf-8')
+        image_path = self.root / 'images' / split / f"{name}.jpg"
+        tmp_path = image_path.with_suffix('.jpg.tmp')
+        tmp_path.write_bytes(encoded.tobytes())
+        os.replace(tmp_path, image_path)
+
+        # 信心度等資訊供人工審核時排序使用
+        record = json.dumps({
+            'file': f"{split}/{name}.jpg",
+            'captured_at': captured_at.isoformat(timespec='milliseconds'),
+            'boxes': [{'class_id': class_id, 'confidence': round(conf, 4)} for class_id, conf, _ in boxes]
+        }, separators=(',', ':'))
+        with open(self.root / 'captures.jsonl', 'a', encoding='utf-8') as f:
+            f.write(record + '\n')
+
+        with self._stats_lock:
+            self.stats['bytes'] += size
+            self.stats['written'] += 1
+
+
+# 全域單例
+_capture_service = None
+
+
+def get_capture_service() -> CaptureService:
+    """獲取影格擷取服務單例"""
+    global _capture_service
+    if _capture_service is None:
+        _capture_service = CaptureService()
+    return _capture_service
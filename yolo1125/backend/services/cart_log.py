@@ -0,0 +1,141 @@
+"""
+購物車事件日誌
+以 append-only 檔案記錄每次購物車異動，後端重啟時可重播還原購物車
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from backend.config import CART_EVENT_LOG_PATH, CART_LOG_FLUSH_INTERVAL, CART_LOG_MAX_BATCH
+
+
+class CartEventLog:
+    """
+    購物車事件日誌
+
+    append() 只把事件放進記憶體佇列，由背景執行緒批次寫入並 fsync
+    （group commit），因此不會增加購物車操作的延遲。
+    """
+
+    def __init__(self, path: Path = CART_EVENT_LOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+        # 上次當機可能留下寫到一半的行，先補上換行避免與新事件黏在一起
+        if self._file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+                    self._file.flush()
+
+        self._thread = threading.Thread(target=self._run, name="cart-event-log", daemon=True)
+        self._thread.start()
+
+    def replay(self) -> Iterator[Dict]:
+        """依序讀出日誌中的所有事件（略過寫到一半的損壞行）"""
+        if not self.path.exists():
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️ 略過損壞的購物車事件: {line[:80]}")
+
+    def append(self, event: Dict):
+        """加入一筆事件（非同步寫入）"""
+        self._queue.put(('event', event))
+
+    def compact(self, carts: Dict[str, List[Dict]], updated_at: Optional[Dict[str, float]] = None):
+        """
+        以目前購物車快照取代整份日誌
+
+        Args:
+            carts: 呼叫當下的購物車快照（需為副本）
+            updated_at: 各購物車最後異動時間（寫入 set 事件，重播後仍可判斷閒置）
+        """
+        self._queue.put(('compact', (carts, dict(updated_at or {}))))
+
+    def close(self):
+        """寫出剩餘事件並關閉日誌"""
+        self._queue.put(('stop', None))
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        """背景寫入執行緒"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + CART_LOG_FLUSH_INTERVAL
+
+            # 在 flush 間隔內盡量收集更多事件一起寫入
+            while len(batch) < CART_LOG_MAX_BATCH and batch[-1][0] == 'event':
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                if not self._write_batch(batch):
+                    return
+            except Exception as e:
+                print(f"❌ 購物車事件寫入失敗: {e}")
+
+    def _write_batch(self, batch: List) -> bool:
+        """寫入一批事件，回傳 False 表示收到停止指令"""
+        lines = []
+
+        for kind, payload in batch:
+            if kind == 'event':
+                lines.append(json.dumps(payload, ensure_ascii=False, separators=(',', ':')))
+            elif kind == 'compact':
+                self._flush(lines)
+                lines = []
+                self._rewrite(*payload)
+            elif kind == 'stop':
+                self._flush(lines)
+                self._file.close()
+                return False
+
+        self._flush(lines)
+        return True
+
+    def _flush(self, lines: List[str]):
+        """寫入並同步到磁碟"""
+        if not lines:
+            return
+        self._file.write('\n'.join(lines) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rewrite(self, carts: Dict[str, List[Dict]], updated_at: Dict[str, float]):
+        """將快照寫入暫存檔後原子替換日誌"""
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for session_id, items in carts.items():
+                event = {'op': 'set', 'session_id': session_id, 'items': items}
+                if session_id in updated_at:
+                    event['ts'] = updated_at[session_id]
+                f.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
@@ -1,18 +1,96 @@
 """
 購物車服務
 管理每個 session 的購物車狀態
+
+購物車以連線的 session_id 為鍵。kiosk 斷線或後端重啟後，以相同 session_id
+重新連線（前端重新整理 index.html?session_id=... 即是如此）即可取回購物車；
+但登入狀態不會保留，使用者需重新人臉登入後才能結帳。
+閒置超過 CART_IDLE_TTL 的購物車視為放棄，會記錄 clear 事件並移除。
 """
 
+import copy
+import time
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from backend.config import CART_IDLE_TTL
+from backend.services.cart_log import CartEventLog
+
 
 class CartService:
     """購物車服務"""
 
-    def __init__(self):
+    def __init__(self, event_log: Optional[CartEventLog] = None):
         # 使用 session_id 管理每個連線的購物車
         self.carts: Dict[str, List[Dict]] = {}
+        self.updated_at: Dict[str, float] = {}  # session_id -> 最後異動時間 (time.time())
+
+        # 事件日誌：每次異動都會記錄，啟動時重播還原購物車
+        self.event_log = event_log
+        if self.event_log is not None:
+            self.restore()
+
+    def restore(self):
+        """重播事件日誌，重建所有購物車"""
+        count = 0
+        for event in self.event_log.replay():
+            try:
+                self._apply(event)
+                count += 1
+            except Exception as e:
+                print(f"⚠️ 重播購物車事件失敗: {e}")
+
+        # 移除空購物車與已閒置過久的購物車
+        self.carts = {sid: cart for sid, cart in self.carts.items() if cart}
+        expired = self.expire_idle()
+        print(f"✅ 重播 {count} 筆購物車事件，還原 {len(self.carts)} 個購物車（{expired} 個閒置過久已移除）")
+
+    def _apply(self, event: Dict):
+        """套用一筆事件（重播用，不再寫入日誌）"""
+        op = event['op']
+        session_id = event['session_id']
+        # 舊版日誌沒有時間戳，視為重播當下才異動
+        self.updated_at[session_id] = event.get('ts', time.time())
+
+        if op == 'add':
+            self._add(session_id, event['product'])
+        elif op == 'remove':
+            cart = self.get_cart(session_id)
+            if 0 <= event['index'] < len(cart):
+                cart.pop(event['index'])
+        elif op == 'clear':
+            self.carts.pop(session_id, None)
+            self.updated_at.pop(session_id, None)
+        elif op == 'set':
+            self.carts[session_id] = event['items']
+
+    def _log(self, event: Dict):
+        """寫入事件日誌（非同步，不影響延遲）"""
+        event['ts'] = self.updated_at[event['session_id']] = time.time()
+        if self.event_log is not None:
+            self.event_log.append(event)
+
+    def expire_idle(self, now: Optional[float] = None) -> int:
+        """
+        移除閒置超過 CART_IDLE_TTL 的購物車（斷線後未再回來的 kiosk）
+
+        Returns:
+            移除的購物車數
+        """
+        now = time.time() if now is None else now
+        expired = [
+            sid for sid in self.carts
+            if now - self.updated_at.get(sid, now) > CART_IDLE_TTL
+        ]
+
+        for session_id in expired:
+            del self.carts[session_id]
+            self.updated_at.pop(session_id, None)
+            if self.event_log is not None:
+                self.event_log.append({'op': 'clear', 'session_id': session_id, 'ts': now})
+            print(f"🧹 購物車閒置過久已移除: {session_id}")
+
+        return len(expired)
 
     def get_cart(self, session_id: str) -> List[Dict]:
         """取得購物車"""
@@ -31,34 +109,43 @@ class CartService:
         Returns:
             更新後的購物車狀態
         """
+        item, is_new = self._add(session_id, product)
+        self._log({
+            'op': 'add',
+            'session_id': session_id,
+            'product': {'id': product['id'], 'name': product['name'], 'price': product['price']}
+        })
+
+        if is_new:
+            print(f"🛒 加入購物車: {item['name']}")
+        else:
+            print(f"🛒 商品數量 +1: {item['name']} (x{item['quantity']})")
+
+        return self.get_cart_summary(session_id)
+
+    def _add(self, session_id: str, product: Dict):
+        """將商品加入購物車，回傳 (購物車項目, 是否為新商品)"""
         cart = self.get_cart(session_id)
         product_id = product['id']
 
         # 檢查商品是否已存在
-        existing_item = None
         for item in cart:
             if item['product_id'] == product_id:
-                existing_item = item
-                break
-
-        if existing_item:
-            # 商品已存在，數量 +1
-            existing_item['quantity'] += 1
-            existing_item['subtotal'] = existing_item['quantity'] * existing_item['unit_price']
-            print(f"🛒 商品數量 +1: {existing_item['name']} (x{existing_item['quantity']})")
-        else:
-            # 新商品
-            new_item = {
-                'product_id': product_id,
-                'name': product['name'],
-                'unit_price': product['price'],
-                'quantity': 1,
-                'subtotal': product['price']
-            }
-            cart.append(new_item)
-            print(f"🛒 加入購物車: {new_item['name']}")
-
-        return self.get_cart_summary(session_id)
+                # 商品已存在，數量 +1
+                item['quantity'] += 1
+                item['subtotal'] = item['quantity'] * item['unit_price']
+                return item, False
+
+        # 新商品
+        new_item = {
+            'product_id': product_id,
+            'name': product['name'],
+            'unit_price': product['price'],
+            'quantity': 1,
+            'subtotal': product['price']
+        }
+        cart.append(new_item)
+        return new_item, True
 
     def remove_item(self, session_id: str, index: int) -> Dict:
         """
@@ -75,6 +162,7 @@ class CartService:
 
         if 0 <= index < len(cart):
             removed_item = cart.pop(index)
+            self._log({'op': 'remove', 'session_id': session_id, 'index': index})
             print(f"🗑️  移除商品: {removed_item['name']}")
         else:
             print(f"⚠️  無效的商品索引: {index}")
@@ -82,10 +170,24 @@ class CartService:
         return self.get_cart_summary(session_id)
 
     def clear_cart(self, session_id: str):
-        """清空購物車"""
+        """清空購物車（結帳後呼叫，同時壓縮事件日誌）"""
         if session_id in self.carts:
             del self.carts[session_id]
             print(f"🧹 購物車已清空: {session_id}")
+        # 先記下清空事件，非同步壓縮完成前當機也不會還原已結帳的購物車
+        self._log({'op': 'clear', 'session_id': session_id})
+        self.updated_at.pop(session_id, None)
+        self.expire_idle()
+
+        if self.event_log is not None:
+            # 以剩餘購物車快照取代日誌，已結帳與已放棄的事件不再保留
+            snapshot = {sid: copy.deepcopy(cart) for sid, cart in self.carts.items() if cart}
+            self.event_log.compact(snapshot, self.updated_at)
+
+    def close(self):
+        """關閉事件日誌（確保事件已寫入磁碟）"""
+        if self.event_log is not None:
+            self.event_log.close()
 
     def get_cart_summary(self, session_id: str) -> Dict:
         """
@@ -123,5 +225,5 @@ def get_cart_service() -> CartService:
     """獲取購物車服務單例"""
     global _cart_service
     if _cart_service is None:
-        _cart_service = CartService()
+        _cart_service = CartService(event_log=CartEventLog())
     return _cart_service
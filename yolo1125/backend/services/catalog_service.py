@@ -0,0 +1,121 @@
+"""
+商品目錄快取服務
+YOLO 偵測與 /api/products 共用的商品資料快取，依 TTL 或寫入後呼叫 refresh() 重新載入
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.config import CATALOG_CACHE_TTL
+from backend.database import Database, submit_db
+
+
+class CatalogService:
+    """
+    商品目錄快取
+
+    每次重新載入會建立全新的 state 再整批替換參考，讀取端不需加鎖。
+    內容有變動時 version 加一，etag 為內容雜湊。
+    """
+
+    def __init__(self):
+        # version, etag, products（/api/products 回傳格式）,
+        # by_class_id（yolo_class_id -> {id, name, price, yolo_class_name}）
+        self.state: Dict = {'version': 0, 'etag': None, 'products': [], 'by_class_id': {}}
+        self.loaded_at = 0.0
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refresh()
+
+    def refresh(self) -> int:
+        """
+        從資料庫重新載入商品目錄（同步，請在資料庫執行緒池中呼叫）
+
+        Returns:
+            目前的版本號
+        """
+        try:
+            db = Database.get_db()
+            docs = list(db.products.find({}).sort("yolo_class_id", 1))
+        except Exception as e:
+            print(f"❌ 載入商品目錄失敗: {e}")
+            with self._lock:
+                # 失敗時同樣等 TTL 後再重試，避免每個影格都打資料庫
+                self.loaded_at = time.monotonic()
+                self._refreshing = False
+            return self.state['version']
+
+        products = []
+        by_class_id = {}
+        for doc in docs:
+            product = {k: v for k, v in doc.items() if k != '_id'}
+            if 'created_at' in product:
+                product['created_at'] = product['created_at'].isoformat()
+            products.append(product)
+
+            by_class_id[doc.get('yolo_class_id')] = {
+                'id': str(doc['_id']),
+                'name': doc['name'],
+                'price': doc['price'],
+                'yolo_class_name': doc.get('yolo_class_name', '')
+            }
+
+        content = json.dumps([products, by_class_id], sort_keys=True, ensure_ascii=False, default=str)
+        etag = '"' + hashlib.sha1(content.encode('utf-8')).hexdigest()[:16] + '"'
+
+        with self._lock:
+            if etag != self.state['etag']:
+                self.state = {
+                    'version': self.state['version'] + 1,
+                    'etag': etag,
+                    'products': products,
+                    'by_class_id': by_class_id
+                }
+                print(f"✅ 商品目錄已載入: {len(products)} 個商品 (版本 {self.state['version']})")
+            self.loaded_at = time.monotonic()
+            self._refreshing = False
+
+        return self.state['version']
+
+    def _check_ttl(self):
+        """TTL 到期時於背景重新載入（讀取端繼續使用舊資料，不會被阻塞）"""
+        if time.monotonic() - self.loaded_at < CATALOG_CACHE_TTL:
+            return
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        submit_db(self.refresh)
+
+    def get_by_class_id(self, class_id: int) -> Optional[Dict]:
+        """根據 YOLO class_id 查詢商品"""
+        self._check_ttl()
+        return self.state['by_class_id'].get(class_id)
+
+    def snapshot(self) -> Dict:
+        """
+        取得目前目錄
+
+        Returns:
+            {'version': int, 'etag': str, 'products': [...], 'by_class_id': {...}}
+        """
+        self._check_ttl()
+        return self.state
+
+
+# 全域單例
+_catalog_service = None
+
+
+def get_catalog_service() -> CatalogService:
+    """獲取商品目錄服務單例"""
+    global _catalog_service
+    if _catalog_service is None:
+        _catalog_service = CatalogService()
+    return _catalog_service
@@ -3,6 +3,7 @@
 使用 face_recognition 進行人臉偵測、特徵提取、比對和註冊
 """
 
+import threading
 import face_recognition
 import cv2
 import numpy as np
@@ -12,7 +13,9 @@ from datetime import datetime
 from bson import ObjectId
 
 from backend.config import FACE_IMAGES_DIR, FACE_MATCH_TOLERANCE, BASE_DIR
-from backend.database import Database
+from backend.database import Database, submit_db
+from backend.metrics import stage_timer
+from backend.services.avatar_service import get_avatar_service
 
 
 class FaceService:
@@ -21,6 +24,8 @@ class FaceService:
     def __init__(self):
         self.known_faces = {}  # user_id -> face_encoding
         self.known_users = {}  # user_id -> user_info
+        # register_user 在資料庫執行緒池執行，match_face 在事件迴圈執行，記憶體快取需加鎖
+        self._lock = threading.Lock()
         self.load_known_faces()
 
         # 確保人臉圖片目錄存在
@@ -67,13 +72,15 @@ class FaceService:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
             # 偵測人臉位置
-            face_locations = face_recognition.face_locations(rgb_frame, model='hog')
+            with stage_timer('face_detect'):
+                face_locations = face_recognition.face_locations(rgb_frame, model='hog')
 
             if not face_locations:
                 return []
 
             # 提取人臉特徵
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            with stage_timer('face_encode'):
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
 
             results = []
             for encoding, location in zip(face_encodings, face_locations):
@@ -95,13 +102,15 @@ class FaceService:
         Returns:
             使用者資訊 {id, name, phone, distance, created_at} 或 None
         """
-        if not self.known_faces:
+        with self._lock:
+            known_ids = list(self.known_faces.keys())
+            known_encodings = [self.known_faces[uid] for uid in known_ids]
+
+        if not known_ids:
             return None
 
         try:
             # 計算與所有已知人臉的距離
-            known_ids = list(self.known_faces.keys())
-            known_encodings = [self.known_faces[uid] for uid in known_ids]
 
             face_distances = face_recognition.face_distance(known_encodings, face_encoding)
 
@@ -112,7 +121,12 @@ class FaceService:
             # 檢查是否在容忍範圍內
             if best_distance < FACE_MATCH_TOLERANCE:
                 user_id = known_ids[best_match_index]
-                user_info = self.known_users[user_id].copy()
+                with self._lock:
+                    user_info = self.known_users.get(user_id)
+                if user_info is None:
+                    # 比對期間使用者已被刪除
+                    return None
+                user_info = user_info.copy()
                 user_info['distance'] = float(best_distance)
 
                 # 更新最後訪問時間
@@ -155,7 +169,9 @@ class FaceService:
                 'face_encoding': face_encoding.tolist(),
                 'face_image_path': '',  # 稍後更新
                 'created_at': datetime.utcnow(),
-                'last_visit': datetime.utcnow()
+                'last_visit': datetime.utcnow(),
+                'total_spent': 0,
+                'transaction_count': 0
             }
 
             # 添加生日（如果提供）
@@ -177,6 +193,7 @@ class FaceService:
             # 儲存人臉圖片
             image_path = FACE_IMAGES_DIR / f"{user_id}.jpg"
             cv2.imwrite(str(image_path), face_image)
+            get_avatar_service().save_thumbnail(user_id, face_image)
 
             # 更新圖片路徑
             db.users.update_one(
@@ -185,13 +202,14 @@ class FaceService:
             )
 
             # 加入記憶體快取
-            self.known_faces[user_id] = face_encoding
-            self.known_users[user_id] = {
-                'id': user_id,
-                'name': name,
-                'phone': phone,
-                'created_at': user_doc['created_at'].isoformat()
-            }
+            with self._lock:
+                self.known_faces[user_id] = face_encoding
+                self.known_users[user_id] = {
+                    'id': user_id,
+                    'name': name,
+                    'phone': phone,
+                    'created_at': user_doc['created_at'].isoformat()
+                }
 
             print(f"✅ 使用者註冊成功: {name} ({phone})")
 
@@ -211,11 +229,24 @@ class FaceService:
             print(f"❌ 使用者註冊失敗: {e}")
             raise
 
+    def rename_user(self, user_id: str, name: str):
+        """更新記憶體快取中的姓名"""
+        with self._lock:
+            if user_id in self.known_users:
+                self.known_users[user_id]['name'] = name
+
+    def forget_user(self, user_id: str):
+        """從記憶體快取移除使用者"""
+        with self._lock:
+            self.known_faces.pop(user_id, None)
+            self.known_users.pop(user_id, None)
+
     def update_last_visit(self, user_id: str):
-        """更新使用者最後訪問時間"""
+        """更新使用者最後訪問時間（於資料庫執行緒池背景執行，不阻塞呼叫端）"""
         try:
             db = Database.get_db()
-            db.users.update_one(
+            submit_db(
+                db.users.update_one,
                 {'_id': ObjectId(user_id)},
                 {'$set': {'last_visit': datetime.utcnow()}}
             )
@@ -0,0 +1,173 @@
+"""
+商品目錄匯入
+串流讀取 CSV / NDJSON 商品目錄，逐列驗證後以 bulk_write 批次 upsert
+"""
+
+import csv
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from backend.database import Database
+
+# 匯入欄位
+REQUIRED_FIELDS = ('name', 'price', 'yolo_class_id', 'yolo_class_name')
+
+# 錯誤報告最多保留的筆數
+MAX_REPORTED_ERRORS = 1000
+
+
+def validate_product(row: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    驗證並正規化一筆商品資料
+
+    Returns:
+        (商品文件, None) 或 (None, 錯誤訊息)
+    """
+    missing = [f for f in REQUIRED_FIELDS if row.get(f) in (None, '')]
+    if missing:
+        return None, f"缺少欄位: {', '.join(missing)}"
+
+    try:
+        price = float(row['price'])
+    except (TypeError, ValueError):
+        return None, f"價格格式錯誤: {row['price']}"
+    if price < 0:
+        return None, f"價格不可為負數: {price}"
+
+    try:
+        yolo_class_id = int(str(row['yolo_class_id']).strip())
+    except (TypeError, ValueError):
+        return None, f"yolo_class_id 格式錯誤: {row['yolo_class_id']}"
+    if yolo_class_id < 0:
+        return None, f"yolo_class_id 不可為負數: {yolo_class_id}"
+
+    product = {
+        'name': str(row['name']).strip(),
+        'price': price,
+        'yolo_class_id': yolo_class_id,
+        'yolo_class_name': str(row['yolo_class_name']).strip()
+    }
+    if row.get('image'):
+        product['image'] = str(row['image']).strip()
+
+    return product, None
+
+
+def iter_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    逐列解析輸入
+
+    Args:
+        lines: 文字行（檔案物件即可，不會整份讀入記憶體）
+        fmt: 'csv' 或 'ndjson'
+
+    Yields:
+        (列號, 原始資料, 解析錯誤)
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'ndjson':
+        for line_num, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, None, f"JSON 格式錯誤: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, "每行必須是 JSON 物件"
+                continue
+            yield line_num, row, None
+    else:
+        raise ValueError(f"不支援的格式: {fmt}")
+
+
+def import_products(lines: Iterable[str], fmt: str, batch_size: int = 500) -> Dict:
+    """
+    匯入商品目錄（同步，請在資料庫執行緒池或 CLI 中呼叫）
+
+    以 yolo_class_id 為鍵 upsert；檔案中重複的 yolo_class_id 以第一次出現者為準，
+    之後的列記為錯誤。檔案中途無法解碼時停止匯入並設定 aborted，先前的批次已寫入。
+
+    Returns:
+        {'processed', 'valid', 'upserted', 'modified', 'error_count', 'aborted', 'errors': [{'row', 'error'}]}
+    """
+    db = Database.get_db()
+    report = {
+        'processed': 0, 'valid': 0, 'upserted': 0, 'modified': 0,
+        'error_count': 0, 'aborted': False, 'errors': []
+    }
+    batch: Dict[int, Tuple[int, Dict]] = {}  # yolo_class_id -> (列號, 商品)
+    seen: Dict[int, int] = {}  # yolo_class_id -> 第一次出現的列號
+
+    def add_error(row_num: int, message: str):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_num, 'error': message})
+
+    def flush():
+        if not batch:
+            return
+        entries: List[Tuple[int, Dict]] = list(batch.values())
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'yolo_class_id': product['yolo_class_id']},
+                {'$set': product, '$setOnInsert': {'created_at': now}},
+                upsert=True
+            )
+            for _, product in entries
+        ]
+        try:
+            result = db.products.bulk_write(operations, ordered=False)
+            report['upserted'] += result.upserted_count
+            report['modified'] += result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            report['upserted'] += details.get('nUpserted', 0)
+            report['modified'] += details.get('nModified', 0)
+            for error in details.get('writeErrors', []):
+                add_error(entries[error['index']][0], error.get('errmsg', '寫入失敗'))
+        batch.clear()
+
+    last_row = 0
+    try:
+        for row_num, row, parse_error in iter_rows(lines, fmt):
+            last_row = row_num
+            report['processed'] += 1
+            if parse_error:
+                add_error(row_num, parse_error)
+                continue
+
+            product, error = validate_product(row)
+            if error:
+                add_error(row_num, error)
+                continue
+
+            class_id = product['yolo_class_id']
+            if class_id in seen:
+                add_error(row_num, f"yolo_class_id {class_id} 重複（已於第 {seen[class_id]} 列匯入）")
+                continue
+            seen[class_id] = row_num
+
+            report['valid'] += 1
+            batch[class_id] = (row_num, product)
+            if len(batch) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        # 已寫入的批次不會回復，報告中標明停在哪一列
+        # 即使錯誤清單已達上限也要記錄中止位置
+        report['aborted'] = True
+        report['error_count'] += 1
+        report['errors'].append({'row': last_row + 1, 'error': f"無法解析，匯入中止: {e}"})
+
+    flush()
+    return report
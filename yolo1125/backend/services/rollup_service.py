@@ -0,0 +1,296 @@
+"""
+銷售彙總服務
+以每小時 / 每日、每商品為單位預先彙總銷售數量、營收與不重複顧客，
+讓管理端的時間區間圖表只需讀取少量彙總文件，不必掃描 transactions
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import ROLLUP_LAG, ROLLUP_BATCH_SIZE, ROLLUP_UTC_OFFSET_HOURS, ROLLUP_LEASE_TTL
+from backend.database import Database
+
+# 時間粒度 -> 彙總 collection
+ROLLUP_COLLECTIONS = {
+    'hour': 'sales_hourly',
+    'day': 'sales_daily'
+}
+
+# stats collection 中存放彙總進度（最後處理的 created_at / _id）的文件 ID
+ROLLUP_STATE_ID = "rollup"
+
+# stats collection 中的跨程序互斥 lease 文件 ID（伺服器與 rebuild_rollups.py 共用）
+ROLLUP_LEASE_ID = "rollup_lease"
+
+
+def bucket_start(created_at: datetime, granularity: str) -> datetime:
+    """
+    計算交易所屬時間桶的起點（UTC）
+
+    日彙總依 ROLLUP_UTC_OFFSET_HOURS 指定的當地時區切日。
+    """
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return hour
+
+    offset = timedelta(hours=ROLLUP_UTC_OFFSET_HOURS)
+    local_day = (hour + offset).replace(hour=0)
+    return local_day - offset
+
+
+class RollupService:
+    """
+    銷售彙總服務
+
+    由背景工作從上次處理的 (created_at, _id) 續跑。每批交易影響到的小時桶從
+    transactions 重新計算、日桶由小時桶加總後以 $set 寫入，因此進度尚未寫入就中斷、重跑同一批時
+    結果不變，不會重複累加。同一程序內以 lock、跨程序以 stats 中的 lease 文件互斥。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _acquire_lease(self, db) -> bool:
+        """取得或續約跨程序 lease（已被其他未過期的持有者取得時回傳 False）"""
+        now = datetime.utcnow()
+        try:
+            db.stats.update_one(
+                {'_id': ROLLUP_LEASE_ID, '$or': [{'owner': self._owner}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'owner': self._owner, 'expires_at': now + timedelta(seconds=ROLLUP_LEASE_TTL)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # lease 文件存在但屬於其他持有者
+            return False
+
+    def _release_lease(self, db):
+        """釋放 lease"""
+        db.stats.delete_one({'_id': ROLLUP_LEASE_ID, 'owner': self._owner})
+
+    def catch_up(self) -> int:
+        """
+        彙總尚未處理的交易（同步，請在資料庫執行緒池或 CLI 中呼叫）
+
+        Returns:
+            本次處理的交易筆數（其他執行緒或程序正在彙總時回傳 0）
+        """
+        if not self._lock.acquire(blocking=False):
+            # 另一個彙總正在執行
+            return 0
+
+        try:
+            db = Database.get_db()
+            if not self._acquire_lease(db):
+                return 0
+            try:
+                return self._catch_up(db)
+            finally:
+                self._release_lease(db)
+        finally:
+            self._lock.release()
+
+    def _catch_up(self, db) -> int:
+        """從上次進度續跑（呼叫端需持有 lock 與 lease）"""
+        state = db.stats.find_one({'_id': ROLLUP_STATE_ID}) or {}
+        last_created_at = state.get('last_created_at')
+        last_id = state.get('last_id')
+        cutoff = datetime.utcnow() - timedelta(seconds=ROLLUP_LAG)
+
+        processed = 0
+        while True:
+            query = {'created_at': {'$lt': cutoff}}
+            if last_created_at is not None:
+                query['$or'] = [
+                    {'created_at': {'$gt': last_created_at}},
+                    {'created_at': last_created_at, '_id': {'$gt': last_id}}
+                ]
+
+            transactions = list(
+                db.transactions.find(
+                    query,
+                    {'user_id': 1, 'items': 1, 'created_at': 1}
+                ).sort([('created_at', 1), ('_id', 1)]).limit(ROLLUP_BATCH_SIZE)
+            )
+            if not transactions:
+                break
+
+            self._apply(db, transactions)
+
+            last_created_at = transactions[-1]['created_at']
+            last_id = transactions[-1]['_id']
+            db.stats.update_one(
+                {'_id': ROLLUP_STATE_ID},
+                {'$set': {'last_created_at': last_created_at, 'last_id': last_id}},
+                upsert=True
+            )
+            processed += len(transactions)
+
+            if len(transactions) < ROLLUP_BATCH_SIZE:
+                break
+            if not self._acquire_lease(db):
+                # lease 已過期且被其他程序接手，交給對方續跑
+                break
+
+        if processed:
+            print(f"✅ 銷售彙總: 處理 {processed} 筆交易")
+        return processed
+
+    def _apply(self, db, transactions: List[Dict]):
+        """
+        重新計算這批交易影響到的時間桶並以 $set 寫入
+
+        小時桶從 transactions 重讀（只讀這批第一筆所在的小時起），只計入排序位置
+        不晚於這批最後一筆的交易；日桶再由當天的小時桶加總。結果只取決於這批的終點，
+        重跑同一批結果相同，且每批只讀自己涉及的小時，不會隨當天交易量重複掃描。
+        """
+        first, last = transactions[0], transactions[-1]
+        first_hour = bucket_start(first['created_at'], 'hour')
+        source = db.transactions.find(
+            {
+                'created_at': {'$gte': first_hour, '$lte': last['created_at']},
+                '$or': [
+                    {'created_at': {'$lt': last['created_at']}},
+                    {'created_at': last['created_at'], '_id': {'$lte': last['_id']}}
+                ]
+            },
+            {'user_id': 1, 'items': 1, 'created_at': 1}
+        )
+
+        hourly: Dict = {}
+        for transaction in source:
+            bucket = bucket_start(transaction['created_at'], 'hour')
+            for item in transaction.get('items', []):
+                entry = hourly.setdefault((bucket, item['product_id']), self._new_entry(item['name']))
+                entry['quantity'] += item['quantity']
+                entry['revenue'] += item['subtotal']
+                entry['shoppers'].add(transaction['user_id'])
+        self._write(db, 'hour', hourly)
+
+        # 受影響的日桶：由該日所有小時桶（含本批之前已寫入的）重新加總
+        touched: Dict = {}
+        for bucket, product_id in hourly:
+            touched.setdefault(bucket_start(bucket, 'day'), set()).add(product_id)
+
+        daily: Dict = {}
+        for day, product_ids in touched.items():
+            rows = db[ROLLUP_COLLECTIONS['hour']].find(
+                {'bucket': {'$gte': day, '$lt': day + timedelta(days=1)}, 'product_id': {'$in': list(product_ids)}}
+            ).sort('bucket', 1)
+            for row in rows:
+                entry = daily.setdefault((day, row['product_id']), self._new_entry(row['product_name']))
+                entry['quantity'] += row['quantity']
+                entry['revenue'] += row['revenue']
+                entry['shoppers'].update(row['shoppers'])
+        self._write(db, 'day', daily)
+
+    @staticmethod
+    def _new_entry(product_name: str) -> Dict:
+        """建立空的時間桶累計資料"""
+        return {'product_name': product_name, 'quantity': 0, 'revenue': 0, 'shoppers': set()}
+
+    @staticmethod
+    def _write(db, granularity: str, buckets: Dict):
+        """以 $set 寫入重新計算後的時間桶"""
+        operations = [
+            UpdateOne(
+                {'bucket': bucket, 'product_id': product_id},
+                {'$set': {
+                    'product_name': entry['product_name'],
+                    'quantity': entry['quantity'],
+                    'revenue': entry['revenue'],
+                    'shoppers': sorted(entry['shoppers'], key=str)
+                }},
+                upsert=True
+            )
+            for (bucket, product_id), entry in buckets.items()
+        ]
+        if operations:
+            db[ROLLUP_COLLECTIONS[granularity]].bulk_write(operations, ordered=False)
+
+    def get_series(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        product_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        取得時間區間內的彙總資料
+
+        Args:
+            granularity: 'hour' 或 'day'
+            start: 起始時間（UTC，含）
+            end: 結束時間（UTC，不含）
+            product_id: 只取單一商品（可選）
+
+        Returns:
+            [{'bucket', 'product_id', 'product_name', 'quantity', 'revenue', 'shoppers'}]
+        """
+        db = Database.get_db()
+        match = {'bucket': {'$gte': start, '$lt': end}}
+        if product_id:
+            match['product_id'] = product_id
+
+        return list(db[ROLLUP_COLLECTIONS[granularity]].aggregate([
+            {'$match': match},
+            {'$sort': {'bucket': 1, 'product_id': 1}},
+            {'$project': {
+                '_id': 0,
+                'bucket': 1,
+                'product_id': 1,
+                'product_name': 1,
+                'quantity': 1,
+                'revenue': 1,
+                'shoppers': {'$size': '$shoppers'}
+            }}
+        ]))
+
+    def rebuild(self, wait: float = 60.0) -> int:
+        """
+        清除所有彙總並從頭重新計算
+
+        持有跨程序 lease 直到完成，伺服器的背景彙總在此期間會直接略過。
+
+        Args:
+            wait: 等待其他程序釋放 lease 的秒數
+
+        Returns:
+            處理的交易筆數
+        """
+        db = Database.get_db()
+        with self._lock:
+            deadline = time.monotonic() + wait
+            while not self._acquire_lease(db):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("其他程序正在執行銷售彙總，請稍後再試")
+                time.sleep(1.0)
+
+            try:
+                for collection in ROLLUP_COLLECTIONS.values():
+                    db[collection].delete_many({})
+                db.stats.delete_one({'_id': ROLLUP_STATE_ID})
+                return self._catch_up(db)
+            finally:
+                self._release_lease(db)
+
+
+# 全域單例
+_rollup_service = None
+
+
+def get_rollup_service() -> RollupService:
+    """獲取銷售彙總服務單例"""
+    global _rollup_service
+    if _rollup_service is None:
+        _rollup_service = RollupService()
+    return _rollup_service
@@ -0,0 +1,187 @@
+"""
+靜態資源服務
+啟動時將 HTML 與 /static 資源載入記憶體並預先壓縮（gzip / brotli），
+HTML 中的資源網址加上內容雜湊（?v=）以便瀏覽器長期快取
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件，未安裝時只提供 gzip
+    brotli = None
+
+from backend.config import BASE_DIR
+
+FRONTEND_DIR = BASE_DIR / "frontend"
+STATIC_DIR = FRONTEND_DIR / "static"
+
+# 對外提供的 HTML 頁面
+HTML_PAGES = ("login.html", "index.html", "admin.html")
+
+# 需要壓縮的內容類型
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# HTML 中的 /static 資源網址
+STATIC_URL_PATTERN = re.compile(r'(["\'])/static/([^"\'?#]+)\1')
+
+
+class StaticAsset:
+    """記憶體中的靜態資源（含預先壓縮的版本）"""
+
+    def __init__(self, body: bytes, content_type: str, mtime_ns: int = 0):
+        self.content_type = content_type
+        self.mtime_ns = mtime_ns
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+
+        # encoding -> 內容，只保留比原檔小的壓縮版本
+        self.variants: Dict[str, bytes] = {'identity': body}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = compressed
+
+    def etag(self, encoding: str) -> str:
+        """各編碼版本的強 ETag"""
+        if encoding == 'identity':
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+
+def choose_encoding(accept_encoding: str, asset: StaticAsset) -> str:
+    """
+    依 Accept-Encoding 選擇回傳的編碼（br > gzip > identity）
+
+    Args:
+        accept_encoding: 請求的 Accept-Encoding 標頭
+        asset: 靜態資源
+
+    Returns:
+        'br'、'gzip' 或 'identity'
+    """
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+class StaticService:
+    """靜態資源服務"""
+
+    def __init__(self):
+        # 相對於 static 目錄的路徑 -> 資源
+        self.assets: Dict[str, StaticAsset] = {}
+        # 頁面名稱 -> 加上指紋後的 HTML
+        self.pages: Dict[str, StaticAsset] = {}
+        self.load()
+
+    def load(self):
+        """載入所有資源與頁面"""
+        assets = {}
+        if STATIC_DIR.exists():
+            for path in sorted(STATIC_DIR.rglob('*')):
+                if path.is_file():
+                    assets[path.relative_to(STATIC_DIR).as_posix()] = self._load_file(path)
+        self.assets = assets
+        self._render_pages()
+
+        total = sum(len(a.variants['identity']) for a in self.assets.values())
+        print(f"✅ 靜態資源已載入: {len(self.assets)} 個檔案, {len(self.pages)} 個頁面 ({total / 1024:.1f} KB)"
+              + ("" if brotli is not None else "，未安裝 brotli，只提供 gzip"))
+
+    def _load_file(self, path: Path) -> StaticAsset:
+        """讀取單一檔案"""
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type == 'application/javascript':
+            content_type += '; charset=utf-8'  # text/* 由回應自動加上 charset
+        return StaticAsset(path.read_bytes(), content_type, path.stat().st_mtime_ns)
+
+    def _render_pages(self):
+        """重新產生 HTML，將 /static 網址加上內容雜湊"""
+        def fingerprint(match):
+            quote, rel_path = match.group(1), match.group(2)
+            asset = self.assets.get(rel_path)
+            if asset is None:
+                return match.group(0)
+            return f'{quote}/static/{rel_path}?v={asset.digest}{quote}'
+
+        pages = {}
+        for name in HTML_PAGES:
+            path = FRONTEND_DIR / name
+            if not path.exists():
+                continue
+            html = STATIC_URL_PATTERN.sub(fingerprint, path.read_text(encoding='utf-8'))
+            pages[name] = StaticAsset(html.encode('utf-8'), 'text/html', path.stat().st_mtime_ns)
+        self.pages = pages
+
+    def reload_changed(self) -> int:
+        """
+        重新載入有變動的檔案（開發模式的檔案監看使用）
+
+        Returns:
+            變動的檔案數量
+        """
+        changed = 0
+        seen = set()
+        if STATIC_DIR.exists():
+            for path in STATIC_DIR.rglob('*'):
+                if not path.is_file():
+                    continue
+                rel_path = path.relative_to(STATIC_DIR).as_posix()
+                seen.add(rel_path)
+                asset = self.assets.get(rel_path)
+                if asset is None or asset.mtime_ns != path.stat().st_mtime_ns:
+                    self.assets[rel_path] = self._load_file(path)
+                    changed += 1
+
+        for rel_path in set(self.assets) - seen:
+            del self.assets[rel_path]
+            changed += 1
+
+        for name in HTML_PAGES:
+            path = FRONTEND_DIR / name
+            page = self.pages.get(name)
+            if path.exists() != (page is not None) or (page is not None and page.mtime_ns != path.stat().st_mtime_ns):
+                changed += 1
+
+        if changed:
+            self._render_pages()
+            print(f"🔄 靜態資源已重新載入: {changed} 個檔案變動")
+        return changed
+
+    def get_asset(self, rel_path: str) -> Optional[StaticAsset]:
+        """取得 /static 資源"""
+        return self.assets.get(rel_path)
+
+    def get_page(self, name: str) -> Optional[StaticAsset]:
+        """取得 HTML 頁面"""
+        return self.pages.get(name)
+
+
+# 全域單例
+_static_service = None
+
+
+def get_static_service() -> StaticService:
+    """獲取靜態資源服務單例"""
+    global _static_service
+    if _static_service is None:
+        _static_service = StaticService()
+    return _static_service
@@ -0,0 +1,106 @@
+"""
+銷售統計服務
+維護物化的銷售計數器，讓管理統計不必掃描整個 transactions collection
+"""
+
+from typing import Dict
+from bson import ObjectId
+
+from backend.database import Database
+
+# stats collection 中存放全店統計的文件 ID
+SALES_STATS_ID = "sales"
+
+
+class StatsService:
+    """銷售統計服務"""
+
+    def record_checkout(self, user_id: str, total_amount: float):
+        """
+        結帳後累加計數器
+
+        Args:
+            user_id: 使用者 ID
+            total_amount: 交易總金額
+        """
+        db = Database.get_db()
+
+        db.stats.update_one(
+            {'_id': SALES_STATS_ID},
+            {'$inc': {'total_transactions': 1, 'total_revenue': total_amount}},
+            upsert=True
+        )
+        db.users.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$inc': {'transaction_count': 1, 'total_spent': total_amount}}
+        )
+
+    def get_sales_stats(self) -> Dict:
+        """
+        取得全店統計（O(1) 讀取）
+
+        Returns:
+            {'total_users': int, 'total_transactions': int, 'total_revenue': float}
+        """
+        db = Database.get_db()
+        stats = db.stats.find_one({'_id': SALES_STATS_ID}) or {}
+
+        return {
+            'total_users': db.users.estimated_document_count(),
+            'total_transactions': stats.get('total_transactions', 0),
+            'total_revenue': stats.get('total_revenue', 0)
+        }
+
+    def rebuild(self) -> Dict:
+        """
+        以 aggregation 從 transactions 重新計算所有計數器
+
+        Returns:
+            重新計算後的全店統計
+        """
+        db = Database.get_db()
+
+        # 每位使用者的統計
+        per_user = db.transactions.aggregate([
+            {'$group': {
+                '_id': '$user_id',
+                'transaction_count': {'$sum': 1},
+                'total_spent': {'$sum': '$total_amount'}
+            }}
+        ])
+
+        db.users.update_many({}, {'$set': {'transaction_count': 0, 'total_spent': 0}})
+
+        total_transactions = 0
+        total_revenue = 0
+        for row in per_user:
+            total_transactions += row['transaction_count']
+            total_revenue += row['total_spent']
+            db.users.update_one(
+                {'_id': row['_id']},
+                {'$set': {
+                    'transaction_count': row['transaction_count'],
+                    'total_spent': row['total_spent']
+                }}
+            )
+
+        db.stats.replace_one(
+            {'_id': SALES_STATS_ID},
+            {'total_transactions': total_transactions, 'total_revenue': total_revenue},
+            upsert=True
+        )
+
+        print(f"✅ 統計計數器重建完成: {total_transactions} 筆交易, NT$ {total_revenue}")
+        return self.get_sales_stats()
+
+
+# 全域單例
+_stats_service = None
+
+
+def get_stats_service() -> StatsService:
+    """獲取統計服務單例"""
+    global _stats_service
+    if _stats_service is None:
+        _stats_service = StatsService()
+    return _stats_service
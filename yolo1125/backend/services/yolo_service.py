@@ -5,12 +5,15 @@ YOLO 商品偵測服務
 
 from ultralytics import YOLO
 import cv2
+import time
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional
 
-from backend.config import YOLO_MODEL_PATH, CONFIDENCE_THRESHOLD, BASE_DIR
-from backend.database import Database
+from backend.config import YOLO_MODEL_PATH, CONFIDENCE_THRESHOLD, BASE_DIR, CAPTURE_ENABLED
+from backend.metrics import stage_timer, frame_stage_latency
+from backend.services.catalog_service import get_catalog_service
+from backend.services.capture_service import get_capture_service
 
 
 class YOLOService:
@@ -18,9 +21,9 @@ class YOLOService:
 
     def __init__(self):
         self.model = None
-        self.product_cache = {}  # yolo_class_id -> product_info
+        self.catalog = get_catalog_service()  # 與 /api/products 共用的商品目錄快取
+        self.capture = get_capture_service() if CAPTURE_ENABLED else None  # 主動學習影格擷取
         self.load_model()
-        self.load_products()
 
     def load_model(self):
         """載入 YOLO 模型"""
@@ -41,29 +44,6 @@ class YOLOService:
             print(f"❌ YOLO 模型載入失敗: {e}")
             raise
 
-    def load_products(self):
-        """從資料庫載入商品資訊"""
-        try:
-            db = Database.get_db()
-            products = db.products.find({})
-
-            for product in products:
-                yolo_class_id = product.get('yolo_class_id')
-                self.product_cache[yolo_class_id] = {
-                    'id': str(product['_id']),
-                    'name': product['name'],
-                    'price': product['price'],
-                    'yolo_class_name': product.get('yolo_class_name', '')
-                }
-
-            print(f"✅ 載入 {len(self.product_cache)} 個商品資訊")
-            if self.product_cache:
-                print(f"   商品對應: {self.product_cache}")
-
-        except Exception as e:
-            print(f"❌ 載入商品資訊失敗: {e}")
-            self.product_cache = {}
-
     def detect(self, frame: np.ndarray) -> List[Dict]:
         """
         偵測影像中的商品
@@ -86,9 +66,12 @@ class YOLOService:
 
         try:
             # YOLO 推論
-            results = self.model(frame, verbose=False)
+            with stage_timer('yolo_inference'):
+                results = self.model(frame, verbose=False)
+            postprocess_start = time.perf_counter()
 
             detections = []
+            raw_boxes = []  # 過濾前的所有預測框（主動學習擷取用）
 
             for result in results:
                 boxes = result.boxes
@@ -98,6 +81,8 @@ class YOLOService:
                     class_id = int(box.cls[0])
                     confidence = float(box.conf[0])
                     x1, y1, x2, y2 = box.xyxy[0].tolist()
+                    if self.capture is not None:
+                        raw_boxes.append((class_id, confidence, box.xywhn[0].tolist()))
 
                     # 過濾低信心度
                     if confidence < CONFIDENCE_THRESHOLD:
@@ -107,7 +92,7 @@ class YOLOService:
                     class_name = self.model.names.get(class_id, f"class_{class_id}")
 
                     # 查詢商品資訊
-                    product = self.product_cache.get(class_id)
+                    product = self.catalog.get_by_class_id(class_id)
 
                     detection = {
                         'class_id': class_id,
@@ -119,6 +104,11 @@ class YOLOService:
 
                     detections.append(detection)
 
+            # 信心度接近門檻的影格排入背景寫入（不阻塞，佇列滿則丟棄）
+            if raw_boxes:
+                self.capture.offer(frame, raw_boxes)
+
+            frame_stage_latency['yolo_postprocess'].observe((time.perf_counter() - postprocess_start) * 1000)
             return detections
 
         except Exception as e:
@@ -127,7 +117,7 @@ class YOLOService:
 
     def get_product_by_class_id(self, class_id: int) -> Optional[Dict]:
         """根據 YOLO class_id 查詢商品"""
-        return self.product_cache.get(class_id)
+        return self.catalog.get_by_class_id(class_id)
 
 
 # 全域單例 - 延遲初始化以避免啟動時錯誤
@@ -5,6 +5,7 @@
 class AdminManager {
     constructor() {
         this.users = [];
+        this.pageSize = 50;
         this.currentEditUser = null;
         this.currentDeleteUser = null;
         this.init();
@@ -23,6 +24,11 @@ class AdminManager {
             this.loadStats();
         });
 
+        // 載入更多
+        document.getElementById('load-more-btn').addEventListener('click', () => {
+            this.loadUsers(true);
+        });
+
         // 搜尋功能
         document.getElementById('search-input').addEventListener('input', (e) => {
             this.filterUsers(e.target.value);
@@ -67,17 +73,21 @@ class AdminManager {
         }
     }
 
-    async loadUsers() {
+    async loadUsers(append = false) {
         try {
-            const tbody = document.getElementById('users-table-body');
-            tbody.innerHTML = '<tr><td colspan="8" class="loading-row"><div class="spinner"></div><p>載入中...</p></td></tr>';
+            if (!append) {
+                this.users = [];
+                const tbody = document.getElementById('users-table-body');
+                tbody.innerHTML = '<tr><td colspan="8" class="loading-row"><div class="spinner"></div><p>載入中...</p></td></tr>';
+            }
 
-            const response = await fetch('/api/admin/users');
+            const response = await fetch(`/api/admin/users?limit=${this.pageSize}&skip=${this.users.length}`);
             const data = await response.json();
 
             if (data.success) {
-                this.users = data.users;
+                this.users = this.users.concat(data.users);
                 this.renderUsers(this.users);
+                document.getElementById('load-more-btn').style.display = data.has_more ? '' : 'none';
             }
         } catch (error) {
             console.error('載入使用者失敗:', error);
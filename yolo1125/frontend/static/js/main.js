@@ -457,8 +457,9 @@ class App {
 
     /**
      * 顯示歷史消費記錄
+     * @param {string|null} before - 分頁游標，null 表示第一頁
      */
-    async showHistory() {
+    async showHistory(before = null) {
         if (!this.currentUser || !this.currentUser.id) {
             this.showToast('請先登入', 'error');
             return;
@@ -467,14 +468,21 @@ class App {
         console.log('📊 載入歷史消費記錄...');
 
         try {
-            // 顯示 modal
-            const modal = document.getElementById('history-modal');
             const historyList = document.getElementById('history-list');
-            historyList.innerHTML = '<p class="loading">載入中...</p>';
-            modal.style.display = 'block';
 
-            // 獲取交易歷史
-            const response = await fetch(`/api/user/${this.currentUser.id}/transactions`);
+            if (!before) {
+                // 顯示 modal
+                const modal = document.getElementById('history-modal');
+                historyList.innerHTML = '<p class="loading">載入中...</p>';
+                modal.style.display = 'block';
+            }
+
+            // 獲取交易歷史（分頁）
+            let url = `/api/user/${this.currentUser.id}/transactions?limit=20`;
+            if (before) {
+                url += `&before=${encodeURIComponent(before)}`;
+            }
+            const response = await fetch(url);
             const data = await response.json();
 
             if (!response.ok || !data.success) {
@@ -485,30 +493,42 @@ class App {
             document.getElementById('total-transactions').textContent = data.total_transactions;
             document.getElementById('total-spent').textContent = `NT$ ${data.total_spent}`;
 
+            // 移除前一頁的「載入中」與「載入更多」
+            historyList.querySelectorAll('.loading, .load-more-history').forEach(el => el.remove());
+
             // 顯示交易列表
-            if (data.transactions.length === 0) {
+            if (!before && data.transactions.length === 0) {
                 historyList.innerHTML = '<p class="no-data">尚無消費記錄</p>';
-            } else {
-                historyList.innerHTML = data.transactions.map(t => `
-                    <div class="transaction-item">
-                        <div class="transaction-header">
-                            <span class="transaction-date">${new Date(t.date).toLocaleString('zh-TW')}</span>
-                            <span class="transaction-amount">NT$ ${t.total_amount}</span>
-                        </div>
-                        <div class="transaction-details">
-                            <span>商品數量：${t.total_quantity} 件</span>
-                        </div>
-                        <div class="transaction-items">
-                            ${t.items.map(item => `
-                                <div class="item-row">
-                                    <span>${item.name}</span>
-                                    <span>x${item.quantity}</span>
-                                    <span>NT$ ${item.subtotal}</span>
-                                </div>
-                            `).join('')}
-                        </div>
+                return;
+            }
+
+            historyList.insertAdjacentHTML('beforeend', data.transactions.map(t => `
+                <div class="transaction-item">
+                    <div class="transaction-header">
+                        <span class="transaction-date">${new Date(t.date).toLocaleString('zh-TW')}</span>
+                        <span class="transaction-amount">NT$ ${t.total_amount}</span>
+                    </div>
+                    <div class="transaction-details">
+                        <span>商品數量：${t.total_quantity} 件</span>
                     </div>
-                `).join('');
+                    <div class="transaction-items">
+                        ${t.items.map(item => `
+                            <div class="item-row">
+                                <span>${item.name}</span>
+                                <span>x${item.quantity}</span>
+                                <span>NT$ ${item.subtotal}</span>
+                            </div>
+                        `).join('')}
+                    </div>
+                </div>
+            `).join(''));
+
+            if (data.next_before) {
+                const moreBtn = document.createElement('button');
+                moreBtn.className = 'btn-secondary load-more-history';
+                moreBtn.textContent = '載入更多';
+                moreBtn.addEventListener('click', () => this.showHistory(data.next_before));
+                historyList.appendChild(moreBtn);
             }
 
         } catch (error) {
@@ -549,7 +569,7 @@ class App {
             try {
                 const [userInfoRes, transactionsRes] = await Promise.all([
                     fetch(`/api/user/${user.id}/info`),
-                    fetch(`/api/user/${user.id}/transactions`)
+                    fetch(`/api/user/${user.id}/transactions?limit=1`)
                 ]);
 
                 const userInfo = await userInfoRes.json();
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+YOLO 推論延遲基準測試
+以驗證集圖片與合成影格量測 p50/p95/p99 延遲與吞吐量，
+矩陣涵蓋 imgsz、batch、torch 執行緒數與後端，結果寫成 JSON 供跨次比較
+
+後端:
+    service  YOLOService.detect（含信心度過濾與商品目錄查詢，batch 固定為 1）
+    model    直接呼叫 YOLO 模型（.pt / ONNX / OpenVINO 目錄皆可）
+
+用法:
+    python scripts/benchmark_yolo.py
+    python scripts/benchmark_yolo.py --imgsz 320 480 640 --batch 1 4 --threads 1 2 4
+    python scripts/benchmark_yolo.py --models best.pt best_int8_openvino_model --backend model
+    python scripts/benchmark_yolo.py --compare data/benchmarks/a.json data/benchmarks/b.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+# 加入專案路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.config import BASE_DIR, YOLO_MODEL_PATH
+
+# 預設測試資料
+DEFAULT_IMAGES_DIR = BASE_DIR.parent / "dataset" / "images" / "val"
+DEFAULT_OUTPUT_DIR = BASE_DIR / "data" / "benchmarks"
+
+# 合成影格尺寸（與 kiosk 攝影機擷取尺寸相同）
+SYNTHETIC_WIDTH = 640
+SYNTHETIC_HEIGHT = 480
+
+IMG_FORMATS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# 限制執行緒時一併設定的環境變數（需在子行程匯入 torch 前設定）
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def model_format(model_path: Path) -> str:
+    """依路徑判斷模型格式"""
+    if model_path.is_dir() and model_path.name.endswith('_openvino_model'):
+        return 'openvino'
+    return {'.pt': 'torch', '.onnx': 'onnx', '.engine': 'tensorrt'}.get(model_path.suffix, model_path.suffix)
+
+
+def load_frames(image_paths, synthetic: int, seed: int = 0):
+    """
+    讀取測試影格
+
+    Returns:
+        [(來源, BGR 影像)]，來源為 'val' 或 'synthetic'
+    """
+    import cv2
+    import numpy as np
+
+    frames = []
+    for path in image_paths:
+        frame = cv2.imread(str(path))
+        if frame is not None:
+            frames.append(('val', frame))
+
+    # 合成影格：雜訊背景加上隨機色塊，模擬沒有商品或非預期畫面
+    rng = np.random.default_rng(seed)
+    for _ in range(synthetic):
+        frame = rng.integers(0, 256, (SYNTHETIC_HEIGHT, SYNTHETIC_WIDTH, 3), dtype=np.uint8)
+        for _ in range(3):
+            x, y = int(rng.integers(0, SYNTHETIC_WIDTH - 100)), int(rng.integers(0, SYNTHETIC_HEIGHT - 100))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.rectangle(frame, (x, y), (x + 100, y + 100), color, -1)
+        frames.append(('synthetic', frame))
+
+    return frames
+
+
+def percentile(sorted_values, q: float) -> float:
+    """取已排序列表的百分位數"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def summarize(timings_ms, images: int, elapsed: float) -> dict:
+    """將每次呼叫的耗時彙整為統計"""
+    timings_ms = sorted(timings_ms)
+    return {
+        'calls': len(timings_ms),
+        'images': images,
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 2),
+        'p50_ms': round(percentile(timings_ms, 0.50), 2),
+        'p95_ms': round(percentile(timings_ms, 0.95), 2),
+        'p99_ms': round(percentile(timings_ms, 0.99), 2),
+        'max_ms': round(timings_ms[-1], 2),
+        'throughput_fps': round(images / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def limit_threads(threads: int):
+    """限制子行程使用的 CPU 執行緒數（ProcessPoolExecutor initializer）"""
+    if hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cpus[:threads])
+    import torch
+    torch.set_num_threads(threads)
+
+
+def run_worker(model_path: str, backend: str, configs, image_paths, synthetic: int,
+               rounds: int, warmup: int):
+    """
+    在子行程中執行同一模型、同一執行緒數下的所有 imgsz / batch 組合
+
+    Returns:
+        每個組合的結果列表
+    """
+    frames = load_frames(image_paths, synthetic)
+    results = []
+    if not frames:
+        return results
+
+    if backend == 'service':
+        # 模型路徑由 run_matrix 透過 YOLO_MODEL_PATH 環境變數傳入 config
+        from backend.services.yolo_service import get_yolo_service
+        service = get_yolo_service()
+        model = service.model
+    else:
+        from ultralytics import YOLO
+        model = YOLO(model_path, task='detect')
+
+    for imgsz, batch in configs:
+        result = {'imgsz': imgsz, 'batch': batch}
+        try:
+            if backend == 'service':
+                # detect() 不接受 imgsz，透過模型的預設參數覆寫
+                model.overrides['imgsz'] = imgsz
+
+                def infer(chunk):
+                    return service.detect(chunk[0][1])
+            else:
+                def infer(chunk):
+                    return model.predict([frame for _, frame in chunk], imgsz=imgsz,
+                                         device='cpu', verbose=False)
+
+            chunks = [frames[i:i + batch] for i in range(0, len(frames), batch)]
+            for chunk in chunks[:warmup]:
+                infer(chunk)
+
+            timings = {'all': [], 'val': [], 'synthetic': []}
+            images = 0
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for chunk in chunks:
+                    call_start = time.perf_counter()
+                    infer(chunk)
+                    elapsed_ms = (time.perf_counter() - call_start) * 1000
+                    timings['all'].append(elapsed_ms)
+                    images += len(chunk)
+                    # 來源分開統計只對 batch=1 有意義
+                    if batch == 1:
+                        timings[chunk[0][0]].append(elapsed_ms)
+            elapsed = time.perf_counter() - start
+
+            result.update(summarize(timings['all'], images, elapsed))
+            if batch == 1:
+                result['by_source'] = {
+                    source: summarize(values, len(values), sum(values) / 1000)
+                    for source, values in timings.items() if source != 'all' and values
+                }
+        except Exception as e:
+            result['error'] = str(e)
+
+        results.append(result)
+
+    return results
+
+
+def run_matrix(model_path: Path, backend: str, threads: int, configs, image_paths,
+               synthetic: int, rounds: int, warmup: int):
+    """以指定執行緒數在獨立的 spawn 子行程中量測，避免不同設定互相影響"""
+    env = {var: str(threads) for var in THREAD_ENV_VARS}
+    env['YOLO_MODEL_PATH'] = str(model_path)
+    saved = {var: os.environ.get(var) for var in env}
+    os.environ.update(env)
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=limit_threads, initargs=(threads,)) as executor:
+            return executor.submit(run_worker, str(model_path), backend, configs,
+                                   [str(p) for p in image_paths], synthetic, rounds, warmup).result()
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def environment_info() -> dict:
+    """記錄執行環境，比較不同次結果時用來確認硬體與套件版本"""
+    info = {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+    for package in ('torch', 'ultralytics', 'opencv-python', 'openvino', 'onnxruntime'):
+        try:
+            info[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            continue
+    return info
+
+
+def result_key(row: dict):
+    """比較兩次結果時用來對齊的鍵"""
+    return (row['backend'], Path(row['model']).name, row['threads'], row['imgsz'], row['batch'])
+
+
+def compare(old_path: Path, new_path: Path):
+    """比較兩份基準測試結果"""
+    old = json.loads(old_path.read_text(encoding='utf-8'))
+    new = json.loads(new_path.read_text(encoding='utf-8'))
+    old_rows = {result_key(row): row for row in old['results'] if 'error' not in row}
+
+    print(f"舊: {old_path} ({old['created_at']}, {old['environment'].get('hostname')})")
+    print(f"新: {new_path} ({new['created_at']}, {new['environment'].get('hostname')})")
+    print()
+    print(f"{'後端':<8} {'模型':<28} {'執行緒':>6} {'imgsz':>6} {'batch':>6} "
+          f"{'p50 ms':>16} {'p99 ms':>16} {'fps':>16}")
+
+    for row in new['results']:
+        if 'error' in row:
+            continue
+        base = old_rows.get(result_key(row))
+
+        def cell(metric):
+            if base is None or not base.get(metric):
+                return f"{row[metric]}"
+            change = (row[metric] - base[metric]) / base[metric] * 100
+            return f"{row[metric]} ({change:+.0f}%)"
+
+        print(f"{row['backend']:<8} {Path(row['model']).name[:28]:<28} {row['threads']:>6} "
+              f"{row['imgsz']:>6} {row['batch']:>6} {cell('p50_ms'):>16} {cell('p99_ms'):>16} "
+              f"{cell('throughput_fps'):>16}")
+
+
+def main():
+    """執行基準測試"""
+    parser = argparse.ArgumentParser(description='YOLO 推論延遲基準測試')
+    parser.add_argument('--models', type=str, nargs='+', default=[str(YOLO_MODEL_PATH)],
+                        help='模型路徑（.pt、.onnx 或 OpenVINO 目錄，預設: YOLO_MODEL_PATH）')
+    parser.add_argument('--backend', type=str, nargs='+', choices=['service', 'model'],
+                        default=['service', 'model'], help='測試的後端 (預設: service model)')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640], help='推論尺寸 (預設: 640)')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1], help='批次大小 (預設: 1)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[os.cpu_count() or 1],
+                        help='torch 執行緒數 (預設: CPU 核心數)')
+    parser.add_argument('--images', type=str, default=str(DEFAULT_IMAGES_DIR),
+                        help='測試圖片目錄 (預設: dataset/images/val)')
+    parser.add_argument('--synthetic', type=int, default=20, help='合成影格數量 (預設: 20)')
+    parser.add_argument('--rounds', type=int, default=3, help='每個組合重複跑幾輪 (預設: 3)')
+    parser.add_argument('--warmup', type=int, default=3, help='暖機呼叫次數 (預設: 3)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='結果 JSON 路徑 (預設: data/benchmarks/benchmark_<時間>.json)')
+    parser.add_argument('--compare', type=str, nargs=2, metavar=('OLD', 'NEW'),
+                        help='比較兩份結果 JSON 後結束')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(Path(args.compare[0]), Path(args.compare[1]))
+        return
+
+    images_dir = Path(args.images)
+    image_paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMG_FORMATS) \
+        if images_dir.exists() else []
+    if not image_paths:
+        print(f"⚠️  找不到測試圖片: {images_dir}，只使用合成影格")
+    if not image_paths and args.synthetic <= 0:
+        print("❌ 沒有可用的測試影格")
+        sys.exit(1)
+
+    models = [Path(p) for p in args.models]
+    for model_path in models:
+        if not model_path.exists():
+            print(f"❌ 模型不存在: {model_path}")
+            sys.exit(1)
+
+    print("=" * 60)
+    print("YOLO 推論基準測試")
+    print("=" * 60)
+    print(f"測試影格: {len(image_paths)} 張驗證集圖片 + {args.synthetic} 張合成影格，每組 {args.rounds} 輪")
+
+    results = []
+    for model_path, backend, threads in itertools.product(models, args.backend, args.threads):
+        # YOLOService.detect 一次只處理一張影格
+        batches = [1] if backend == 'service' else args.batch
+        configs = list(itertools.product(args.imgsz, batches))
+        print(f"\n{backend} / {model_path.name} / {threads} 執行緒")
+
+        try:
+            rows = run_matrix(model_path, backend, threads, configs, image_paths,
+                              args.synthetic, args.rounds, args.warmup)
+        except Exception as e:
+            print(f"  ❌ 測試失敗: {e}")
+            continue
+
+        for row in rows:
+            row.update({'backend': backend, 'model': str(model_path),
+                        'format': model_format(model_path), 'threads': threads})
+            results.append(row)
+            if 'error' in row:
+                print(f"  imgsz={row['imgsz']:<4} batch={row['batch']:<3} ❌ {row['error']}")
+            else:
+                print(f"  imgsz={row['imgsz']:<4} batch={row['batch']:<3} "
+                      f"p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  "
+                      f"p99 {row['p99_ms']:>8.2f}ms  {row['throughput_fps']:>7.2f} fps")
+
+    created_at = datetime.now()
+    output = Path(args.output) if args.output else \
+        DEFAULT_OUTPUT_DIR / f"benchmark_{created_at.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'settings': {
+            'images_dir': str(images_dir),
+            'val_images': len(image_paths),
+            'synthetic': args.synthetic,
+            'rounds': args.rounds,
+            'warmup': args.warmup
+        },
+        'results': results
+    }
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    print("\n" + "=" * 60)
+    print(f"✅ 結果已儲存: {output}")
+    print("=" * 60)
+
+    if not results or any('error' in row for row in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+商品目錄匯入腳本
+從 CSV 或 NDJSON 檔案批次匯入商品（以 yolo_class_id upsert）
+
+CSV 欄位: name, price, yolo_class_id, yolo_class_name
+
+用法:
+    python scripts/import_products.py catalog.csv
+    python scripts/import_products.py catalog.ndjson --batch-size 1000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 加入專案路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.database import Database, init_collections
+from backend.services.product_import import import_products
+
+
+def main():
+    """匯入商品目錄"""
+    parser = argparse.ArgumentParser(description='商品目錄匯入')
+    parser.add_argument('path', type=str, help='CSV 或 NDJSON 檔案路徑')
+    parser.add_argument('--format', type=str, choices=['csv', 'ndjson'], default=None,
+                        help='檔案格式（預設依副檔名判斷）')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='每批 bulk_write 筆數 (預設: 500)')
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"❌ 檔案不存在: {path}")
+        sys.exit(1)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'ndjson' if path.suffix.lower() in ('.ndjson', '.jsonl') else 'csv'
+
+    print("=" * 60)
+    print(f"匯入商品目錄: {path} ({fmt})")
+    print("=" * 60)
+
+    try:
+        Database.connect()
+        init_collections()
+
+        start = time.perf_counter()
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            report = import_products(f, fmt, args.batch_size)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n處理 {report['processed']} 列，耗時 {elapsed:.2f} 秒")
+        print(f"  有效: {report['valid']}")
+        print(f"  新增: {report['upserted']}")
+        print(f"  更新: {report['modified']}")
+        print(f"  錯誤: {report['error_count']}")
+
+        for error in report['errors'][:20]:
+            print(f"    第 {error['row']} 列: {error['error']}")
+        if report['error_count'] > 20:
+            print(f"    ... 其餘 {report['error_count'] - 20} 筆錯誤省略")
+        if report['aborted']:
+            print("\n⚠️  檔案中途無法解析，匯入已中止（之前的批次已寫入）")
+
+        print("\n提示：伺服器的商品目錄快取會在 TTL 到期後自動更新，")
+        print("      或呼叫 POST /api/admin/products/refresh 立即套用")
+
+    except Exception as e:
+        print(f"\n❌ 匯入失敗: {e}")
+        sys.exit(1)
+    finally:
+        Database.close()
+
+
+if __name__ == "__main__":
+    main()
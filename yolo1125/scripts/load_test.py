@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+多台 kiosk WebSocket 壓力測試
+模擬 N 台 kiosk 同時連線 /ws/{session_id}，以固定 fps 傳送錄製或合成的 JPEG 影格，
+並透過 HTTP API 執行登入、購物、結帳流程，統計吞吐量、延遲百分位數與錯誤率
+
+每台 kiosk 的流程（重複直到 --duration 結束）:
+    1. 以 --face-image 呼叫 /api/face-login（找不到使用者時改呼叫 /api/face-register）
+    2. 傳送影格 --shop-seconds 秒；每個影格帶序號 seq，伺服器處理完回覆 frame_ack
+    3. 呼叫 /api/checkout
+
+伺服器會把 seq 附在該影格產生的 detections / cart_updated 上，frame_ack 的 status
+說明影格實際做了什麼（throttled / dropped / skipped / face / yolo）。
+
+延遲定義:
+    frame_face / frame_yolo  影格送出 → frame_ack（只計入實際執行偵測的影格）
+    detections  影格送出 → 同一 seq 的 detections 訊息
+    cart        影格送出 → 同一 seq 的 cart_updated（加入商品）
+    login / checkout  HTTP 請求往返；checkout_cart 為結帳請求 → 清空的 cart_updated
+
+伺服器每個連線最快 0.2 秒處理一個影格，更快的影格會被節流（不做任何事就回覆），
+因此 --fps 上限為 5；節流與略過的影格只計數，不計入延遲，並與伺服器的
+/metrics 節流計數對照。
+
+測試會建立使用者與交易，請讓伺服器連到可丟棄的本機 MongoDB，例如:
+    docker run --rm -p 27018:27017 mongo:7
+    MONGODB_URL=mongodb://localhost:27018 python -m backend.main
+
+用法:
+    python scripts/load_test.py --kiosks 10 --fps 4 --duration 60 --face-image face.jpg
+    python scripts/load_test.py --kiosks 50 --synthetic --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import websockets
+
+# 預設錄製影格（驗證集商品照片）
+DEFAULT_FRAMES_DIR = Path(__file__).parent.parent.parent / "dataset" / "images" / "val"
+
+# 等待單一影格處理完成（frame_ack）的上限秒數
+FRAME_TIMEOUT = 10.0
+
+# 伺服器每個連線的影格處理上限（handle_frame 的 0.2 秒節流）
+SERVER_MAX_FPS = 5.0
+
+# 合成影格尺寸（與 kiosk 攝影機擷取尺寸相同）
+SYNTHETIC_WIDTH = 640
+SYNTHETIC_HEIGHT = 480
+
+
+def load_frames(frames_dir: Optional[Path], synthetic: int) -> List[str]:
+    """讀取錄製影格或產生合成影格，預先編碼成 data URL"""
+    images = []
+    if frames_dir is not None and frames_dir.exists():
+        for path in sorted(frames_dir.iterdir()):
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+                frame = cv2.imread(str(path))
+                if frame is not None:
+                    images.append(frame)
+
+    rng = np.random.default_rng(0)
+    for _ in range(synthetic):
+        frame = rng.integers(0, 256, (SYNTHETIC_HEIGHT, SYNTHETIC_WIDTH, 3), dtype=np.uint8)
+        images.append(frame)
+
+    frames = []
+    for frame in images:
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if ok:
+            frames.append('data:image/jpeg;base64,' + base64.b64encode(encoded.tobytes()).decode())
+    return frames
+
+
+def http_json(method: str, url: str, payload: Optional[Dict] = None, timeout: float = 30.0):
+    """
+    送出 HTTP 請求（同步，以 asyncio.to_thread 呼叫）
+
+    Returns:
+        (狀態碼, 回應 JSON 或 None)
+    """
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+
+    try:
+        return status, json.loads(body)
+    except ValueError:
+        return status, None
+
+
+def scrape_frame_counters(base_url: str) -> Dict[str, float]:
+    """讀取伺服器 /metrics 的影格計數（伺服器未提供時回傳空字典）"""
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+            text = response.read().decode('utf-8')
+    except (urllib.error.URLError, OSError):
+        return {}
+
+    counters = {}
+    for line in text.splitlines():
+        if line.startswith('yolo1125_frames_'):
+            name, value = line.rsplit(' ', 1)
+            counters[name[len('yolo1125_frames_'):-len('_total')]] = float(value)
+    return counters
+
+
+class LoadStats:
+    """所有 kiosk 共用的統計"""
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)  # 名稱 -> 毫秒
+        self.counts: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def observe(self, name: str, start: float):
+        """記錄從 start 到現在的毫秒數"""
+        self.latency[name].append((time.perf_counter() - start) * 1000)
+
+    def error(self, kind: str):
+        """記錄錯誤"""
+        self.errors[kind] += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        """彙整延遲百分位數、吞吐量與錯誤率"""
+        latency = {}
+        for name, values in sorted(self.latency.items()):
+            values = sorted(values)
+            latency[name] = {
+                'count': len(values),
+                'p50_ms': round(values[len(values) // 2], 2),
+                'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+                'p99_ms': round(values[min(len(values) - 1, int(len(values) * 0.99))], 2),
+                'max_ms': round(values[-1], 2)
+            }
+
+        requests = self.counts['connections'] + self.counts['frames_sent'] + self.counts['http_requests']
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'throughput': {
+                'frames_per_s': round(self.counts['frames_sent'] / elapsed, 2),
+                'frames_completed_per_s': round(self.counts['frames_completed'] / elapsed, 2),
+                'frames_detected_per_s': round(
+                    (self.counts['frames_face'] + self.counts['frames_yolo']) / elapsed, 2),
+                'messages_received_per_s': round(self.counts['messages_received'] / elapsed, 2),
+                'checkouts_per_s': round(self.counts['checkouts'] / elapsed, 3)
+            },
+            'counts': dict(self.counts),
+            'latency': latency,
+            'errors': dict(self.errors),
+            'error_rate': round(sum(self.errors.values()) / requests, 4) if requests else 0
+        }
+
+
+class Kiosk:
+    """單一模擬 kiosk"""
+
+    def __init__(self, index: int, args, frames: List[str], face_image: Optional[str], stats: LoadStats):
+        self.index = index
+        self.args = args
+        self.frames = frames
+        self.face_image = face_image
+        self.stats = stats
+        self.session_id = f"loadtest-{index:04d}-{random.getrandbits(32):08x}"
+
+        # seq -> [送出時間, 是否已收到 detections, 是否已收到 cart_updated]，只保留最近的影格
+        self.sent: Dict[int, List] = {}
+        self.seq = 0
+        self.acked = asyncio.Event()
+        self.checkout_started: Optional[float] = None
+
+    async def run(self, deadline: float):
+        """執行直到 deadline"""
+        ws_url = self.args.url.replace('http', 'ws', 1) + f"/ws/{self.session_id}"
+        self.stats.counts['connections'] += 1
+        try:
+            async with websockets.connect(ws_url, max_size=None, open_timeout=10) as websocket:
+                reader = asyncio.create_task(self._read(websocket))
+                try:
+                    while time.perf_counter() < deadline:
+                        if self.face_image and not await self._login():
+                            await asyncio.sleep(1.0)
+                            continue
+                        await self._shop(websocket, min(deadline, time.perf_counter() + self.args.shop_seconds))
+                        if self.face_image:
+                            await self._checkout()
+                finally:
+                    reader.cancel()
+        except (OSError, websockets.exceptions.WebSocketException, asyncio.TimeoutError) as e:
+            self.stats.error(f"ws_{type(e).__name__}")
+
+    async def _request(self, name: str, path: str, payload: Dict):
+        """送出 HTTP 請求並記錄延遲與錯誤"""
+        start = time.perf_counter()
+        self.stats.counts['http_requests'] += 1
+        try:
+            status, body = await asyncio.to_thread(http_json, 'POST', self.args.url + path, payload)
+        except (urllib.error.URLError, OSError) as e:
+            self.stats.error(f"{name}_{type(e).__name__}")
+            return None, None
+        self.stats.observe(name, start)
+        if status >= 500:
+            self.stats.error(f"{name}_http_{status}")
+        return status, body
+
+    async def _login(self) -> bool:
+        """以人臉照片登入，沒有符合的使用者時註冊"""
+        payload = {'image': self.face_image, 'session_id': self.session_id}
+        status, body = await self._request('login', '/api/face-login', payload)
+        if status == 200 and body and body.get('success'):
+            return True
+
+        if status == 200 and body and '註冊' in body.get('message', ''):
+            payload.update({'name': f"壓測 kiosk {self.index}", 'phone': f"09{self.index:08d}",
+                            'birthday': '2000-01-01'})
+            status, body = await self._request('register', '/api/face-register', payload)
+            if status == 200 and body and body.get('success'):
+                return True
+
+        self.stats.error('login_failed')
+        return False
+
+    async def _shop(self, websocket, until: float):
+        """依 fps 傳送影格（封閉迴圈：收到上一個影格的 frame_ack 才送下一個）"""
+        interval = 1.0 / self.args.fps
+        next_send = time.perf_counter()
+        while time.perf_counter() < until:
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            next_send = max(next_send + interval, time.perf_counter())
+
+            self.seq += 1
+            self.sent[self.seq] = [time.perf_counter(), False, False]
+            self.sent.pop(self.seq - 64, None)
+            self.acked.clear()
+            await websocket.send(json.dumps({'type': 'frame', 'seq': self.seq, 'frame': random.choice(self.frames)}))
+            self.stats.counts['frames_sent'] += 1
+
+            try:
+                await asyncio.wait_for(self.acked.wait(), timeout=FRAME_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats.error('frame_timeout')
+
+    async def _checkout(self):
+        """結帳（購物車為空時伺服器回 400，不算錯誤）"""
+        self.checkout_started = time.perf_counter()
+        status, body = await self._request('checkout', '/api/checkout', {'session_id': self.session_id})
+        if status == 200:
+            self.stats.counts['checkouts'] += 1
+        elif status == 400 and body and body.get('detail') == '購物車是空的':
+            self.stats.counts['checkouts_empty'] += 1
+            self.checkout_started = None
+        elif status is not None and status < 500:
+            self.checkout_started = None
+            self.stats.error(f"checkout_http_{status}")
+
+    async def _read(self, websocket):
+        """讀取伺服器訊息，依 seq 對應到送出的影格"""
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                message_type = message.get('type')
+                self.stats.counts['messages_received'] += 1
+                frame = self.sent.get(message.get('seq'))
+
+                if message_type == 'frame_ack':
+                    status = message.get('status')
+                    self.stats.counts[f"frames_{status}"] += 1
+                    self.stats.counts['frames_completed'] += 1
+                    if frame is not None and status in ('face', 'yolo'):
+                        self.stats.observe(f"frame_{status}", frame[0])
+                    elif status == 'dropped':
+                        self.stats.error('frame_dropped')
+                    if message.get('seq') == self.seq:
+                        self.acked.set()
+
+                elif message_type == 'detections':
+                    if frame is not None and not frame[1]:
+                        frame[1] = True
+                        self.stats.observe('detections', frame[0])
+
+                elif message_type == 'cart_updated':
+                    if frame is not None:
+                        if not frame[2]:
+                            frame[2] = True
+                            self.stats.observe('cart', frame[0])
+                    elif self.checkout_started is not None and not message['cart']['items']:
+                        self.stats.observe('checkout_cart', self.checkout_started)
+                        self.checkout_started = None
+
+        except websockets.exceptions.ConnectionClosed as e:
+            if e.rcvd is None or e.rcvd.code not in (1000, 1001):
+                self.stats.error('ws_closed')
+
+
+async def run_load(args, frames: List[str], face_image: Optional[str]) -> Dict:
+    """啟動所有 kiosk 並等待結束"""
+    stats = LoadStats()
+    start = time.perf_counter()
+    deadline = start + args.ramp + args.duration
+
+    async def start_kiosk(index: int):
+        # 在 ramp 秒內平均錯開各 kiosk 的啟動時間
+        await asyncio.sleep(args.ramp * index / max(1, args.kiosks))
+        await Kiosk(index, args, frames, face_image, stats).run(deadline)
+
+    await asyncio.gather(*(start_kiosk(i) for i in range(args.kiosks)))
+    return stats.summary(time.perf_counter() - start)
+
+
+def main():
+    """執行壓力測試"""
+    parser = argparse.ArgumentParser(description='多台 kiosk WebSocket 壓力測試')
+    parser.add_argument('--url', type=str, default='http://localhost:8000', help='伺服器網址')
+    parser.add_argument('--kiosks', type=int, default=10, help='同時模擬的 kiosk 數 (預設: 10)')
+    parser.add_argument('--fps', type=float, default=4.0,
+                        help=f'每台 kiosk 每秒傳送影格數，上限 {SERVER_MAX_FPS:g} (預設: 4)')
+    parser.add_argument('--duration', type=float, default=60.0, help='測試秒數，不含 ramp (預設: 60)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='在幾秒內逐步啟動所有 kiosk (預設: 5)')
+    parser.add_argument('--shop-seconds', type=float, default=10.0,
+                        help='每次購物傳送影格的秒數，之後結帳 (預設: 10)')
+    parser.add_argument('--frames', type=str, default=str(DEFAULT_FRAMES_DIR),
+                        help='錄製影格目錄 (預設: dataset/images/val)')
+    parser.add_argument('--synthetic', action='store_true', help='改用合成影格（不讀取錄製影格）')
+    parser.add_argument('--face-image', type=str, default=None,
+                        help='登入用的人臉照片；未提供時只測試未登入的人臉偵測路徑')
+    parser.add_argument('--output', type=str, default=None, help='結果 JSON 路徑')
+    args = parser.parse_args()
+
+    args.url = args.url.rstrip('/')
+    if args.fps > SERVER_MAX_FPS:
+        print(f"⚠️  伺服器每個連線最快 {SERVER_MAX_FPS:g} fps，超過的影格只會被節流，--fps 改為 {SERVER_MAX_FPS:g}")
+        args.fps = SERVER_MAX_FPS
+    frames = load_frames(None if args.synthetic else Path(args.frames), 20 if args.synthetic else 0)
+    if not frames:
+        print(f"❌ 找不到影格: {args.frames}（可改用 --synthetic）")
+        sys.exit(1)
+
+    face_image = None
+    if args.face_image:
+        face_path = Path(args.face_image)
+        if not face_path.exists():
+            print(f"❌ 人臉照片不存在: {face_path}")
+            sys.exit(1)
+        face_image = 'data:image/jpeg;base64,' + base64.b64encode(face_path.read_bytes()).decode()
+    else:
+        print("⚠️  未提供 --face-image：kiosk 不會登入，只測試人臉偵測路徑（不含商品與結帳）")
+
+    print("=" * 60)
+    print(f"壓力測試: {args.kiosks} 台 kiosk × {args.fps} fps，{args.duration} 秒 → {args.url}")
+    print(f"影格: {len(frames)} 張{'合成' if args.synthetic else '錄製'}影格")
+    print("=" * 60)
+
+    before = scrape_frame_counters(args.url)
+    report = asyncio.run(run_load(args, frames, face_image))
+    after = scrape_frame_counters(args.url)
+    if after:
+        report['server_frames'] = {name: after[name] - before.get(name, 0) for name in after}
+    report['settings'] = {key: getattr(args, key) for key in
+                          ('url', 'kiosks', 'fps', 'duration', 'ramp', 'shop_seconds', 'synthetic')}
+
+    print(f"\n吞吐量（{report['elapsed_s']} 秒）:")
+    for name, value in report['throughput'].items():
+        print(f"  {name:<26} {value}")
+
+    print("\n延遲 (ms):")
+    print(f"  {'':<14}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, row in report['latency'].items():
+        print(f"  {name:<14}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+    counts = report['counts']
+    print("\n影格處理結果: " + ", ".join(
+        f"{status}={counts.get(f'frames_{status}', 0)}"
+        for status in ('face', 'yolo', 'skipped', 'throttled', 'dropped')
+    ))
+    print("  （throttled / skipped 的影格未執行偵測，不計入 frame_* 延遲）")
+
+    if 'server_frames' in report:
+        print("伺服器影格計數: " + ", ".join(f"{k}={v:g}" for k, v in report['server_frames'].items()))
+        # 伺服器計數包含其他客戶端；兩者不同時表示測試期間還有其他流量
+        if report['server_frames'].get('throttled', 0) != counts.get('frames_throttled', 0):
+            print("⚠️  伺服器節流數與本工具回報不同，測試期間可能有其他客戶端")
+
+    print(f"\n錯誤率: {report['error_rate']:.2%}")
+    for kind, count in sorted(report['errors'].items()):
+        print(f"  {kind}: {count}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n✅ 結果已儲存: {args.output}")
+
+    sys.exit(1 if report['error_rate'] > 0.01 else 0)
+
+
+if __name__ == "__main__":
+    main()
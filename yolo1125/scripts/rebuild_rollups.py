@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+重建銷售彙總
+清除 sales_hourly / sales_daily 並從 transactions 重新計算
+（伺服器平時會在背景自動續跑彙總，只有時區設定變更或資料修正時才需重建）
+重建期間持有 stats 中的彙總 lease，伺服器執行中也可安全執行
+"""
+
+import sys
+from pathlib import Path
+
+# 加入專案路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.database import Database, init_collections
+from backend.services.rollup_service import get_rollup_service
+
+
+def main():
+    """重建銷售彙總"""
+    print("=" * 60)
+    print("重建銷售彙總...")
+    print("=" * 60)
+
+    try:
+        Database.connect()
+        init_collections()
+        processed = get_rollup_service().rebuild()
+
+        db = Database.get_db()
+        print("\n彙總結果：")
+        print(f"  處理交易: {processed}")
+        print(f"  每小時彙總文件: {db.sales_hourly.estimated_document_count()}")
+        print(f"  每日彙總文件: {db.sales_daily.estimated_document_count()}")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n❌ 重建失敗: {e}")
+        sys.exit(1)
+    finally:
+        Database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+重建銷售統計計數器
+從 transactions 重新計算 stats 文件與每位使用者的 total_spent / transaction_count
+"""
+
+import sys
+from pathlib import Path
+
+# 加入專案路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.database import Database
+from backend.services.stats_service import get_stats_service
+
+
+def main():
+    """重建統計計數器"""
+    print("=" * 60)
+    print("重建銷售統計計數器...")
+    print("=" * 60)
+
+    try:
+        Database.connect()
+        stats = get_stats_service().rebuild()
+
+        print("\n統計結果：")
+        print(f"  使用者數量: {stats['total_users']}")
+        print(f"  交易記錄: {stats['total_transactions']}")
+        print(f"  總營業額: NT$ {stats['total_revenue']}")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n❌ 重建失敗: {e}")
+        sys.exit(1)
+    finally:
+        Database.close()
+
+
+if __name__ == "__main__":
+    main()